@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Compute the control comparison and group-mean tracks of a group of bigWig files in one pass.
+
+Replaces one deepTools bigwigCompare task per target and control pair. All target and control
+bigWigs of a group are read chromosome by chromosome in parallel workers and every bin is the mean
+signal of the bigWig over the whole bin, with bases without data counted as zero, as bigwigCompare
+with --binSize and without --skipNonCoveredRegions. For each pair the log2ratio track is log2((target + pseudocount) / (control +
+pseudocount)) and the subtract track is target - control, written as {id}.log2ratio.bigWig and
+{id}.subtract.bigWig. The mean of the target bins is written as {group}.mean.bigWig. Consecutive
+bins with the same value are merged into one entry.
+"""
+
+import sys
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import pyBigWig
+
+
+def parse_args(args=None):
+    Description = "Compute log2ratio, subtract and group-mean bigWig tracks of a group in one pass."
+    Epilog = "Example usage: python aggregate_bigwigs.py --pairs rep1:rep1.bigWig:igg1.bigWig rep2:rep2.bigWig:igg2.bigWig --group h3k27me3"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument(
+        "--pairs", required=True, nargs="+", help="Comparisons as id:target.bigWig:control.bigWig."
+    )
+    parser.add_argument("--group", required=True, help="Group name, the prefix of the mean track.")
+    parser.add_argument("--bin_size", type=int, default=50, help="Bin size in base pairs.")
+    parser.add_argument("--pseudocount", type=float, default=1.0, help="Pseudocount of the log2 ratio.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes.")
+    return parser.parse_args(args)
+
+
+def bin_means(bigwig, chrom, chrom_size, bin_size):
+    """
+    Mean signal of every bin of a chromosome over the width of the bin, clipped at the chromosome
+    end, with bases without data counted as zero.
+    """
+    edges = np.append(np.arange(0, chrom_size, bin_size, dtype=np.int64), chrom_size)
+    intervals = bigwig.intervals(chrom) or []
+    if not intervals:
+        return np.zeros(len(edges) - 1)
+    starts, ends, values = (np.array(column) for column in zip(*intervals))
+    starts = starts.astype(np.int64)
+    ends = ends.astype(np.int64)
+    lengths = ends - starts
+
+    # Integral of the signal up to every bin edge
+    signal_cum = np.concatenate([[0.0], np.cumsum(values * lengths)])
+    idx = np.searchsorted(ends, edges, side="right")
+    partial = np.zeros(len(edges), dtype=np.int64)
+    inside = idx < len(starts)
+    partial[inside] = np.maximum(edges[inside] - starts[idx[inside]], 0)
+    signal = signal_cum[idx] + np.where(inside, values[np.minimum(idx, len(values) - 1)] * partial, 0.0)
+
+    return np.diff(signal) / np.diff(edges)
+
+
+def run_length(values, chrom_size, bin_size):
+    """
+    Merge consecutive bins with the same value into (starts, ends, values).
+    """
+    if len(values) == 0:
+        return [], [], []
+    change = np.flatnonzero(np.diff(values) != 0) + 1
+    first = np.concatenate([[0], change])
+    last = np.append(change, len(values))
+    starts = first * bin_size
+    ends = np.minimum(last * bin_size, chrom_size)
+    return starts.tolist(), ends.tolist(), values[first].tolist()
+
+
+def aggregate_chrom(task):
+    """
+    Worker: the run-length encoded comparison and mean tracks of one chromosome.
+    """
+    chrom, chrom_size, pairs, bin_size, pseudocount = task
+    files = sorted({path for _, target, control in pairs for path in (target, control)})
+    bins = {}
+    for path in files:
+        bigwig = pyBigWig.open(path)
+        bins[path] = bin_means(bigwig, chrom, chrom_size, bin_size)
+        bigwig.close()
+
+    tracks = {}
+    for sample_id, target, control in pairs:
+        tracks[sample_id + ".log2ratio"] = np.log2((bins[target] + pseudocount) / (bins[control] + pseudocount))
+        tracks[sample_id + ".subtract"] = bins[target] - bins[control]
+    targets = sorted({target for _, target, _ in pairs})
+    tracks["mean"] = np.mean([bins[target] for target in targets], axis=0)
+    return {name: run_length(values, chrom_size, bin_size) for name, values in tracks.items()}
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    pairs = []
+    for pair in args.pairs:
+        cols = pair.split(":")
+        if len(cols) != 3:
+            print("ERROR: Expected id:target:control, got {}".format(pair))
+            sys.exit(1)
+        pairs.append(tuple(cols))
+
+    # Only chromosomes present in every bigWig are compared
+    chroms = None
+    for path in sorted({path for _, target, control in pairs for path in (target, control)}):
+        bigwig = pyBigWig.open(path)
+        sizes = bigwig.chroms()
+        bigwig.close()
+        chroms = list(sizes.items()) if chroms is None else [(c, s) for c, s in chroms if sizes.get(c) == s]
+
+    with Pool(max(1, args.threads)) as pool:
+        results = pool.map(
+            aggregate_chrom, [(chrom, size, pairs, args.bin_size, args.pseudocount) for chrom, size in chroms]
+        )
+
+    outputs = {
+        sample_id + suffix: sample_id + suffix + ".bigWig"
+        for sample_id, _, _ in pairs
+        for suffix in (".log2ratio", ".subtract")
+    }
+    outputs["mean"] = args.group + ".mean.bigWig"
+    for name, path in outputs.items():
+        bigwig = pyBigWig.open(path, "w")
+        bigwig.addHeader(chroms)
+        for (chrom, _), result in zip(chroms, results):
+            starts, ends, values = result[name]
+            if starts:
+                bigwig.addEntries([chrom] * len(starts), starts, ends=ends, values=values)
+        bigwig.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Stack the per-sample bin count vectors of bam_bin_counts.py into a deepTools multiBamSummary
+compatible matrix.
+
+The matrix is written as the compressed numpy archive of multiBamSummary bins, with the keys
+matrix and labels, which plotCorrelation and plotPCA read with --corData. Only the stored vectors
+are read, so adding a sample does not recount the other BAM files.
+"""
+
+import sys
+import argparse
+
+import numpy as np
+
+
+def parse_args(args=None):
+    Description = "Stack per-sample bin count vectors into a multiBamSummary compatible matrix."
+    Epilog = "Example usage: python assemble_bin_counts.py --counts a.bincounts.npz b.bincounts.npz --output all_bam.bamSummary.npz"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--counts", required=True, nargs="+", help="Per-sample bin count archives.")
+    parser.add_argument("--output", required=True, help="Output matrix archive.")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    vectors = []
+    labels = []
+    layout = None
+    for path in args.counts:
+        with np.load(path) as data:
+            sample_layout = (int(data["bin_size"]), data["chroms"].tolist(), data["chrom_sizes"].tolist())
+            if layout is None:
+                layout = sample_layout
+            elif sample_layout != layout:
+                print("ERROR: Bin layout of {} does not match {}.".format(path, args.counts[0]))
+                sys.exit(1)
+            vectors.append(data["counts"])
+            labels.append(str(data["label"]))
+
+    matrix = np.column_stack(vectors).astype(np.float64)
+    np.savez_compressed(args.output, matrix=matrix, labels=np.array(labels))
+    print("{} bins x {} samples".format(matrix.shape[0], matrix.shape[1]))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
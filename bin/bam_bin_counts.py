@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Count the reads of a BAM file in genome-wide bins in one pass, and write the fingerprint of the
+sample from the same counts.
+
+The count vector is stored with the bin layout, so the vectors of all samples can be stacked into
+the deepTools multiBamSummary bins matrix without reading the BAM files again. A read is counted
+once in every bin overlapped by its aligned span, as multiBamSummary bins without --extendReads, and
+unmapped reads are skipped. Chromosomes are counted by parallel workers.
+
+The fingerprint raw counts and quality metrics have the layout of plotFingerprint --outRawCounts
+and --outQualityMetrics, and are computed from evenly spaced bins of the count vector, as
+plotFingerprint with --numberOfSamples.
+"""
+
+import sys
+import math
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import pysam
+
+## Number of reads buffered before they are added to the counts of a chromosome
+BUFFER_SIZE = 1000000
+
+
+def parse_args(args=None):
+    Description = "Count the reads of a BAM file in genome-wide bins and write its fingerprint."
+    Epilog = "Example usage: python bam_bin_counts.py --bam sample.bam --label sample --prefix sample"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--bam", required=True, help="Coordinate-sorted and indexed BAM file.")
+    parser.add_argument("--label", required=True, help="Sample label.")
+    parser.add_argument("--prefix", required=True, help="Output prefix.")
+    parser.add_argument("--bin_size", type=int, default=10000, help="Bin size in base pairs.")
+    parser.add_argument(
+        "--number_of_samples", type=int, default=500000, help="Number of bins sampled for the fingerprint."
+    )
+    parser.add_argument("--skip_zeros", action="store_true", help="Ignore empty bins in the fingerprint.")
+    parser.add_argument("--plot", action="store_true", help="Plot the fingerprint as {prefix}.plotFingerprint.pdf.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes.")
+    return parser.parse_args(args)
+
+
+def count_chrom(task):
+    """
+    Worker: the read counts of the bins of one chromosome.
+    """
+    bam_path, chrom, chrom_size, bin_size = task
+    n_bins = (chrom_size + bin_size - 1) // bin_size
+    delta = np.zeros(n_bins + 1, dtype=np.int64)
+    starts = []
+    ends = []
+    with pysam.AlignmentFile(bam_path, "rb") as bam:
+        for read in bam.fetch(chrom):
+            if read.is_unmapped or read.reference_end is None:
+                continue
+            starts.append(read.reference_start)
+            ends.append(read.reference_end)
+            if len(starts) == BUFFER_SIZE:
+                add_reads(delta, starts, ends, bin_size)
+                starts, ends = [], []
+    add_reads(delta, starts, ends, bin_size)
+    return np.cumsum(delta[:-1]).astype(np.int32)
+
+
+def add_reads(delta, starts, ends, bin_size):
+    if not starts:
+        return
+    first = np.array(starts, dtype=np.int64) // bin_size
+    last = (np.array(ends, dtype=np.int64) - 1) // bin_size + 1
+    n = len(delta)
+    delta += np.bincount(np.minimum(first, n - 1), minlength=n)
+    delta -= np.bincount(np.minimum(last, n - 1), minlength=n)
+
+
+def poisson_expected(mu):
+    """
+    AUC, X-intercept and elbow point of a Poisson sample with mean coverage mu, as the synthetic
+    values of plotFingerprint.
+    """
+    if mu <= 0:
+        return 0.0, 1.0, 1.0
+    x = np.arange(int(mu + 10 * math.sqrt(mu) + 10))
+    log_pmf = x * math.log(mu) - mu - np.array([math.lgamma(value + 1) for value in x])
+    pmf = np.exp(log_pmf)
+    cdf = np.cumsum(pmf)
+    cs = np.cumsum(pmf * x)
+    cs /= cs.max()
+    x_intercept = cdf[np.nonzero(cs)[0][0]]
+    auc = float((pmf * cs).sum())
+    elbow = cdf[np.argmax(cdf - cs)]
+    return auc, float(x_intercept), float(elbow)
+
+
+def fingerprint_metrics(reads):
+    """
+    AUC, X-intercept and elbow point of the fingerprint of a vector of bin counts.
+    """
+    counts = np.cumsum(np.sort(reads)).astype(np.float64)
+    if len(counts) < 2 or counts[-1] == 0:
+        return 0.0, 1.0, 1.0
+    counts /= counts[-1]
+    line = np.arange(len(counts)) / float(len(counts) - 1)
+    auc = counts.sum() / float(len(counts))
+    x_intercept = (np.argmax(counts > 0) + 1) / float(len(counts))
+    elbow = (np.argmax(line - counts) + 1) / float(len(counts))
+    return float(auc), float(x_intercept), float(elbow)
+
+
+def plot_fingerprint(reads, label, path):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    counts = np.cumsum(np.sort(reads)).astype(np.float64)
+    if len(counts) and counts[-1] > 0:
+        counts /= counts[-1]
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.plot(np.arange(len(counts)) / float(max(len(counts), 1)), counts, label=label)
+    ax.set_xlabel("rank")
+    ax.set_ylabel("fraction w.r.t. bin with highest coverage")
+    ax.legend(loc="upper left")
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    with pysam.AlignmentFile(args.bam, "rb") as bam:
+        chroms = list(zip(bam.references, bam.lengths))
+
+    with Pool(max(1, args.threads)) as pool:
+        vectors = pool.map(count_chrom, [(args.bam, chrom, size, args.bin_size) for chrom, size in chroms])
+    counts = np.concatenate(vectors) if vectors else np.zeros(0, dtype=np.int32)
+
+    np.savez_compressed(
+        "{}.bincounts.npz".format(args.prefix),
+        counts=counts,
+        label=np.array(args.label),
+        chroms=np.array([chrom for chrom, _ in chroms]),
+        chrom_sizes=np.array([size for _, size in chroms], dtype=np.int64),
+        bin_size=np.array(args.bin_size),
+    )
+    print("{}: {} bins, {} counts".format(args.label, len(counts), int(counts.sum())))
+
+    # Evenly spaced bins, as the regions sampled by plotFingerprint
+    reads = counts
+    if len(reads) > args.number_of_samples:
+        reads = reads[np.linspace(0, len(reads) - 1, args.number_of_samples).astype(np.int64)]
+    if args.skip_zeros:
+        reads = reads[reads > 0]
+
+    with open("{}.plotFingerprint.raw.txt".format(args.prefix), "w") as fout:
+        fout.write("#plotFingerprint --outRawCounts\n")
+        fout.write("'{}'\n".format(args.label))
+        np.savetxt(fout, reads, fmt="%d")
+
+    auc, x_intercept, elbow = fingerprint_metrics(reads)
+    expected = poisson_expected(float(reads.mean()) if len(reads) else 0.0)
+    with open("{}.plotFingerprint.qcmetrics.txt".format(args.prefix), "w") as fout:
+        fout.write("Sample\tAUC\tSynthetic AUC\tX-intercept\tSynthetic X-intercept\tElbow Point\tSynthetic Elbow Point\n")
+        fout.write(
+            "{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(
+                args.label, auc, expected[0], x_intercept, expected[1], elbow, expected[2]
+            )
+        )
+
+    if args.plot:
+        plot_fingerprint(reads, args.label, "{}.plotFingerprint.pdf".format(args.prefix))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+#!/usr/bin/env python
+"""
+Write the samtools flagstat, idxstats and stats reports and the fragment length table of a BAM
+file from one scan.
+
+Replaces the SAMTOOLS_STATS, SAMTOOLS_FLAGSTAT and SAMTOOLS_IDXSTATS tasks and the samtools view,
+sort and uniq chain of the fragment length table. Contigs are read by parallel workers from the
+index, the unplaced reads last, and the counters of all workers are added up.
+
+The flagstat and idxstats reports are identical to those of samtools. The stats report has the
+summary numbers (SN) of samtools stats with the same definitions, followed by the insert size (IS),
+read length (RL, FRL, LRL), mapping quality (MAPQ) and indel length (ID) sections. The checksum,
+per-cycle quality, base composition, GC and coverage sections are not written. The fragment length
+table has the layout of the fragment length table of the pipeline: the absolute template length of
+every mapped record and half the number of records with that length, in lexical order.
+"""
+
+import sys
+import math
+import argparse
+from collections import Counter
+from multiprocessing import Pool
+
+import numpy as np
+import pysam
+
+## Largest insert size of the IS section, larger inserts are added to the last bin as samtools stats -i
+MAX_INSERT_SIZE = 8000
+
+## Fraction of pairs used for the insert size average and deviation as samtools stats -m
+INSERT_MAIN_BULK = 0.99
+
+## Flagstat counters in report order
+FLAGSTAT_KEYS = [
+    "total",
+    "primary",
+    "secondary",
+    "supplementary",
+    "duplicates",
+    "primary_duplicates",
+    "mapped",
+    "primary_mapped",
+    "paired",
+    "read1",
+    "read2",
+    "proper_pair",
+    "pair_mapped",
+    "singletons",
+    "diff_chr",
+    "diff_chr_mapq5",
+]
+
+## Stats counters of primary reads
+STATS_KEYS = [
+    "first",
+    "last",
+    "other",
+    "mapped",
+    "paired_and_mapped",
+    "unmapped",
+    "proper_pair",
+    "paired",
+    "duplicated",
+    "mq0",
+    "qc_failed",
+    "secondary",
+    "supplementary",
+    "total_length",
+    "first_length",
+    "last_length",
+    "bases_mapped",
+    "bases_mapped_cigar",
+    "bases_duplicated",
+    "mismatches",
+    "quality_sum",
+    "anomalous",
+]
+
+## Cigar operations counted as mapped bases: M, I, = and X
+CIGAR_MAPPED = (0, 1, 7, 8)
+
+
+def parse_args(args=None):
+    Description = "Write samtools flagstat, idxstats and stats reports and the fragment lengths of a BAM file in one scan."
+    Epilog = "Example usage: python bam_stats.py --bam sample.bam --prefix sample --sample_id sample"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--bam", required=True, help="Coordinate-sorted and indexed BAM file.")
+    parser.add_argument("--prefix", required=True, help="Prefix of the stats, flagstat and idxstats reports.")
+    parser.add_argument("--sample_id", required=True, help="Prefix of the fragment length table.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes.")
+    return parser.parse_args(args)
+
+
+def add_alignment(read, stats, indels):
+    """
+    Add the mapped bases, mismatches and indels of an alignment.
+    """
+    for op, op_length in read.cigartuples or []:
+        if op in CIGAR_MAPPED:
+            stats["bases_mapped_cigar"] += op_length
+        if op == 1:
+            indels["ins"][op_length] += 1
+        elif op == 2:
+            indels["del"][op_length] += 1
+    if read.has_tag("NM"):
+        stats["mismatches"] += read.get_tag("NM")
+
+
+def scan_contig(task):
+    """
+    Worker: the counters of the reads of one contig, or of the unplaced reads for '*'.
+    """
+    bam_path, contig = task
+    flagstat = np.zeros((len(FLAGSTAT_KEYS), 2), dtype=np.int64)
+    stats = dict.fromkeys(STATS_KEYS, 0)
+    maximum = {"all": 0, "first": 0, "last": 0}
+    read_lengths = {"all": Counter(), "first": Counter(), "last": Counter()}
+    mapq = Counter()
+    indels = {"ins": Counter(), "del": Counter()}
+    # Insert sizes counted once per mate as inward, outward and other
+    isize = np.zeros((MAX_INSERT_SIZE, 3), dtype=np.int64)
+    fragments = Counter()
+    placed_mapped = placed_unmapped = 0
+    fs = {key: i for i, key in enumerate(FLAGSTAT_KEYS)}
+
+    with pysam.AlignmentFile(bam_path, "rb") as bam:
+        for read in bam.fetch(contig):
+            flag = read.flag
+            qc = 1 if flag & 0x200 else 0
+            unmapped = flag & 0x4
+            if unmapped:
+                placed_unmapped += 1
+            else:
+                placed_mapped += 1
+                fragments[abs(read.template_length)] += 1
+
+            # samtools flagstat
+            flagstat[fs["total"], qc] += 1
+            if flag & 0x100:
+                flagstat[fs["secondary"], qc] += 1
+            elif flag & 0x800:
+                flagstat[fs["supplementary"], qc] += 1
+            else:
+                flagstat[fs["primary"], qc] += 1
+                if flag & 0x1:
+                    flagstat[fs["paired"], qc] += 1
+                    if flag & 0x2 and not unmapped:
+                        flagstat[fs["proper_pair"], qc] += 1
+                    if flag & 0x40:
+                        flagstat[fs["read1"], qc] += 1
+                    if flag & 0x80:
+                        flagstat[fs["read2"], qc] += 1
+                    if flag & 0x8 and not unmapped:
+                        flagstat[fs["singletons"], qc] += 1
+                    if not unmapped and not flag & 0x8:
+                        flagstat[fs["pair_mapped"], qc] += 1
+                        if read.next_reference_id != read.reference_id:
+                            flagstat[fs["diff_chr"], qc] += 1
+                            if read.mapping_quality >= 5:
+                                flagstat[fs["diff_chr_mapq5"], qc] += 1
+                if not unmapped:
+                    flagstat[fs["primary_mapped"], qc] += 1
+                if flag & 0x400:
+                    flagstat[fs["primary_duplicates"], qc] += 1
+            if not unmapped:
+                flagstat[fs["mapped"], qc] += 1
+            if flag & 0x400:
+                flagstat[fs["duplicates"], qc] += 1
+
+            # samtools stats, secondary alignments are only counted and supplementary alignments
+            # only add their mapped bases, mismatches and indels
+            if flag & 0x100:
+                stats["secondary"] += 1
+                continue
+            if flag & 0x800:
+                stats["supplementary"] += 1
+                if not unmapped:
+                    add_alignment(read, stats, indels)
+                continue
+
+            length = read.query_length
+            if flag & 0x1 and flag & 0x40:
+                order = "first"
+            elif flag & 0x1 and flag & 0x80:
+                order = "last"
+            elif flag & 0x1:
+                order = "other"
+            else:
+                order = "first"
+            stats[order] += 1
+            stats["total_length"] += length
+            read_lengths["all"][length] += 1
+            maximum["all"] = max(maximum["all"], length)
+            if order != "other":
+                stats[order + "_length"] += length
+                read_lengths[order][length] += 1
+                maximum[order] = max(maximum[order], length)
+            qualities = read.query_qualities
+            if qualities is not None:
+                stats["quality_sum"] += sum(qualities)
+            if qc:
+                stats["qc_failed"] += 1
+            if flag & 0x1:
+                stats["paired"] += 1
+            if flag & 0x400:
+                stats["duplicated"] += 1
+                stats["bases_duplicated"] += length
+            if not flag & (0x4 | 0x100 | 0x800 | 0x200 | 0x400):
+                mapq[read.mapping_quality] += 1
+
+            if unmapped:
+                stats["unmapped"] += 1
+                continue
+
+            stats["mapped"] += 1
+            stats["bases_mapped"] += length
+            if read.mapping_quality == 0:
+                stats["mq0"] += 1
+            if flag & 0x2:
+                stats["proper_pair"] += 1
+            add_alignment(read, stats, indels)
+
+            if not flag & 0x1 or flag & 0x8:
+                continue
+            stats["paired_and_mapped"] += 1
+            if read.next_reference_id != read.reference_id:
+                stats["anomalous"] += 1
+            size = min(abs(read.template_length), MAX_INSERT_SIZE - 1)
+            if size > 0 or read.next_reference_id == read.reference_id:
+                pos_fst = read.next_reference_start - read.reference_start
+                is_fst = 1 if flag & 0x40 else -1
+                is_fwd = -1 if flag & 0x10 else 1
+                is_mfwd = -1 if flag & 0x20 else 1
+                if is_fwd * is_mfwd > 0:
+                    isize[size, 2] += 1
+                elif pos_fst == 0 or (is_fst * pos_fst > 0) == (is_fst * is_fwd > 0):
+                    isize[size, 0] += 1
+                else:
+                    isize[size, 1] += 1
+
+    return {
+        "contig": contig,
+        "placed": (placed_mapped, placed_unmapped),
+        "flagstat": flagstat,
+        "stats": stats,
+        "maximum": maximum,
+        "read_lengths": read_lengths,
+        "mapq": mapq,
+        "indels": indels,
+        "isize": isize,
+        "fragments": fragments,
+    }
+
+
+def merge_results(results):
+    """
+    Add up the counters of all workers.
+    """
+    merged = {
+        "flagstat": sum(result["flagstat"] for result in results),
+        "stats": Counter(),
+        "maximum": {"all": 0, "first": 0, "last": 0},
+        "read_lengths": {"all": Counter(), "first": Counter(), "last": Counter()},
+        "mapq": Counter(),
+        "indels": {"ins": Counter(), "del": Counter()},
+        "isize": sum(result["isize"] for result in results),
+        "fragments": Counter(),
+    }
+    for result in results:
+        merged["stats"].update(result["stats"])
+        merged["mapq"].update(result["mapq"])
+        merged["fragments"].update(result["fragments"])
+        for key in merged["maximum"]:
+            merged["maximum"][key] = max(merged["maximum"][key], result["maximum"][key])
+            merged["read_lengths"][key].update(result["read_lengths"][key])
+        for key in merged["indels"]:
+            merged["indels"][key].update(result["indels"][key])
+    return merged
+
+
+def percent(n, total):
+    return "{:.2f}%".format(100.0 * n / total) if total else "N/A"
+
+
+def write_flagstat(path, counts):
+    c = {key: counts[i] for i, key in enumerate(FLAGSTAT_KEYS)}
+    lines = [
+        "{} + {} in total (QC-passed reads + QC-failed reads)",
+        "{} + {} primary",
+        "{} + {} secondary",
+        "{} + {} supplementary",
+        "{} + {} duplicates",
+        "{} + {} primary duplicates",
+    ]
+    keys = ["total", "primary", "secondary", "supplementary", "duplicates", "primary_duplicates"]
+    with open(path, "w") as fout:
+        for line, key in zip(lines, keys):
+            fout.write(line.format(*c[key]) + "\n")
+        for label, key, total in [("mapped", "mapped", "total"), ("primary mapped", "primary_mapped", "primary")]:
+            fout.write(
+                "{} + {} {} ({} : {})\n".format(
+                    c[key][0], c[key][1], label, percent(c[key][0], c[total][0]), percent(c[key][1], c[total][1])
+                )
+            )
+        fout.write("{} + {} paired in sequencing\n".format(*c["paired"]))
+        fout.write("{} + {} read1\n".format(*c["read1"]))
+        fout.write("{} + {} read2\n".format(*c["read2"]))
+        fout.write(
+            "{} + {} properly paired ({} : {})\n".format(
+                c["proper_pair"][0],
+                c["proper_pair"][1],
+                percent(c["proper_pair"][0], c["paired"][0]),
+                percent(c["proper_pair"][1], c["paired"][1]),
+            )
+        )
+        fout.write("{} + {} with itself and mate mapped\n".format(*c["pair_mapped"]))
+        fout.write(
+            "{} + {} singletons ({} : {})\n".format(
+                c["singletons"][0],
+                c["singletons"][1],
+                percent(c["singletons"][0], c["paired"][0]),
+                percent(c["singletons"][1], c["paired"][1]),
+            )
+        )
+        fout.write("{} + {} with mate mapped to a different chr\n".format(*c["diff_chr"]))
+        fout.write("{} + {} with mate mapped to a different chr (mapQ>=5)\n".format(*c["diff_chr_mapq5"]))
+
+
+def write_idxstats(path, contigs, results):
+    placed = {result["contig"]: result["placed"] for result in results}
+    with open(path, "w") as fout:
+        for contig, length in contigs:
+            fout.write("{}\t{}\t{}\t{}\n".format(contig, length, *placed[contig]))
+        fout.write("*\t0\t0\t{}\n".format(sum(placed["*"])))
+
+
+def ratio32(numerator, denominator):
+    """
+    Single precision ratio, as the float arithmetic of samtools stats.
+    """
+    return float(np.float32(numerator) / np.float32(denominator)) if denominator else 0.0
+
+
+def write_stats(path, bam_path, merged):
+    s = merged["stats"]
+    maximum = merged["maximum"]
+    sequences = s["first"] + s["last"] + s["other"]
+
+    # Each pair was counted by both mates
+    isize = merged["isize"] // 2
+    pair_counts = isize.sum(axis=1)
+    n_pairs = int(pair_counts.sum())
+    bulk = 0
+    average = 0.0
+    last_bin = 0
+    for size in range(len(pair_counts)):
+        bulk += int(pair_counts[size])
+        average += size * int(pair_counts[size])
+        if n_pairs and bulk / n_pairs > INSERT_MAIN_BULK:
+            last_bin = size + 1
+            n_pairs = bulk
+            break
+    average = average / n_pairs if n_pairs else 0.0
+    deviation = 0.0
+    for size in range(1, last_bin):
+        deviation += int(pair_counts[size]) * (size - average) ** 2 / n_pairs
+    deviation = math.sqrt(deviation)
+
+    def average_length(total, n):
+        return "{:.0f}".format(total / n) if n else "0"
+
+    summary = [
+        ("raw total sequences", sequences, "excluding supplementary and secondary reads"),
+        ("filtered sequences", 0, None),
+        ("sequences", sequences, None),
+        ("is sorted", 1, "sorted by coordinate"),
+        ("1st fragments", s["first"], None),
+        ("last fragments", s["last"], None),
+        ("reads mapped", s["mapped"], None),
+        ("reads mapped and paired", s["paired_and_mapped"], "paired-end technology bit set + both mates mapped"),
+        ("reads unmapped", s["unmapped"], None),
+        ("reads properly paired", s["proper_pair"], "proper-pair bit set"),
+        ("reads paired", s["paired"], "paired-end technology bit set"),
+        ("reads duplicated", s["duplicated"], "PCR or optical duplicate bit set"),
+        ("reads MQ0", s["mq0"], "mapped and MQ=0"),
+        ("reads QC failed", s["qc_failed"], None),
+        ("non-primary alignments", s["secondary"], None),
+        ("supplementary alignments", s["supplementary"], None),
+        ("total length", s["total_length"], "ignores clipping"),
+        ("total first fragment length", s["first_length"], "ignores clipping"),
+        ("total last fragment length", s["last_length"], "ignores clipping"),
+        ("bases mapped", s["bases_mapped"], "ignores clipping"),
+        ("bases mapped (cigar)", s["bases_mapped_cigar"], "more accurate"),
+        ("bases trimmed", 0, None),
+        ("bases duplicated", s["bases_duplicated"], None),
+        ("mismatches", s["mismatches"], "from NM fields"),
+        (
+            "error rate",
+            "{:e}".format(ratio32(s["mismatches"], s["bases_mapped_cigar"])),
+            "mismatches / bases mapped (cigar)",
+        ),
+        ("average length", average_length(s["total_length"], sequences), None),
+        ("average first fragment length", average_length(s["first_length"], s["first"]), None),
+        ("average last fragment length", average_length(s["last_length"], s["last"]), None),
+        ("maximum length", maximum["all"], None),
+        ("maximum first fragment length", maximum["first"], None),
+        ("maximum last fragment length", maximum["last"], None),
+        (
+            "average quality",
+            "{:.1f}".format(s["quality_sum"] / s["total_length"] if s["total_length"] else 0.0),
+            None,
+        ),
+        ("insert size average", "{:.1f}".format(average), None),
+        ("insert size standard deviation", "{:.1f}".format(deviation), None),
+        ("inward oriented pairs", int(isize[:, 0].sum()), None),
+        ("outward oriented pairs", int(isize[:, 1].sum()), None),
+        ("pairs with other orientation", int(isize[:, 2].sum()), None),
+        ("pairs on different chromosomes", s["anomalous"] // 2, None),
+        (
+            "percentage of properly paired reads (%)",
+            "{:.1f}".format(ratio32(100 * s["proper_pair"], sequences)),
+            None,
+        ),
+    ]
+
+    with open(path, "w") as fout:
+        fout.write(
+            "# This file was produced by samtools stats (bam_stats.py) and can be plotted using plot-bamstats\n"
+        )
+        fout.write("# This file contains statistics for all reads.\n")
+        fout.write("# The command line was:  stats {}\n".format(bam_path))
+        fout.write("# Summary Numbers. Use `grep ^SN | cut -f 2-` to extract this part.\n")
+        for label, value, comment in summary:
+            fout.write("SN\t{}:\t{}{}\n".format(label, value, "\t# " + comment if comment else ""))
+
+        fout.write(
+            "# Insert sizes. Use `grep ^IS | cut -f 2-` to extract this part. The columns are: insert size, "
+            "pairs total, inward oriented pairs, outward oriented pairs, other pairs\n"
+        )
+        for size in range(last_bin):
+            inward, outward, other = (int(value) for value in isize[size])
+            fout.write("IS\t{}\t{}\t{}\t{}\t{}\n".format(size, inward + outward + other, inward, outward, other))
+
+        for tag, key, title in [
+            ("RL", "all", "Read lengths"),
+            ("FRL", "first", "Read lengths - first fragments"),
+            ("LRL", "last", "Read lengths - last fragments"),
+        ]:
+            fout.write(
+                "# {}. Use `grep ^{} | cut -f 2-` to extract this part. The columns are: read length, count\n".format(
+                    title, tag
+                )
+            )
+            for length in sorted(merged["read_lengths"][key]):
+                fout.write("{}\t{}\t{}\n".format(tag, length, merged["read_lengths"][key][length]))
+
+        fout.write(
+            "# Mapping qualities for reads !(UNMAP|SECOND|SUPPL|QCFAIL|DUP). Use `grep ^MAPQ | cut -f 2-` to "
+            "extract this part. The columns are: mapq, count\n"
+        )
+        for quality in sorted(merged["mapq"]):
+            fout.write("MAPQ\t{}\t{}\n".format(quality, merged["mapq"][quality]))
+
+        fout.write(
+            "# Indel distribution. Use `grep ^ID | cut -f 2-` to extract this part. The columns are: length, "
+            "number of insertions, number of deletions\n"
+        )
+        insertions, deletions = merged["indels"]["ins"], merged["indels"]["del"]
+        for length in sorted(set(insertions) | set(deletions)):
+            fout.write("ID\t{}\t{}\t{}\n".format(length, insertions[length], deletions[length]))
+
+
+def write_fragments(path, fragments):
+    """
+    Absolute template length and half the number of mapped records with that length, in the
+    lexical order and number format of the sort, uniq and awk chain it replaces.
+    """
+    with open(path, "w") as fout:
+        for size in sorted(fragments, key=str):
+            count = fragments[size] / 2
+            fout.write("{}\t{}\n".format(size, int(count) if count == int(count) else "{:.6g}".format(count)))
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    with pysam.AlignmentFile(args.bam, "rb") as bam:
+        if not bam.has_index():
+            print("ERROR: BAM file is not indexed: {}".format(args.bam))
+            sys.exit(1)
+        contigs = list(zip(bam.references, bam.lengths))
+
+    with Pool(max(1, args.threads)) as pool:
+        results = pool.map(scan_contig, [(args.bam, contig) for contig, _ in contigs] + [(args.bam, "*")])
+    merged = merge_results(results)
+
+    write_flagstat("{}.flagstat".format(args.prefix), merged["flagstat"].tolist())
+    write_idxstats("{}.idxstats".format(args.prefix), contigs, results)
+    write_stats("{}.stats".format(args.prefix), args.bam, merged)
+    write_fragments("{}.frags.len.txt".format(args.sample_id), merged["fragments"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Build scaled genome coverage from an indexed BAM file and write the bedGraph and bigWig in one step.
+
+Replaces the bedtools genomecov, bedtools sort, bedClip and bedGraphToBigWig chain. Each chromosome
+is processed by a separate worker which collects the start and end of every read (or fragment with
+--pair_fragments, as bedtools genomecov -pc) as a sparse difference array and accumulates it into
+runs of equal depth. Intervals are clipped to the chromosome sizes as they are read, and runs are
+written sorted by chromosome name and start as required by SEACR and bigWig.
+"""
+
+import sys
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import pysam
+import pyBigWig
+
+
+def parse_args(args=None):
+    Description = "Build scaled bedGraph and bigWig coverage tracks from an indexed BAM file."
+    Epilog = "Example usage: python bam_to_coverage.py --bam sample.bam --chrom_sizes genome.sizes --prefix sample"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--bam", required=True, help="Coordinate-sorted and indexed BAM file.")
+    parser.add_argument("--chrom_sizes", required=True, help="Tab-separated chromosome sizes file.")
+    parser.add_argument("--prefix", required=True, help="Output prefix for the .bedGraph and .bigWig files.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Scale factor applied to the depth.")
+    parser.add_argument(
+        "--pair_fragments",
+        action="store_true",
+        help="Count the coverage of whole paired-end fragments instead of reads (bedtools genomecov -pc).",
+    )
+    parser.add_argument("--threads", type=int, default=1, help="Number of chromosomes processed in parallel.")
+    return parser.parse_args(args)
+
+
+def read_chrom_sizes(path):
+    sizes = {}
+    with open(path, "r") as fin:
+        for line in fin:
+            cols = line.split()
+            if len(cols) >= 2:
+                sizes[cols[0]] = int(cols[1])
+    return sizes
+
+
+def coverage_runs(starts, ends):
+    """
+    Accumulate half-open intervals into runs of equal, non-zero depth.
+
+    Returns the run starts, ends and integer depths as numpy arrays.
+    """
+    if len(starts) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    pos = np.concatenate((starts, ends))
+    delta = np.concatenate((np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)))
+    order = np.argsort(pos, kind="stable")
+    pos = pos[order]
+    delta = delta[order]
+
+    breaks, first = np.unique(pos, return_index=True)
+    depth = np.cumsum(np.add.reduceat(delta, first))[:-1]
+
+    # Merge neighbouring intervals with the same depth
+    change = np.ones(len(depth), dtype=bool)
+    change[1:] = depth[1:] != depth[:-1]
+    run_starts = breaks[:-1][change]
+    run_depth = depth[change]
+    run_ends = np.append(run_starts[1:], breaks[-1])
+
+    keep = run_depth != 0
+    return run_starts[keep], run_ends[keep], run_depth[keep]
+
+
+def chrom_coverage(task):
+    """
+    Worker: collect the intervals of one chromosome and return its coverage runs.
+    """
+    bam_path, chrom, size, pair_fragments = task
+    starts = []
+    ends = []
+    with pysam.AlignmentFile(bam_path, "rb") as bam:
+        for read in bam.fetch(chrom):
+            if read.is_unmapped:
+                continue
+            if pair_fragments:
+                if read.is_paired and (not read.is_proper_pair or read.mate_is_unmapped):
+                    continue
+                if read.template_length <= 0:
+                    continue
+                start = read.reference_start
+                end = start + read.template_length
+            else:
+                start = read.reference_start
+                end = read.reference_end
+            if start >= size:
+                continue
+            starts.append(start)
+            ends.append(min(end, size))
+
+    run_starts, run_ends, run_depth = coverage_runs(
+        np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+    )
+    return chrom, run_starts, run_ends, run_depth
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    sizes = read_chrom_sizes(args.chrom_sizes)
+    with pysam.AlignmentFile(args.bam, "rb") as bam:
+        if not bam.has_index():
+            print("ERROR: BAM file {} is not indexed".format(args.bam))
+            sys.exit(1)
+        chroms = sorted(chrom for chrom in bam.references if chrom in sizes)
+
+    bigwig = pyBigWig.open(args.prefix + ".bigWig", "w")
+    bigwig.addHeader([(chrom, sizes[chrom]) for chrom in chroms])
+
+    tasks = [(args.bam, chrom, sizes[chrom], args.pair_fragments) for chrom in chroms]
+    with Pool(max(1, args.threads)) as pool, open(args.prefix + ".bedGraph", "w") as fout:
+        for chrom, run_starts, run_ends, run_depth in pool.imap(chrom_coverage, tasks):
+            if len(run_starts) == 0:
+                continue
+            values = run_depth * args.scale
+            fout.writelines(
+                "{}\t{}\t{}\t{:g}\n".format(chrom, start, end, value)
+                for start, end, value in zip(run_starts.tolist(), run_ends.tolist(), values.tolist())
+            )
+            bigwig.addEntries(
+                [chrom] * len(run_starts), run_starts.tolist(), ends=run_ends.tolist(), values=values.tolist()
+            )
+
+    bigwig.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Extract paired-end fragments from a coordinate-sorted BAM file in a single streaming pass.
+
+Mates are paired in a buffer keyed by read name. Only reads within --max_fragment_length of
+the current position are kept in the buffer, so memory is bounded by the local read depth and
+no name sort is needed. A fragment is written when both mates are on the same chromosome and
+span less than --max_fragment_length, matching the previous bamtobed -bedpe and awk filter.
+Fragments are written as a 3-column BED sorted by start position, optionally bgzipped and
+tabix-indexed, and optionally to a columnar fragment store (see fragment_store.py).
+"""
+
+import sys
+import heapq
+import argparse
+from collections import OrderedDict
+
+import pysam
+
+from fragment_store import FragmentStoreWriter
+
+SKIP_FLAGS = 0x4 | 0x8 | 0x100 | 0x200 | 0x800
+
+
+def parse_args(args=None):
+    Description = "Extract paired-end fragments from a coordinate-sorted BAM file."
+    Epilog = "Example usage: python bam_to_fragments.py --bam sample.bam --output sample.frags.bed"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--bam", required=True, help="Coordinate-sorted BAM file.")
+    parser.add_argument("--output", required=True, help="Output fragments BED file.")
+    parser.add_argument("--max_fragment_length", type=int, default=1000, help="Keep fragments shorter than this.")
+    parser.add_argument("--bgzip", action="store_true", help="Compress the output with bgzip and index with tabix.")
+    parser.add_argument("--store", default=None, help="Also write the fragments to this fragment store.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of BAM decompression threads.")
+    return parser.parse_args(args)
+
+
+def iter_fragments(reads, max_fragment_length):
+    """
+    Pair mates from coordinate-sorted reads and yield (chrom, start, end) fragments in start order.
+
+    reads yields (chrom, name, flag, start, end) tuples.
+    """
+    pending = OrderedDict()
+    completed = []
+    chrom = None
+
+    for read_chrom, name, flag, start, end in reads:
+        if flag & SKIP_FLAGS or not flag & 0x1:
+            continue
+
+        if read_chrom != chrom:
+            while completed:
+                yield heapq.heappop(completed)
+            pending.clear()
+            chrom = read_chrom
+
+        # Mates further away than the maximum fragment length can no longer produce a fragment
+        while pending:
+            oldest = next(iter(pending))
+            if pending[oldest][0] > start - max_fragment_length:
+                break
+            del pending[oldest]
+
+        mate = pending.pop(name, None)
+        if mate is None:
+            pending[name] = (start, end)
+        else:
+            frag_start = min(mate[0], start)
+            frag_end = max(mate[1], end)
+            if frag_end - frag_start < max_fragment_length:
+                heapq.heappush(completed, (chrom, frag_start, frag_end))
+
+        # Fragments starting before the oldest unpaired read are final
+        limit = pending[next(iter(pending))][0] if pending else start
+        while completed and completed[0][1] < limit:
+            yield heapq.heappop(completed)
+
+    while completed:
+        yield heapq.heappop(completed)
+
+
+def iter_bam(path, threads):
+    with pysam.AlignmentFile(path, "rb", threads=threads) as bam:
+        for read in bam.fetch(until_eof=True):
+            if read.is_unmapped:
+                continue
+            yield read.reference_name, read.query_name, read.flag, read.reference_start, read.reference_end
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    count = 0
+    writer = FragmentStoreWriter(args.store) if args.store else None
+    chrom_starts = []
+    chrom_ends = []
+    current = None
+    with open(args.output, "w") as fout:
+        for chrom, start, end in iter_fragments(iter_bam(args.bam, args.threads), args.max_fragment_length):
+            fout.write("{}\t{}\t{}\n".format(chrom, start, end))
+            count += 1
+            if writer:
+                if chrom != current:
+                    if current is not None:
+                        writer.add(current, chrom_starts, chrom_ends)
+                    chrom_starts, chrom_ends, current = [], [], chrom
+                chrom_starts.append(start)
+                chrom_ends.append(end)
+    if writer:
+        if current is not None:
+            writer.add(current, chrom_starts, chrom_ends)
+        writer.close()
+
+    if args.bgzip:
+        pysam.tabix_index(args.output, preset="bed", force=True)
+
+    print("Fragments written: {}".format(count))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Build consensus peaks by a streaming k-way merge of the replicate peak files of a group.
+
+Replaces the sort, bedtools merge and awk chain of CONSENSUS_PEAKS. Each peak file is read in
+order, so only the current cluster of overlapping or book-ended peaks is held in memory. Replicate
+membership is tracked as integer ids of the seventh column (the peak file name) and the minimum
+replicate filter is applied as every merged region is written.
+
+The merged file has the layout of bedtools merge -c 2,3,4,5,6,7,7
+-o collapse,collapse,collapse,collapse,collapse,collapse,count_distinct, with the peaks of a region
+in the order of sort -k1,1 -k2,2n, and the filtered file keeps the merged regions found in at least
+--min_replicates peak files.
+"""
+
+import sys
+import heapq
+import argparse
+
+
+def parse_args(args=None):
+    Description = "Build merged and replicate-filtered consensus peaks from replicate peak files."
+    Epilog = "Example usage: python build_consensus_peaks.py --peaks rep1.bed rep2.bed --merged merged.bed --filtered consensus.bed"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--peaks", required=True, nargs="+", help="Replicate peak BED files with the peak file name in column 7.")
+    parser.add_argument("--merged", required=True, help="Output merged peaks with replicate counts.")
+    parser.add_argument("--filtered", required=True, help="Output consensus peaks passing the replicate filter.")
+    parser.add_argument(
+        "--min_replicates", type=float, default=1, help="Minimum number of peak files a consensus peak is found in."
+    )
+    return parser.parse_args(args)
+
+
+def sort_key(line):
+    """
+    Key of sort -k1,1 -k2,2n in the C locale, with the whole line as the last resort comparison.
+    """
+    cols = line.split("\t", 2)
+    return cols[0], int(cols[1]), line
+
+
+def read_keys(path):
+    with open(path, "r") as fin:
+        for line in fin:
+            if line.strip():
+                yield sort_key(line.rstrip("\n"))
+
+
+def iter_peaks(path):
+    """
+    Yield the sort keys of the peaks of one file in sort order. Files that are already sorted are
+    streamed, others are sorted in memory.
+    """
+    previous = None
+    for key in read_keys(path):
+        if previous is not None and key < previous:
+            return iter(sorted(read_keys(path)))
+        previous = key
+    return read_keys(path)
+
+
+def write_region(fout_merged, fout_filtered, chrom, start, end, members, names, min_replicates):
+    replicates = len({name for name, _ in members})
+    columns = [",".join(fields[i] for _, fields in members) for i in range(5)]
+    line = "\t".join(
+        [chrom, str(start), str(end)] + columns + [",".join(names[name] for name, _ in members), str(replicates)]
+    )
+    fout_merged.write(line + "\n")
+    if replicates >= min_replicates:
+        fout_filtered.write(line + "\n")
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    name_ids = {}
+    names = []
+
+    chrom = None
+    start = end = 0
+    members = []
+    with open(args.merged, "w") as fout_merged, open(args.filtered, "w") as fout_filtered:
+        for peak_chrom, peak_start, line in heapq.merge(*[iter_peaks(path) for path in args.peaks]):
+            cols = line.split("\t")
+            if len(cols) < 7:
+                print("ERROR: Expected at least 7 columns in peak line: {}".format(line))
+                sys.exit(1)
+            peak_end = int(cols[2])
+            name = name_ids.setdefault(cols[6], len(names))
+            if name == len(names):
+                names.append(cols[6])
+
+            if peak_chrom == chrom and peak_start <= end:
+                end = max(end, peak_end)
+                members.append((name, cols[1:6]))
+                continue
+
+            if members:
+                write_region(fout_merged, fout_filtered, chrom, start, end, members, names, args.min_replicates)
+            chrom, start, end = peak_chrom, peak_start, peak_end
+            members = [(name, cols[1:6])]
+
+        if members:
+            write_region(fout_merged, fout_filtered, chrom, start, end, members, names, args.min_replicates)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""
+Calculate the fraction of reads in peaks (FRiP) of every sample against every peak set.
+
+The fragments of each sample are loaded once into per-chromosome sorted start/end arrays and
+counted against all peak sets with vectorised interval searches. A fragment is counted once for
+every peak it overlaps by at least --min_overlap of its own length, the same as
+bedtools intersect -c -f, and the FRiP score is twice the number of fragments in peaks divided
+by the number of mapped reads in the flagstat report.
+
+The samples manifest is a tab-separated file of sample id, fragments file and flagstat file. The
+fragments may be a BED file (plain or gzipped) or a fragment store, which is memory-mapped.
+The peaks manifest is a tab-separated file of peak set name, owner sample id (empty for peak sets
+shared by all samples) and peaks file. The primary peak set is written in the per-sample MultiQC
+layout of PEAK_FRIP, every peak set is written to one FRiP table with a sample per row.
+"""
+
+import os
+import sys
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+from fragment_store import load_fragments, read_intervals
+
+## Number of fragments compared against the peaks in one vectorised block
+BLOCK_SIZE = 1000000
+
+
+def parse_args(args=None):
+    Description = "Calculate the FRiP score of every sample against every peak set."
+    Epilog = "Example usage: python calc_frip.py --samples samples.tsv --peaks peaks.tsv --header frip_header.txt"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--samples", required=True, help="Tab-separated file of sample id, fragments and flagstat.")
+    parser.add_argument("--peaks", required=True, help="Tab-separated file of peak set, owner sample id and peaks.")
+    parser.add_argument("--header", required=True, help="MultiQC header for the per-sample primary FRiP files.")
+    parser.add_argument("--sets_header", default=None, help="MultiQC header for the table of all peak sets.")
+    parser.add_argument("--primary", default="primary", help="Name of the per-sample primary peak set.")
+    parser.add_argument("--min_overlap", type=float, default=0.2, help="Minimum overlap as a fraction of the fragment.")
+    parser.add_argument("--output", default="frip_scores", help="Output prefix of the FRiP table.")
+    parser.add_argument("--primary_dir", default=".", help="Directory for the per-sample primary FRiP files.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of samples processed in parallel.")
+    return parser.parse_args(args)
+
+
+def read_mapped(path):
+    """
+    Number of mapped reads from the first 'mapped (' line of a samtools flagstat report.
+    """
+    with open(path, "r") as fin:
+        for line in fin:
+            if "mapped (" in line:
+                return int(line.split()[0])
+    return 0
+
+
+def window_pairs(lo, hi):
+    """
+    Fragment and peak indices of every peak in the index window [lo, hi) of each fragment.
+    """
+    n_candidates = np.maximum(hi - lo, 0)
+    frag_idx = np.repeat(np.arange(len(lo)), n_candidates)
+    offsets = np.arange(len(frag_idx)) - np.repeat(np.cumsum(n_candidates) - n_candidates, n_candidates)
+    return frag_idx, np.repeat(lo, n_candidates) + offsets
+
+
+def count_in_peaks(frag_starts, frag_ends, peak_starts, peak_ends, min_overlap):
+    """
+    Sum over all fragments of the number of peaks each fragment overlaps by at least
+    min_overlap of its length.
+
+    The overlapping peaks are counted with searches in the peak starts and the sorted peak ends,
+    as consensus_count_matrix.py. A peak that starts in the last required overlap of the fragment
+    or ends in its first required overlap cannot reach it, so those boundary peaks are counted by
+    the same searches and removed; only the peaks in both boundaries and the peaks shorter than
+    the required overlap are compared one by one.
+    """
+    if len(frag_starts) == 0 or len(peak_starts) == 0 or min_overlap > 1:
+        return 0
+    sorted_ends = np.sort(peak_ends)
+    peak_lengths = peak_ends - peak_starts
+    total = 0
+    for block in range(0, len(frag_starts), BLOCK_SIZE):
+        starts = frag_starts[block : block + BLOCK_SIZE]
+        ends = frag_ends[block : block + BLOCK_SIZE]
+        required = min_overlap * (ends - starts)
+
+        # Peaks that start before the fragment end and do not end at or before its start
+        ended = np.searchsorted(sorted_ends, starts, side="right")
+        overlapping = np.searchsorted(peak_starts, ends, side="left") - ended
+
+        # Peaks starting in the last or ending in the first required overlap of the fragment
+        late_lo = np.searchsorted(peak_starts, ends - required, side="right")
+        late = np.maximum(np.searchsorted(peak_starts, ends, side="left") - late_lo, 0)
+        early = np.maximum(np.searchsorted(sorted_ends, starts + required, side="left") - ended, 0)
+
+        # Peaks in both boundaries were removed twice
+        frag_idx, peak_idx = window_pairs(late_lo, late_lo + late)
+        both = np.bincount(
+            frag_idx[peak_ends[peak_idx] < starts[frag_idx] + required[frag_idx]], minlength=len(starts)
+        )
+
+        # Peaks within the fragment, away from both boundaries, but shorter than the required overlap
+        short = np.flatnonzero(peak_lengths < required.max())
+        frag_idx, short_idx = window_pairs(
+            np.searchsorted(peak_starts[short], starts, side="right"),
+            np.searchsorted(peak_starts[short], ends - required, side="right"),
+        )
+        peak_idx = short[short_idx]
+        inside = np.count_nonzero(
+            (peak_ends[peak_idx] >= starts[frag_idx] + required[frag_idx]) & (peak_lengths[peak_idx] < required[frag_idx])
+        )
+
+        total += int((overlapping - late - early + both).sum()) - inside
+    return total
+
+
+## Peak sets shared with the workers, {set: intervals} for all samples and {sample: {set: intervals}}
+SHARED_SETS = {}
+OWNED_SETS = {}
+
+
+def init_worker(shared_sets, owned_sets):
+    global SHARED_SETS, OWNED_SETS
+    SHARED_SETS = shared_sets
+    OWNED_SETS = owned_sets
+
+
+def sample_frip(task):
+    """
+    Worker: load the fragments of one sample once and score them against every applicable peak set.
+    """
+    sample_id, fragments_path, flagstat_path, min_overlap = task
+    fragments = load_fragments(fragments_path)
+    mapped = read_mapped(flagstat_path)
+
+    peak_sets = dict(OWNED_SETS.get(sample_id, {}))
+    peak_sets.update(SHARED_SETS)
+
+    scores = {}
+    for set_name, peaks in peak_sets.items():
+        in_peaks = 0
+        for chrom, (peak_starts, peak_ends) in peaks.items():
+            if chrom in fragments:
+                in_peaks += count_in_peaks(fragments[chrom][0], fragments[chrom][1], peak_starts, peak_ends, min_overlap)
+        scores[set_name] = in_peaks * 2 / mapped if mapped else 0.0
+    return sample_id, scores
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    samples = []
+    with open(args.samples, "r") as fin:
+        for line in fin:
+            if line.strip():
+                samples.append(line.rstrip("\n").split("\t"))
+
+    shared_sets = {}
+    owned_sets = {}
+    with open(args.peaks, "r") as fin:
+        for line in fin:
+            if not line.strip():
+                continue
+            set_name, owner, path = line.rstrip("\n").split("\t")
+            if owner:
+                owned_sets.setdefault(owner, {})[set_name] = read_intervals(path)
+            else:
+                shared_sets[set_name] = read_intervals(path)
+
+    tasks = [(sample_id, fragments, flagstat, args.min_overlap) for sample_id, fragments, flagstat in samples]
+    with Pool(max(1, args.threads), initializer=init_worker, initargs=(shared_sets, owned_sets)) as pool:
+        results = dict(pool.imap(sample_frip, tasks))
+
+    with open(args.header, "r") as fin:
+        header = fin.read()
+    os.makedirs(args.primary_dir, exist_ok=True)
+    for sample_id, scores in results.items():
+        if args.primary in scores:
+            with open(os.path.join(args.primary_dir, "{}_mqc.tsv".format(sample_id)), "w") as fout:
+                fout.write(header)
+                fout.write("Peak FRiP Score\t{:.6g}\n".format(scores[args.primary]))
+
+    set_names = sorted({name for scores in results.values() for name in scores})
+    rows = ["\t".join(["id"] + set_names)]
+    for sample_id in sorted(results):
+        values = [results[sample_id].get(name) for name in set_names]
+        rows.append("\t".join([sample_id] + ["" if value is None else "{:.6g}".format(value) for value in values]))
+
+    with open(args.output + ".tsv", "w") as fout:
+        fout.write("\n".join(rows) + "\n")
+    if args.sets_header:
+        with open(args.sets_header, "r") as fin, open(args.output + "_mqc.tsv", "w") as fout:
+            fout.write(fin.read())
+            fout.write("\n".join(rows) + "\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
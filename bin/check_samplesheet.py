@@ -26,13 +26,22 @@
 
 import os
 import sys
+import zlib
 import errno
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+VALIDATION_MODES = ["none", "quick", "full"]
+REMOTE_PREFIXES = ("http://", "https://", "ftp://", "s3://", "gs://", "az://")
+GZIP_MAGIC = b"\x1f\x8b\x08"
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+TAIL_WINDOW = 4 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
 
 
 def parse_args(args=None):
     Description = "Reformat nf-core/cutandrun samplesheet file and check its contents."
-    Epilog = "Example usage: python check_samplesheet.py <FILE_IN> <FILE_OUT> <USE_CONTROL>"
+    Epilog = "Example usage: python check_samplesheet.py <FILE_IN> <FILE_OUT> <USE_CONTROL> [--validate_fastq quick]"
 
     parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
     parser.add_argument("FILE_IN", help="Input samplesheet file.")
@@ -41,6 +50,18 @@ def parse_args(args=None):
         "USE_CONTROL",
         help="Boolean for whether or not the user has specified the pipeline must normalise against a control",
     )
+    parser.add_argument(
+        "--validate_fastq",
+        default="none",
+        choices=VALIDATION_MODES,
+        help="Check each FastQ file: 'quick' verifies the gzip header and the trailer of BGZF and multi-member files and "
+        "estimates the read count from a sample of records, 'full' decompresses every file and counts reads exactly.",
+    )
+    parser.add_argument("--fastq_map", default=None, help="Tab-separated file mapping samplesheet paths to local paths.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of FastQ files to validate in parallel.")
+    parser.add_argument(
+        "--sample_records", type=int, default=10000, help="Number of records used to estimate the read count."
+    )
     return parser.parse_args(args)
 
 
@@ -63,7 +84,175 @@ def print_error(error, context="Line", context_str=""):
     sys.exit(1)
 
 
-def check_samplesheet(file_in, file_out, use_control):
+def is_remote(path):
+    return path.startswith(REMOTE_PREFIXES)
+
+
+def read_fastq_map(file_in):
+    fastq_map = {}
+    if file_in:
+        with open(file_in, "r") as fin:
+            for line in fin:
+                if line.strip():
+                    source, local = line.rstrip("\n").split("\t")
+                    fastq_map[source] = local
+    return fastq_map
+
+
+def is_bgzf(header):
+    ## BGZF blocks carry the FEXTRA flag and a 'BC' subfield
+    return len(header) >= 14 and header[3] & 4 and header[12:14] == b"BC"
+
+
+def check_gzip_trailer(fin, size):
+    """
+    Check that the last gzip member of a file is complete. BGZF files must end with the
+    standard empty EOF block. For plain gzip the last member found in the tail window is
+    decompressed so zlib verifies its CRC32 and ISIZE trailer. A deflate stream cannot be
+    entered mid-way, so the trailer of a member that starts before the window cannot be
+    checked cheaply. Returns False in that case (typically a single-member file larger
+    than the window) and the caller must decompress the whole file.
+    """
+    fin.seek(0)
+    if is_bgzf(fin.read(18)):
+        fin.seek(max(size - len(BGZF_EOF), 0))
+        if fin.read() != BGZF_EOF:
+            raise ValueError("BGZF end-of-file marker is missing, the file is probably truncated")
+        return True
+
+    offset = max(size - TAIL_WINDOW, 0)
+    fin.seek(offset)
+    tail = fin.read()
+    pos = tail.rfind(GZIP_MAGIC)
+    while pos != -1:
+        decomp = zlib.decompressobj(31)
+        try:
+            decomp.decompress(tail[pos:])
+            if decomp.eof and not decomp.unused_data.strip(b"\x00"):
+                return True
+        except zlib.error:
+            pass
+        pos = tail.rfind(GZIP_MAGIC, 0, pos)
+
+    if offset == 0:
+        raise ValueError("gzip trailer is missing or corrupt, the file is probably truncated")
+    return False
+
+
+def scan_fastq(fin, max_records=None):
+    """
+    Stream-decompress a (multi-member) gzip FastQ and count its records. Stops after
+    max_records records if given. Returns the number of records seen, the number of
+    compressed bytes consumed and whether the whole file was read.
+    """
+    fin.seek(0)
+    decomp = zlib.decompressobj(31)
+    lines = 0
+    consumed = 0
+    first = True
+    last_byte = b"\n"
+    member_open = False
+    while True:
+        chunk = fin.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        consumed += len(chunk)
+        while chunk:
+            data = decomp.decompress(chunk)
+            member_open = True
+            if data:
+                if first and not data.startswith(b"@"):
+                    raise ValueError("file does not start with a FastQ record")
+                first = False
+                lines += data.count(b"\n")
+                last_byte = data[-1:]
+            if decomp.eof:
+                chunk = decomp.unused_data
+                decomp = zlib.decompressobj(31)
+                member_open = False
+                if not chunk.strip(b"\x00"):
+                    chunk = b""
+            else:
+                chunk = b""
+        if max_records is not None and lines >= 4 * max_records:
+            return lines // 4, consumed, False
+
+    if member_open:
+        raise ValueError("unexpected end of gzip stream, the file is probably truncated")
+    if last_byte != b"\n":
+        lines += 1
+    records, remainder = divmod(lines, 4)
+    if remainder:
+        raise ValueError("last FastQ record is incomplete")
+    return records, consumed, True
+
+
+def validate_fastq(path, mode, sample_records):
+    """
+    Validate a single gzipped FastQ file and return its size in bytes and its
+    (estimated) number of records.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        raise ValueError("file is empty")
+
+    with open(path, "rb") as fin:
+        if fin.read(3) != GZIP_MAGIC:
+            raise ValueError("file is not gzip compressed")
+
+        if mode == "full":
+            records, _, _ = scan_fastq(fin)
+            return size, records
+
+        if not check_gzip_trailer(fin, size):
+            ## The last member starts before the tail window, only a full scan can verify it
+            print(
+                "WARNING: '{}' is a single gzip member larger than {} MB, decompressing the whole file.".format(
+                    path, TAIL_WINDOW // (1024 * 1024)
+                )
+            )
+            records, _, _ = scan_fastq(fin)
+            return size, records
+
+        records, consumed, complete = scan_fastq(fin, sample_records)
+        if not complete and consumed > 0:
+            records = int(round(records * size / float(consumed)))
+        return size, records
+
+
+def validate_fastq_files(fastq_list, mode, threads, sample_records, fastq_map):
+    """
+    Validate all FastQ files in parallel. Remote files that have not been staged
+    locally are skipped. Returns {fastq: (size, records)} for every validated file.
+    """
+    local_paths = {}
+    for fastq in fastq_list:
+        path = fastq_map.get(fastq, fastq)
+        if not is_remote(path):
+            local_paths[fastq] = path
+
+    def run(item):
+        fastq, path = item
+        try:
+            return fastq, validate_fastq(path, mode, sample_records), None
+        except (OSError, ValueError, zlib.error) as exception:
+            return fastq, None, str(exception)
+
+    results = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+        for fastq, result, error in executor.map(run, sorted(local_paths.items())):
+            if error:
+                errors.append("{}: {}".format(fastq, error))
+            else:
+                results[fastq] = result
+
+    if errors:
+        print_error("Invalid FastQ file(s)!", "Files", "\n" + "\n".join(errors))
+    return results
+
+
+def check_samplesheet(file_in, file_out, use_control, validate="none", threads=1, sample_records=10000, fastq_map=None):
     """
     This function checks that the samplesheet follows the following structure:
 
@@ -79,8 +268,9 @@ def check_samplesheet(file_in, file_out, use_control):
     # Init
     control_present = False
     num_fastq_list = []
-    sample_names_list = []
-    control_names_list = []
+    sample_names = set()
+    control_names = set()
+    seen_rows = set()
     sample_run_dict = {}
 
     with open(file_in, "r") as fin:
@@ -188,21 +378,14 @@ def check_samplesheet(file_in, file_out, use_control):
             ## Create sample mapping dictionary = {sample: {replicate : [ single_end, fastq_1, fastq_2 ]}}
             if sample not in sample_run_dict:
                 sample_run_dict[sample] = {}
-            if replicate not in sample_run_dict[sample]:
-                sample_run_dict[sample][replicate] = [sample_info]
-            else:
-                if sample_info in sample_run_dict[sample][replicate]:
-                    print_error("Samplesheet contains duplicate rows!", "Line", line)
-                else:
-                    sample_run_dict[sample][replicate].append(sample_info)
-
-            ## Store unique sample names
-            if sample not in sample_names_list:
-                sample_names_list.append(sample)
+            if tuple(sample_info) in seen_rows:
+                print_error("Samplesheet contains duplicate rows!", "Line", line)
+            seen_rows.add(tuple(sample_info))
+            sample_run_dict[sample].setdefault(replicate, []).append(sample_info)
 
-            ## Store unique control names
-            if control not in control_names_list:
-                control_names_list.append(control)
+            ## Store unique sample and control names
+            sample_names.add(sample)
+            control_names.add(control)
 
             line_no = line_no + 1
 
@@ -211,8 +394,8 @@ def check_samplesheet(file_in, file_out, use_control):
         print_error("Mixture of paired-end and single-end reads!")
 
     ## Check control group exists
-    for ctrl in control_names_list:
-        if ctrl != "" and ctrl not in sample_names_list:
+    for ctrl in sorted(control_names):
+        if ctrl != "" and ctrl not in sample_names:
             print_error(
                 "Each control entry must match at least one group entry! Unmatched control entry: {}.".format(ctrl)
             )
@@ -222,7 +405,7 @@ def check_samplesheet(file_in, file_out, use_control):
         for replicate in sorted(sample_run_dict[sample].keys()):
             for idx, sample_info in enumerate(sample_run_dict[sample][replicate]):
                 if control_present:
-                    if sample_info[0] in control_names_list:
+                    if sample_info[0] in control_names:
                         sample_info.append("1")
                         if sample_info[2] != "":
                             print_error("Control cannot have a control: {}.".format(sample_info[0]))
@@ -272,13 +455,48 @@ def check_samplesheet(file_in, file_out, use_control):
                     ctrl_group_new = ctrl_group + "_1"
                 info[0][2] = ctrl_group_new
 
+    ## Validate FastQ files and collect workload sizing
+    fastq_sizing = {}
+    if validate != "none":
+        fastq_list = set()
+        for reps in sample_run_dict.values():
+            for infos in reps.values():
+                for sample_info in infos:
+                    fastq_list.update(fastq for fastq in sample_info[4:6] if fastq)
+        fastq_sizing = validate_fastq_files(fastq_list, validate, threads, sample_records, fastq_map or {})
+
+        for reps in sample_run_dict.values():
+            for infos in reps.values():
+                for sample_info in infos:
+                    fastq_1, fastq_2 = sample_info[4:6]
+                    if fastq_1 in fastq_sizing and fastq_2 in fastq_sizing and validate == "full":
+                        if fastq_sizing[fastq_1][1] != fastq_sizing[fastq_2][1]:
+                            print_error(
+                                "Read 1 and read 2 FastQ files contain a different number of reads!",
+                                "Files",
+                                "{},{}".format(fastq_1, fastq_2),
+                            )
+
     ## Write validated samplesheet with appropriate columns
     if len(sample_run_dict) > 0:
         out_dir = os.path.dirname(file_out)
         make_dir(out_dir)
         with open(file_out, "w") as fout:
             fout.write(
-                ",".join(["id", "group", "replicate", "control", "single_end", "fastq_1", "fastq_2", "is_control"])
+                ",".join(
+                    [
+                        "id",
+                        "group",
+                        "replicate",
+                        "control",
+                        "single_end",
+                        "fastq_1",
+                        "fastq_2",
+                        "is_control",
+                        "fastq_bytes",
+                        "read_estimate",
+                    ]
+                )
                 + "\n"
             )
             for sample in sorted(sample_run_dict.keys()):
@@ -301,12 +519,27 @@ def check_samplesheet(file_in, file_out, use_control):
                     ## Write to file
                     for idx, sample_info in enumerate(sample_run_dict[sample][replicate]):
                         sample_id = "{}_R{}_T{}".format(sample, replicate, idx + 1)
-                        fout.write(",".join([sample_id] + sample_info) + "\n")
+                        sizing = ["", ""]
+                        fastqs = [fastq for fastq in sample_info[4:6] if fastq]
+                        if fastqs and all(fastq in fastq_sizing for fastq in fastqs):
+                            sizing = [
+                                str(sum(fastq_sizing[fastq][0] for fastq in fastqs)),
+                                str(fastq_sizing[fastqs[0]][1]),
+                            ]
+                        fout.write(",".join([sample_id] + sample_info + sizing) + "\n")
 
 
 def main(args=None):
     args = parse_args(args)
-    check_samplesheet(args.FILE_IN, args.FILE_OUT, args.USE_CONTROL)
+    check_samplesheet(
+        args.FILE_IN,
+        args.FILE_OUT,
+        args.USE_CONTROL,
+        validate=args.validate_fastq,
+        threads=args.threads,
+        sample_records=args.sample_records,
+        fastq_map=read_fastq_map(args.fastq_map),
+    )
 
 
 if __name__ == "__main__":
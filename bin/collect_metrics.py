@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+"""
+Collect the alignment, duplication and fragment metrics of every sample into one typed
+cohort table in a single pass. Replaces the per-sample bt2_report_to_csv.awk and
+dt_frag_report_to_csv.awk tasks and the reports.py merge_samples step.
+
+The manifest is a tab-separated file with the columns: report type, sample id, group, path.
+Supported report types are bowtie2_target, bowtie2_spikein, dt_frag, flagstat, picard and
+linear_dedup.
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import argparse
+
+## Typed columns of the cohort table, in output order
+BT2_COLUMNS = [
+    ("bt2_total_reads", int),
+    ("bt2_align1", int),
+    ("bt2_align_gt1", int),
+    ("bt2_non_aligned", int),
+    ("bt2_total_aligned", int),
+]
+DT_FRAG_COLUMNS = [
+    ("dt_frag_sampled", int),
+    ("dt_frag_mean_len", float),
+    ("dt_frag_min_len", float),
+    ("dt_frag_max_len", float),
+]
+FLAGSTAT_COLUMNS = [
+    ("flagstat_total", int),
+    ("flagstat_mapped", int),
+    ("flagstat_mapped_pct", float),
+    ("flagstat_duplicates", int),
+    ("flagstat_properly_paired", int),
+]
+PICARD_COLUMNS = [
+    ("picard_unpaired_reads_examined", int),
+    ("picard_read_pairs_examined", int),
+    ("picard_secondary_or_supplementary_rds", int),
+    ("picard_unmapped_reads", int),
+    ("picard_unpaired_read_duplicates", int),
+    ("picard_read_pair_duplicates", int),
+    ("picard_read_pair_optical_duplicates", int),
+    ("picard_percent_duplication", float),
+    ("picard_estimated_library_size", int),
+]
+LINEAR_COLUMNS = [
+    ("la_reads_before_filtering", int),
+    ("la_duplicates_removed", int),
+    ("la_duplicates_removed_pct", float),
+    ("la_unique_reads", int),
+]
+COLUMNS = (
+    [("id", str), ("group", str)]
+    + BT2_COLUMNS
+    + [("spikein_" + name, dtype) for name, dtype in BT2_COLUMNS]
+    + DT_FRAG_COLUMNS
+    + FLAGSTAT_COLUMNS
+    + PICARD_COLUMNS
+    + LINEAR_COLUMNS
+)
+COLUMN_TYPES = dict(COLUMNS)
+
+
+def parse_args(args=None):
+    Description = "Collect per-sample pipeline metrics into a single typed cohort table."
+    Epilog = "Example usage: python collect_metrics.py --manifest manifest.tsv --output cohort_metrics"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--manifest", required=True, help="Tab-separated file of report type, id, group and path.")
+    parser.add_argument("--output", default="cohort_metrics", help="Output prefix for the cohort table.")
+    parser.add_argument(
+        "--per_sample_dir",
+        default=None,
+        help="Also write the per-sample *_meta_bt2_target.csv/*_meta_bt2_spikein.csv tables to this directory.",
+    )
+    return parser.parse_args(args)
+
+
+def print_error(error, context="Line", context_str=""):
+    error_str = "ERROR: Please check metrics reports -> {}".format(error)
+    if context != "" and context_str != "":
+        error_str = "ERROR: Please check metrics reports -> {}\n{}: '{}'".format(
+            error, context.strip(), context_str.strip()
+        )
+    print(error_str)
+    sys.exit(1)
+
+
+def first_number(line):
+    return line.strip().split(" ")[0]
+
+
+def parse_bowtie2(path):
+    """
+    Parse a bowtie2 alignment summary in the same way as bt2_report_to_csv.awk.
+    """
+    data = {}
+    with open(path, "r") as fin:
+        for line in fin:
+            if "reads; of these:" in line:
+                data["bt2_total_reads"] = first_number(line)
+            if "aligned concordantly exactly 1 time" in line:
+                data["bt2_align1"] = first_number(line)
+            if "aligned concordantly >1 times" in line:
+                data["bt2_align_gt1"] = first_number(line)
+            if "aligned concordantly 0 times" in line:
+                data["bt2_non_aligned"] = first_number(line)
+    data["bt2_total_aligned"] = int(data.get("bt2_align1", 0)) + int(data.get("bt2_align_gt1", 0))
+    return data
+
+
+def parse_dt_frag(path):
+    """
+    Parse a deepTools bamPEFragmentSize table in the same way as dt_frag_report_to_csv.awk.
+    """
+    fields = {
+        "Frag. Sampled": "dt_frag_sampled",
+        "Frag. Len. Mean": "dt_frag_mean_len",
+        "Frag. Len. Min": "dt_frag_min_len",
+        "Frag. Len. Max": "dt_frag_max_len",
+    }
+    with open(path, "r") as fin:
+        rows = [line.rstrip("\n").split("\t") for line in fin if line.strip()]
+    if len(rows) < 2:
+        return {}
+    data = {}
+    for idx, name in enumerate(rows[0]):
+        for field, column in fields.items():
+            if field in name and idx < len(rows[-1]):
+                data[column] = rows[-1][idx]
+    return data
+
+
+def parse_flagstat(path):
+    data = {}
+    with open(path, "r") as fin:
+        for line in fin:
+            if "in total" in line:
+                data["flagstat_total"] = first_number(line)
+            elif re.search(r"\d+ \+ \d+ mapped \(", line):
+                data["flagstat_mapped"] = first_number(line)
+                pct = re.search(r"\(([0-9.]+)%", line)
+                if pct:
+                    data["flagstat_mapped_pct"] = pct.group(1)
+            elif re.search(r"\d+ \+ \d+ duplicates$", line.strip()):
+                data["flagstat_duplicates"] = first_number(line)
+            elif "properly paired" in line:
+                data["flagstat_properly_paired"] = first_number(line)
+    return data
+
+
+def parse_picard(path):
+    """
+    Parse the first metrics row of a Picard MarkDuplicates report.
+    """
+    with open(path, "r") as fin:
+        rows = [line.rstrip("\n").split("\t") for line in fin if line.strip() and not line.startswith("#")]
+    if len(rows) < 2:
+        return {}
+    data = {}
+    for name, value in zip(rows[0], rows[1]):
+        column = "picard_" + name.lower()
+        if column in COLUMN_TYPES:
+            data[column] = value
+    return data
+
+
+def parse_linear_dedup(path):
+    fields = {
+        "Reads before filtering": "la_reads_before_filtering",
+        "LA duplicates removed (n)": "la_duplicates_removed",
+        "LA duplicates removed (%)": "la_duplicates_removed_pct",
+        "Unique reads after LA duplicate removal": "la_unique_reads",
+    }
+    data = {}
+    with open(path, "r") as fin:
+        for line in fin:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 2 and parts[0] in fields:
+                data[fields[parts[0]]] = parts[1]
+    return data
+
+
+PARSERS = {
+    "bowtie2_target": (parse_bowtie2, ""),
+    "bowtie2_spikein": (parse_bowtie2, "spikein_"),
+    "dt_frag": (parse_dt_frag, ""),
+    "flagstat": (parse_flagstat, ""),
+    "picard": (parse_picard, ""),
+    "linear_dedup": (parse_linear_dedup, ""),
+}
+
+
+def cast(column, value):
+    if value is None or value == "":
+        return None
+    dtype = COLUMN_TYPES[column]
+    try:
+        if dtype is int:
+            return int(float(value))
+        return dtype(value)
+    except ValueError:
+        print_error("Value '{}' for column '{}' is not of type {}".format(value, column, dtype.__name__))
+
+
+def collect_metrics(manifest):
+    """
+    Parse every report listed in the manifest into {sample_id: {column: typed value}}.
+    """
+    samples = {}
+    with open(manifest, "r") as fin:
+        for line in fin:
+            if not line.strip():
+                continue
+            report_type, sample_id, group, path = line.rstrip("\n").split("\t")
+            if report_type not in PARSERS:
+                print_error("Unknown report type", "Line", line)
+            parser, prefix = PARSERS[report_type]
+            row = samples.setdefault(sample_id, {"id": sample_id, "group": group})
+            for column, value in parser(path).items():
+                row[prefix + column] = cast(prefix + column, value)
+    return samples
+
+
+def format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def write_table(samples, output):
+    present = [name for name, _ in COLUMNS if any(row.get(name) is not None for row in samples.values())]
+    with open(output + ".csv", "w") as fout:
+        writer = csv.writer(fout, lineterminator="\n")
+        writer.writerow(present)
+        for sample_id in sorted(samples):
+            writer.writerow([format_value(samples[sample_id].get(name)) for name in present])
+
+    with open(output + ".json", "w") as fout:
+        json.dump(
+            {
+                "columns": {name: COLUMN_TYPES[name].__name__ for name in present},
+                "samples": [{name: samples[sample_id].get(name) for name in present} for sample_id in sorted(samples)],
+            },
+            fout,
+            indent=4,
+        )
+
+
+def write_per_sample(samples, out_dir):
+    """
+    Write the per-sample bowtie2 tables in the layout produced by bt2_report_to_csv.awk.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = [name for name, _ in BT2_COLUMNS]
+    for sample_id, row in samples.items():
+        for prefix, suffix in [("", "_meta_bt2_target.csv"), ("spikein_", "_meta_bt2_spikein.csv")]:
+            if row.get(prefix + "bt2_total_reads") is None:
+                continue
+            with open(os.path.join(out_dir, sample_id + suffix), "w") as fout:
+                fout.write(",".join(names) + "\n")
+                fout.write(",".join(format_value(row.get(prefix + name)) for name in names) + "\n")
+
+
+def main(args=None):
+    args = parse_args(args)
+    samples = collect_metrics(args.manifest)
+    write_table(samples, args.output)
+    if args.per_sample_dir:
+        write_per_sample(samples, args.per_sample_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Concatenate the target and spike-in genomes into one FASTA file for a combined alignment index.
+
+The spike-in contig names are prefixed, so the alignments of a combined index can be split back
+into the two genomes by contig name. The sequences are copied line by line.
+"""
+
+import sys
+import argparse
+
+
+def parse_args(args=None):
+    Description = "Concatenate the target and spike-in genomes with prefixed spike-in contig names."
+    Epilog = "Example usage: python combine_genomes.py --target genome.fa --spikein spikein.fa --output combined.fa"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--target", required=True, help="Target genome FASTA file.")
+    parser.add_argument("--spikein", required=True, help="Spike-in genome FASTA file.")
+    parser.add_argument("--prefix", default="spikein_", help="Prefix of the spike-in contig names.")
+    parser.add_argument("--output", required=True, help="Output combined FASTA file.")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    with open(args.output, "w") as fout:
+        with open(args.target, "r") as fin:
+            for line in fin:
+                if line.startswith(">" + args.prefix):
+                    print("ERROR: Target contig {} already has the spike-in prefix.".format(line[1:].split()[0]))
+                    sys.exit(1)
+                fout.write(line)
+            if line and not line.endswith("\n"):
+                fout.write("\n")
+        with open(args.spikein, "r") as fin:
+            for line in fin:
+                fout.write(">" + args.prefix + line[1:] if line.startswith(">") else line)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+"""
+Build a deepTools computeMatrix compatible signal matrix from bigWig files.
+
+Accepts the computeMatrix scale-regions and reference-point arguments used by the pipeline and
+writes the same gzipped matrix, which plotHeatmap reads, and optional tab-separated values.
+Regions are split into chunks that are read from each bigWig by parallel workers, and the bins
+of a region are the mean signal of the bigWig over each bin, as computeMatrix with --binSize and
+--averageTypeBins mean.
+
+With --cache_dir the block of columns of every bigWig is stored under a key made of the bigWig
+checksum, the regions checksum and the binning parameters, so a rerun with one new bigWig only
+reads that bigWig. Blocks are written to a temporary file and moved into place, so jobs may
+share a cache directory, and an unreadable block is recomputed.
+"""
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+import pyBigWig
+
+## Number of regions read by one worker task
+CHUNK_SIZE = 2000
+
+
+def parse_args(args=None):
+    Description = "Build a deepTools compatible signal matrix from bigWig files."
+    Epilog = "Example usage: python compute_matrix.py reference-point -R peaks.bed -S sample.bigWig -o sample.mat.gz"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("mode", choices=["scale-regions", "reference-point"], help="Matrix mode.")
+    parser.add_argument("-R", "--regionsFileName", required=True, nargs="+", help="Region BED files.")
+    parser.add_argument("-S", "--scoreFileName", required=True, nargs="+", help="bigWig files.")
+    parser.add_argument("-o", "--outFileName", required=True, help="Output gzipped matrix.")
+    parser.add_argument("--outFileNameMatrix", default=None, help="Output tab-separated matrix values.")
+    parser.add_argument("-b", "--beforeRegionStartLength", "--upstream", type=int, default=0)
+    parser.add_argument("-a", "--afterRegionStartLength", "--downstream", type=int, default=0)
+    parser.add_argument("-m", "--regionBodyLength", type=int, default=1000)
+    parser.add_argument("--referencePoint", default="TSS", choices=["TSS", "TES", "center"])
+    parser.add_argument("-bs", "--binSize", type=int, default=10)
+    parser.add_argument("--samplesLabel", nargs="+", default=None)
+    parser.add_argument("--skipZeros", action="store_true")
+    parser.add_argument("--missingDataAsZero", action="store_true")
+    parser.add_argument("-p", "--numberOfProcessors", type=int, default=1)
+    parser.add_argument("--cache_dir", default=None, help="Directory of cached bigWig column blocks.")
+    return parser.parse_args(args)
+
+
+def read_regions(paths):
+    """
+    Read the regions of all files as [(chrom, start, end, name, score, strand)] and the group
+    boundaries, one group per file as computeMatrix.
+    """
+    regions = []
+    labels = []
+    boundaries = [0]
+    for path in paths:
+        with open(path, "r") as fin:
+            for line in fin:
+                if not line.strip() or line.startswith(("#", "track", "browser")):
+                    continue
+                cols = line.rstrip("\n").split("\t")
+                chrom, start, end = cols[0], int(cols[1]), int(cols[2])
+                name = cols[3] if len(cols) > 3 else "{}:{}-{}".format(chrom, start, end)
+                score = cols[4] if len(cols) > 4 else "."
+                strand = cols[5] if len(cols) > 5 and cols[5] in ("+", "-") else "."
+                regions.append((chrom, start, end, name, score, strand))
+        labels.append(os.path.splitext(os.path.basename(path))[0])
+        boundaries.append(len(regions))
+    return regions, labels, boundaries
+
+
+def zones(region, params):
+    """
+    Genomic zones of a region as [(start, end, bins)] in genomic order, and whether the vector
+    has to be reversed for the minus strand.
+    """
+    _, start, end, _, _, strand = region
+    before, after, body, bin_size = params["before"], params["after"], params["body"], params["bin_size"]
+    reverse = strand == "-"
+    if params["mode"] == "scale-regions":
+        up, down = (after, before) if reverse else (before, after)
+        return [
+            (start - up, start, up // bin_size),
+            (start, end, body // bin_size),
+            (end, end + down, down // bin_size),
+        ], reverse
+
+    if params["reference_point"] == "center":
+        point = start + (end - start) // 2
+    elif params["reference_point"] == "TES":
+        point = start if reverse else end
+    else:
+        point = end if reverse else start
+    up, down = (after, before) if reverse else (before, after)
+    return [(point - up, point, up // bin_size), (point, point + down, down // bin_size)], reverse
+
+
+def zone_values(bigwig, chrom, chrom_size, start, end, bins):
+    """
+    Mean signal of each of the equal bins of a zone, NaN where the bigWig has no data.
+    """
+    if bins == 0:
+        return np.zeros(0)
+    values = np.full(bins, np.nan)
+    if end <= start:
+        return values
+    edges = start + (np.arange(bins + 1) * (end - start)) // bins
+    if start >= 0 and end <= chrom_size and end - start >= bins:
+        stats = bigwig.stats(chrom, int(start), int(end), type="mean", nBins=bins, exact=True)
+        return np.array([np.nan if value is None else value for value in stats], dtype=np.float64)
+    for i in range(bins):
+        bin_start = max(int(edges[i]), 0)
+        bin_end = min(max(int(edges[i + 1]), int(edges[i]) + 1), chrom_size)
+        if bin_end > bin_start:
+            value = bigwig.stats(chrom, bin_start, bin_end, type="mean", exact=True)[0]
+            values[i] = np.nan if value is None else value
+    return values
+
+
+def chunk_block(task):
+    """
+    Worker: the matrix columns of one bigWig for one chunk of regions.
+    """
+    bigwig_path, regions, params = task
+    n_bins = params["n_bins"]
+    block = np.full((len(regions), n_bins), np.nan, dtype=np.float32)
+    bigwig = pyBigWig.open(bigwig_path)
+    chroms = bigwig.chroms()
+    for row, region in enumerate(regions):
+        if region[0] not in chroms:
+            continue
+        parts, reverse = zones(region, params)
+        vector = np.concatenate(
+            [zone_values(bigwig, region[0], chroms[region[0]], start, end, bins) for start, end, bins in parts]
+        )
+        block[row] = vector[::-1] if reverse else vector
+    bigwig.close()
+    return block
+
+
+def file_checksum(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as fin:
+        for chunk in iter(lambda: fin.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_block(path, shape):
+    """
+    Cached block of a score file, or None if it is missing, unreadable or of the wrong shape.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        block = np.load(path)
+    except (OSError, ValueError, EOFError):
+        return None
+    return block if block.shape == shape else None
+
+
+def save_block(path, block):
+    """
+    Write a block to the cache through a temporary file in the same directory and move it into
+    place, so concurrent jobs sharing the cache never read a partial file.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npy.tmp")
+    try:
+        with os.fdopen(handle, "wb") as fout:
+            np.save(fout, block)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    regions, group_labels, group_boundaries = read_regions(args.regionsFileName)
+    params = {
+        "mode": args.mode,
+        "before": args.beforeRegionStartLength,
+        "after": args.afterRegionStartLength,
+        "body": args.regionBodyLength if args.mode == "scale-regions" else 0,
+        "bin_size": args.binSize,
+        "reference_point": args.referencePoint if args.mode == "reference-point" else None,
+    }
+    params["n_bins"] = (params["before"] + params["after"] + params["body"]) // args.binSize
+    chunks = [regions[i : i + CHUNK_SIZE] for i in range(0, len(regions), CHUNK_SIZE)]
+
+    cache_keys = [None] * len(args.scoreFileName)
+    if args.cache_dir:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        regions_key = hashlib.sha1(json.dumps(regions).encode("utf-8")).hexdigest()
+        params_key = json.dumps(params, sort_keys=True)
+        cache_keys = [
+            hashlib.sha1("{}\t{}\t{}".format(file_checksum(path), regions_key, params_key).encode("utf-8")).hexdigest()
+            for path in args.scoreFileName
+        ]
+
+    blocks = [None] * len(args.scoreFileName)
+    for index, key in enumerate(cache_keys):
+        if key:
+            blocks[index] = load_block(os.path.join(args.cache_dir, key + ".npy"), (len(regions), params["n_bins"]))
+            if blocks[index] is not None:
+                print("Using cached block for {}".format(args.scoreFileName[index]))
+
+    tasks = [(index, chunk) for index in range(len(blocks)) if blocks[index] is None for chunk in chunks]
+    with Pool(max(1, args.numberOfProcessors)) as pool:
+        results = pool.map(chunk_block, [(args.scoreFileName[index], chunk, params) for index, chunk in tasks])
+    for index in sorted({index for index, _ in tasks}):
+        parts = [block for (task_index, _), block in zip(tasks, results) if task_index == index]
+        blocks[index] = np.concatenate(parts) if parts else np.zeros((0, params["n_bins"]), dtype=np.float32)
+        if cache_keys[index]:
+            save_block(os.path.join(args.cache_dir, cache_keys[index] + ".npy"), blocks[index])
+
+    matrix = np.hstack(blocks) if blocks else np.zeros((len(regions), 0), dtype=np.float32)
+    if args.missingDataAsZero:
+        matrix = np.nan_to_num(matrix, nan=0.0)
+
+    keep = np.ones(len(regions), dtype=bool)
+    if args.skipZeros:
+        keep = np.nansum(np.abs(matrix), axis=1) > 0
+    rows = np.flatnonzero(keep)
+    group_boundaries = [int(np.searchsorted(rows, boundary)) for boundary in group_boundaries]
+
+    sample_labels = args.samplesLabel or [
+        os.path.splitext(os.path.basename(path))[0] for path in args.scoreFileName
+    ]
+    n_samples = len(args.scoreFileName)
+    header = {
+        "upstream": [params["before"]] * n_samples,
+        "downstream": [params["after"]] * n_samples,
+        "body": [params["body"]] * n_samples,
+        "bin size": [args.binSize] * n_samples,
+        "ref point": [params["reference_point"]] * n_samples,
+        "verbose": False,
+        "bin avg type": "mean",
+        "missing data as zero": args.missingDataAsZero,
+        "min threshold": None,
+        "max threshold": None,
+        "scale": 1,
+        "skip zeros": args.skipZeros,
+        "nan after end": False,
+        "proc number": args.numberOfProcessors,
+        "sort regions": "keep",
+        "sort using": "mean",
+        "unscaled 5 prime": [0] * n_samples,
+        "unscaled 3 prime": [0] * n_samples,
+        "group_labels": group_labels,
+        "group_boundaries": group_boundaries,
+        "sample_labels": sample_labels,
+        "sample_boundaries": [i * params["n_bins"] for i in range(n_samples + 1)],
+    }
+
+    with gzip.open(args.outFileName, "wt") as fout:
+        fout.write("@" + json.dumps(header, separators=(",", ":")) + "\n")
+        for row in rows.tolist():
+            chrom, start, end, name, score, strand = regions[row]
+            values = "\t".join("nan" if np.isnan(value) else "%f" % value for value in matrix[row].tolist())
+            fout.write("{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(chrom, start, end, name, score, strand, values))
+
+    if args.outFileNameMatrix:
+        with open(args.outFileNameMatrix, "w") as fout:
+            groups = np.diff(group_boundaries)
+            fout.write("#" + "\t".join("{}:{}".format(label, n) for label, n in zip(group_labels, groups)) + "\n")
+            fout.write(
+                "#downstream:{}\tupstream:{}\tbody:{}\tbin size:{}\tunscaled 5 prime:0\tunscaled 3 prime:0\n".format(
+                    params["after"], params["before"], params["body"], args.binSize
+                )
+            )
+            fout.write("\t".join(label for label in sample_labels for _ in range(params["n_bins"])) + "\n")
+            np.savetxt(fout, matrix[rows], fmt="%.4g", delimiter="\t")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
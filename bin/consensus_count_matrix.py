@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Count the fragments of every sample in the consensus peaks for differential binding analysis.
+
+The peak sets given are merged into one set of non-overlapping regions shared by all samples.
+Every fragment that overlaps a region by at least one base is counted for it, using two binary
+searches per region on the sorted fragment starts and ends. Samples are counted in parallel.
+
+Writes a raw count matrix of regions by samples, dense (TSV) and/or sparse (Matrix Market), and
+the library size of every sample for use as DESeq2 size factors or edgeR library sizes.
+"""
+
+import sys
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+from fragment_store import load_fragments, open_text
+
+
+def parse_args(args=None):
+    Description = "Count the fragments of every sample in the consensus peaks."
+    Epilog = "Example usage: python consensus_count_matrix.py --samples samples.tsv --peaks consensus.bed"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--samples", required=True, help="Tab-separated file of sample id and fragments file.")
+    parser.add_argument("--peaks", required=True, nargs="+", help="Consensus or merged peak BED files.")
+    parser.add_argument("--output", default="consensus_counts", help="Output prefix.")
+    parser.add_argument(
+        "--format", default="dense", choices=["dense", "sparse", "both"], help="Format of the count matrix."
+    )
+    parser.add_argument("--threads", type=int, default=1, help="Number of samples counted in parallel.")
+    return parser.parse_args(args)
+
+
+def read_regions(paths):
+    """
+    Read and merge overlapping or book-ended peaks of all files into {chrom: (starts, ends)}.
+    """
+    intervals = {}
+    for path in paths:
+        with open_text(path) as fin:
+            for line in fin:
+                if not line.strip() or line.startswith(("#", "track", "browser")):
+                    continue
+                cols = line.split("\t", 3)
+                intervals.setdefault(cols[0], []).append((int(cols[1]), int(cols[2])))
+
+    regions = {}
+    for chrom in sorted(intervals):
+        merged = []
+        for start, end in sorted(intervals[chrom]):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        merged = np.array(merged, dtype=np.int64)
+        regions[chrom] = (merged[:, 0], merged[:, 1])
+    return regions
+
+
+## Consensus regions shared with the workers
+REGIONS = {}
+
+
+def init_worker(regions):
+    global REGIONS
+    REGIONS = regions
+
+
+def count_sample(task):
+    """
+    Worker: count the fragments of one sample in every region. Returns the sample id, the counts
+    in region order and the total number of fragments.
+    """
+    sample_id, fragments_path = task
+    fragments = load_fragments(fragments_path)
+
+    counts = []
+    for chrom, (region_starts, region_ends) in REGIONS.items():
+        if chrom not in fragments:
+            counts.append(np.zeros(len(region_starts), dtype=np.int64))
+            continue
+        starts, ends = fragments[chrom]
+        sorted_ends = np.sort(ends)
+        # Overlapping fragments start before the region end and do not end before the region start
+        counts.append(
+            np.searchsorted(starts, region_ends, side="left") - np.searchsorted(sorted_ends, region_starts, side="right")
+        )
+    library_size = sum(len(starts) for starts, _ in fragments.values())
+    return sample_id, (np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)), library_size
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    samples = []
+    with open(args.samples, "r") as fin:
+        for line in fin:
+            if line.strip():
+                samples.append(tuple(line.rstrip("\n").split("\t")[:2]))
+    samples.sort()
+
+    regions = read_regions(args.peaks)
+    region_ids = [
+        (chrom, start, end)
+        for chrom, (starts, ends) in regions.items()
+        for start, end in zip(starts.tolist(), ends.tolist())
+    ]
+
+    with Pool(max(1, args.threads), initializer=init_worker, initargs=(regions,)) as pool:
+        results = pool.map(count_sample, samples)
+
+    sample_ids = [sample_id for sample_id, _, _ in results]
+    matrix = np.column_stack([counts for _, counts, _ in results]) if results else np.zeros((len(region_ids), 0))
+
+    with open(args.output + ".library_sizes.tsv", "w") as fout:
+        fout.write("sample\tlibrary_size\tfragments_in_peaks\n")
+        for sample_id, counts, library_size in results:
+            fout.write("{}\t{}\t{}\n".format(sample_id, library_size, int(counts.sum())))
+
+    if args.format in ("dense", "both"):
+        with open(args.output + ".counts.tsv", "w") as fout:
+            fout.write("\t".join(["peak_id", "chrom", "start", "end"] + sample_ids) + "\n")
+            for (chrom, start, end), row in zip(region_ids, matrix.tolist()):
+                peak_id = "{}:{}-{}".format(chrom, start, end)
+                fout.write("\t".join([peak_id, chrom, str(start), str(end)] + [str(value) for value in row]) + "\n")
+
+    if args.format in ("sparse", "both"):
+        rows, cols = np.nonzero(matrix)
+        with open(args.output + ".counts.mtx", "w") as fout:
+            fout.write("%%MatrixMarket matrix coordinate integer general\n")
+            fout.write("{} {} {}\n".format(len(region_ids), len(sample_ids), len(rows)))
+            fout.writelines(
+                "{} {} {}\n".format(row + 1, col + 1, matrix[row, col]) for row, col in zip(rows.tolist(), cols.tolist())
+            )
+        with open(args.output + ".peaks.tsv", "w") as fout:
+            fout.writelines("{}:{}-{}\t{}\t{}\t{}\n".format(c, s, e, c, s, e) for c, s, e in region_ids)
+        with open(args.output + ".samples.tsv", "w") as fout:
+            fout.writelines(sample_id + "\n" for sample_id in sample_ids)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Downsample a BAM file to one or more target coverages in a single pass.
+
+The number of mapped reads is taken from the samtools flagstat report of the BAM file, or from
+the index statistics if no report is given, so the BAM is not read to count reads. The mean read
+length is estimated from the first reads only. Reads are selected by a hash of the read name and
+the seed, so mates are always kept together, the selection is reproducible, and every lower
+coverage set is a subset of the higher ones. All target coverages are written in the same pass.
+"""
+
+import os
+import sys
+import zlib
+import argparse
+
+import pysam
+
+## Number of mapped reads used to estimate the mean read length
+READ_LENGTH_SAMPLE = 10000
+
+
+def parse_args(args=None):
+    Description = "Downsample a BAM file to one or more target coverages in a single pass."
+    Epilog = "Example usage: python downsample_bam.py --bam sample.bam --chrom_sizes genome.sizes --coverage 10 --prefix sample"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--bam", required=True, help="Coordinate-sorted and indexed BAM file.")
+    parser.add_argument("--bai", default=None, help="Index of the BAM file, linked for targets that are not downsampled.")
+    parser.add_argument("--chrom_sizes", required=True, help="Tab-separated chromosome sizes file.")
+    parser.add_argument("--coverage", required=True, type=float, help="Target coverage of the primary output.")
+    parser.add_argument(
+        "--extra_coverage", default="", help="Comma-separated list of additional target coverages."
+    )
+    parser.add_argument("--flagstat", default=None, help="samtools flagstat report of the BAM file.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the read selection.")
+    parser.add_argument("--prefix", required=True, help="Output prefix.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of BAM compression threads.")
+    return parser.parse_args(args)
+
+
+def read_genome_size(path):
+    size = 0
+    with open(path, "r") as fin:
+        for line in fin:
+            cols = line.split()
+            if len(cols) >= 2:
+                size += int(cols[1])
+    return size
+
+
+def read_mapped(flagstat_path, bam):
+    """
+    Number of primary mapped reads from a flagstat report, falling back to the total mapped reads
+    of the index statistics.
+    """
+    if flagstat_path:
+        mapped = None
+        with open(flagstat_path, "r") as fin:
+            for line in fin:
+                if "primary mapped (" in line:
+                    return int(line.split()[0])
+                if mapped is None and "mapped (" in line:
+                    mapped = int(line.split()[0])
+        if mapped is not None:
+            return mapped
+    return sum(stat.mapped for stat in bam.get_index_statistics())
+
+
+def mean_read_length(bam):
+    total = 0
+    count = 0
+    for read in bam.fetch(until_eof=True):
+        if read.is_unmapped or read.is_secondary:
+            continue
+        total += read.infer_read_length() or read.query_length
+        count += 1
+        if count == READ_LENGTH_SAMPLE:
+            break
+    return total / count if count else 0
+
+
+def downsample_fraction(coverage, genome_size, mapped, read_length):
+    if mapped == 0 or read_length == 0:
+        return 1.0
+    return min(max(coverage * genome_size / (mapped * read_length), 0.0), 1.0)
+
+
+def coverage_label(coverage):
+    return "{:g}x".format(coverage)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    coverages = [args.coverage] + [float(value) for value in args.extra_coverage.split(",") if value.strip()]
+    outputs = ["{}.downsampled.bam".format(args.prefix)] + [
+        "{}.downsampled_{}.bam".format(args.prefix, coverage_label(coverage)) for coverage in coverages[1:]
+    ]
+
+    genome_size = read_genome_size(args.chrom_sizes)
+    with pysam.AlignmentFile(args.bam, "rb") as bam:
+        mapped = read_mapped(args.flagstat, bam)
+        read_length = mean_read_length(bam)
+
+    fractions = [downsample_fraction(coverage, genome_size, mapped, read_length) for coverage in coverages]
+    print("Mapped reads: {}, mean read length: {:.1f}".format(mapped, read_length))
+
+    # Targets at or above the depth of the BAM file are linked to the input
+    sampled = []
+    for output, coverage, fraction in zip(outputs, coverages, fractions):
+        print("{}: {} coverage, fraction {:.6f}".format(output, coverage_label(coverage), fraction))
+        if fraction < 0.999999:
+            sampled.append((output, int(fraction * 0xFFFFFFFF)))
+        else:
+            os.symlink(args.bam, output)
+            os.symlink(args.bai or args.bam + ".bai", output + ".bai")
+
+    # Lower coverage sets are subsets of higher ones, so a read failing one target fails the rest
+    sampled.sort(key=lambda item: -item[1])
+
+    if sampled:
+        seed = args.seed & 0xFFFFFFFF
+        with pysam.AlignmentFile(args.bam, "rb", threads=args.threads) as bam:
+            writers = [
+                (pysam.AlignmentFile(output, "wb", template=bam, threads=args.threads), limit)
+                for output, limit in sampled
+            ]
+            for read in bam.fetch(until_eof=True):
+                key = zlib.crc32(read.query_name.encode(), seed)
+                for writer, limit in writers:
+                    if key >= limit:
+                        break
+                    writer.write(read)
+            for writer, _ in writers:
+                writer.close()
+        for output, _ in sampled:
+            pysam.index(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
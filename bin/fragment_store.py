@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+Columnar, memory-mappable store of paired-end fragments.
+
+A fragment store holds the fragments of one sample as per-chromosome int32 start and end arrays
+sorted by start, so downstream steps can map them with NumPy instead of reparsing a BED file.
+
+File layout (little endian):
+    8 bytes   magic b"CRFRAG01"
+    8 bytes   uint64 byte offset of the JSON index
+    ...       per chromosome: starts (int32 x n) then ends (int32 x n), each aligned to 64 bytes
+    ...       JSON index {"version": 1, "max_length": int, "chroms": [{"name", "count", "starts", "ends"}]}
+
+Usage as a module:
+    store = FragmentStore("sample.frag")
+    starts, ends = store.fetch("chr1")                  # zero-copy views of a whole chromosome
+    starts, ends = store.fetch("chr1", 10000, 20000)    # fragments overlapping a region
+
+Usage as a script:
+    fragment_store.py to_store --input sample.frags.bed --output sample.frag
+    fragment_store.py to_bed --input sample.frag --output sample.frags.bed
+"""
+
+import sys
+import json
+import gzip
+import struct
+import argparse
+
+import numpy as np
+
+MAGIC = b"CRFRAG01"
+ALIGNMENT = 64
+DTYPE = np.dtype("<i4")
+
+
+def is_fragment_store(path):
+    with open(path, "rb") as fin:
+        return fin.read(len(MAGIC)) == MAGIC
+
+
+class FragmentStoreWriter(object):
+    """
+    Write a fragment store one chromosome at a time. Chromosomes must be added once each.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fout = open(path, "wb")
+        self.fout.write(MAGIC)
+        self.fout.write(struct.pack("<Q", 0))
+        self.chroms = []
+        self.max_length = 0
+
+    def _write_array(self, values):
+        pad = -self.fout.tell() % ALIGNMENT
+        self.fout.write(b"\0" * pad)
+        offset = self.fout.tell()
+        self.fout.write(np.ascontiguousarray(values, dtype=DTYPE).tobytes())
+        return offset
+
+    def add(self, chrom, starts, ends):
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        if len(starts) != len(ends):
+            raise ValueError("Start and end arrays of {} differ in length".format(chrom))
+        if any(entry["name"] == chrom for entry in self.chroms):
+            raise ValueError("Chromosome {} was already added".format(chrom))
+        if len(starts) == 0:
+            return
+        order = np.lexsort((ends, starts))
+        starts = starts[order]
+        ends = ends[order]
+        self.max_length = max(self.max_length, int((ends - starts).max()))
+        self.chroms.append(
+            {
+                "name": chrom,
+                "count": int(len(starts)),
+                "starts": self._write_array(starts),
+                "ends": self._write_array(ends),
+            }
+        )
+
+    def close(self):
+        index_offset = self.fout.tell()
+        index = {"version": 1, "max_length": self.max_length, "chroms": self.chroms}
+        self.fout.write(json.dumps(index).encode("utf-8"))
+        self.fout.seek(len(MAGIC))
+        self.fout.write(struct.pack("<Q", index_offset))
+        self.fout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FragmentStore(object):
+    """
+    Read-only, memory-mapped access to a fragment store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fin:
+            if fin.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{} is not a fragment store".format(path))
+            index_offset = struct.unpack("<Q", fin.read(8))[0]
+            fin.seek(index_offset)
+            index = json.loads(fin.read().decode("utf-8"))
+        self.max_length = index["max_length"]
+        self.index = {entry["name"]: entry for entry in index["chroms"]}
+        self.chroms = [entry["name"] for entry in index["chroms"]]
+        self._data = np.memmap(path, dtype=np.uint8, mode="r") if self.chroms else None
+
+    def __len__(self):
+        return sum(entry["count"] for entry in self.index.values())
+
+    def count(self, chrom):
+        return self.index[chrom]["count"] if chrom in self.index else 0
+
+    def _arrays(self, chrom):
+        entry = self.index.get(chrom)
+        if entry is None:
+            empty = np.zeros(0, dtype=DTYPE)
+            return empty, empty
+        size = entry["count"] * DTYPE.itemsize
+        starts = self._data[entry["starts"] : entry["starts"] + size].view(DTYPE)
+        ends = self._data[entry["ends"] : entry["ends"] + size].view(DTYPE)
+        return starts, ends
+
+    def fetch(self, chrom, start=None, end=None):
+        """
+        Return the start and end arrays of the fragments of a chromosome, or of the fragments
+        overlapping the half-open region [start, end). The arrays are views into the mapped file.
+        """
+        starts, ends = self._arrays(chrom)
+        if start is None and end is None:
+            return starts, ends
+        start = 0 if start is None else start
+        end = np.iinfo(DTYPE).max if end is None else end
+        lo = np.searchsorted(starts, start - self.max_length, side="right")
+        hi = np.searchsorted(starts, end, side="left")
+        keep = ends[lo:hi] > start
+        if keep.all():
+            return starts[lo:hi], ends[lo:hi]
+        return starts[lo:hi][keep], ends[lo:hi][keep]
+
+    def items(self):
+        for chrom in self.chroms:
+            yield (chrom,) + self._arrays(chrom)
+
+
+def open_text(path):
+    with open(path, "rb") as fin:
+        magic = fin.read(2)
+    return gzip.open(path, "rt") if magic == b"\x1f\x8b" else open(path, "r")
+
+
+def bed_to_store(bed_path, store_path):
+    """
+    Convert a fragments BED file to a fragment store. The BED file does not need to be sorted.
+    """
+    fragments = load_fragments(bed_path)
+    with FragmentStoreWriter(store_path) as writer:
+        for chrom in sorted(fragments):
+            writer.add(chrom, *fragments[chrom])
+
+
+def load_fragments(path):
+    """
+    Fragments of a sample as {chrom: (starts, ends)} sorted by start, from a fragment store
+    (memory-mapped) or a plain or gzipped fragments BED file.
+    """
+    if is_fragment_store(path):
+        return {chrom: (starts, ends) for chrom, starts, ends in FragmentStore(path).items()}
+    return read_intervals(path)
+
+
+def read_intervals(path):
+    """
+    Read the first three columns of a plain or gzipped BED file into {chrom: (starts, ends)}
+    sorted by start.
+    """
+    starts = {}
+    ends = {}
+    with open_text(path) as fin:
+        for line in fin:
+            if not line.strip() or line.startswith(("#", "track", "browser")):
+                continue
+            cols = line.split("\t", 3)
+            if len(cols) < 3:
+                continue
+            starts.setdefault(cols[0], []).append(int(cols[1]))
+            ends.setdefault(cols[0], []).append(int(cols[2]))
+
+    intervals = {}
+    for chrom in starts:
+        chrom_starts = np.array(starts[chrom], dtype=np.int64)
+        chrom_ends = np.array(ends[chrom], dtype=np.int64)
+        order = np.argsort(chrom_starts, kind="stable")
+        intervals[chrom] = (chrom_starts[order], chrom_ends[order])
+    return intervals
+
+
+def store_to_bed(store_path, bed_path):
+    store = FragmentStore(store_path)
+    with open(bed_path, "w") as fout:
+        for chrom, starts, ends in store.items():
+            fout.writelines("{}\t{}\t{}\n".format(chrom, s, e) for s, e in zip(starts.tolist(), ends.tolist()))
+
+
+def parse_args(args=None):
+    Description = "Convert fragments between BED files and the columnar fragment store."
+    Epilog = "Example usage: python fragment_store.py to_store --input sample.frags.bed --output sample.frag"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("command", choices=["to_store", "to_bed"], help="Conversion direction.")
+    parser.add_argument("--input", required=True, help="Input fragments BED file or fragment store.")
+    parser.add_argument("--output", required=True, help="Output fragment store or BED file.")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    if args.command == "to_store":
+        bed_to_store(args.input, args.output)
+    else:
+        store_to_bed(args.input, args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
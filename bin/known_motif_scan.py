@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+"""
+Score a library of known motifs in peak and background sequences and write a HOMER knownResults.txt
+table, as findMotifsGenome.pl -nomotif.
+
+The peak sequences are --size windows centred on the peaks. The background is drawn from random
+genomic windows of the same size that do not overlap a peak, matched to the GC content of the peak
+sequences in 5% bins: windows are drawn until every bin holds its share of the background, and the
+windows of bins that stay short are weighted up to their share, as HOMER's GC normalisation.
+Sequences are encoded as integer arrays and every motif of the library (HOMER motif format) is
+scored on both strands of all sequences in batches, as the sum of the log odds of the motif matrix
+gathered at each offset of the motif. A sequence has the motif if its best score
+reaches the motif detection threshold. Motifs are scored in parallel workers, and the enrichment
+p-value is the binomial tail of the peak hits given the background frequency, as HOMER's default.
+"""
+
+import os
+import sys
+import math
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import pysam
+
+## Number of sequences scored together
+BATCH_SIZE = 5000
+
+## Number of GC content bins used to match the background to the peaks
+GC_BINS = 20
+
+## Rounds of background draws, and the largest number of windows drawn in one round, before short GC bins are weighted
+MAX_DRAW_ROUNDS = 5
+MAX_ROUND_CANDIDATES = 500000
+
+## Minimum probability of a base in a motif matrix
+MIN_PROBABILITY = 0.001
+
+## Integer code of every byte: A, C, G, T and N or any other character
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for _code, _bases in enumerate(["Aa", "Cc", "Gg", "Tt"]):
+    for _base in _bases:
+        BASE_CODES[ord(_base)] = _code
+
+## Sequences shared with the workers
+SEQUENCES = {}
+
+
+def parse_args(args=None):
+    Description = "Score known motifs in peak and GC-matched background sequences and write a knownResults.txt table."
+    Epilog = "Example usage: python known_motif_scan.py --peaks peaks.bed --fasta genome.fa --motifs known.motifs --outdir sample_motifs"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--peaks", required=True, help="BED file of peaks.")
+    parser.add_argument("--fasta", required=True, help="Indexed genome fasta.")
+    parser.add_argument("--motifs", required=True, help="Motif library in HOMER motif format.")
+    parser.add_argument("--outdir", required=True, help="Output directory of knownResults.txt.")
+    parser.add_argument("--size", type=int, default=200, help="Size of the sequence window around the peak centre.")
+    parser.add_argument(
+        "--background_size",
+        type=int,
+        default=50000,
+        help="Minimum number of background sequences; at least twice the number of peaks are used.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the background sampling.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes.")
+    return parser.parse_args(args)
+
+
+def read_motifs(path):
+    """
+    Motifs of a HOMER motif file as (name, consensus, threshold, probability matrix) tuples.
+    """
+    motifs = []
+    header = None
+    rows = []
+    with open(path) as fin:
+        for line in fin:
+            if line.startswith(">"):
+                if header is not None and rows:
+                    motifs.append(header + (np.array(rows),))
+                cols = line[1:].rstrip("\n").split("\t")
+                if len(cols) < 3:
+                    print("ERROR: Motif header without name and threshold: {}".format(line.strip()))
+                    sys.exit(1)
+                header = (cols[1], cols[0], float(cols[2]))
+                rows = []
+            elif line.strip() and header is not None:
+                rows.append([float(value) for value in line.split()[:4]])
+    if header is not None and rows:
+        motifs.append(header + (np.array(rows),))
+    return motifs
+
+
+def log_odds(matrix):
+    """
+    Natural log odds of a probability matrix against a uniform background, with a fifth column for
+    N scored as the worst base of the position.
+    """
+    probabilities = np.maximum(matrix, MIN_PROBABILITY)
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    scores = np.log(probabilities / 0.25)
+    return np.hstack([scores, scores.min(axis=1, keepdims=True)])
+
+
+def encode(sequence):
+    return BASE_CODES[np.frombuffer(sequence.encode("ascii"), dtype=np.uint8)]
+
+
+def read_peaks(path):
+    peaks = []
+    with open(path) as fin:
+        for line in fin:
+            if line.startswith(("#", "track", "browser")) or not line.strip():
+                continue
+            cols = line.split("\t")
+            peaks.append((cols[0], int(cols[1]), int(cols[2])))
+    return peaks
+
+
+def target_sequences(fasta, peaks, size):
+    """
+    Codes of the windows centred on the peaks, and the peak windows per chromosome.
+    """
+    codes = []
+    windows = {}
+    for chrom, start, end in peaks:
+        if chrom not in fasta.references:
+            continue
+        first = (start + end) // 2 - size // 2
+        if first < 0 or first + size > fasta.get_reference_length(chrom):
+            continue
+        codes.append(encode(fasta.fetch(chrom, first, first + size)))
+        windows.setdefault(chrom, []).append((first, first + size))
+    return np.array(codes, dtype=np.uint8).reshape(-1, size), windows
+
+
+def gc_bins(codes):
+    """
+    GC content bin of every sequence, and whether at most a quarter of the sequence is N.
+    """
+    called = (codes < 4).sum(axis=1)
+    gc = ((codes == 1) | (codes == 2)).sum(axis=1) / np.maximum(called, 1)
+    return np.minimum((gc * GC_BINS).astype(np.int64), GC_BINS - 1), called >= 0.75 * codes.shape[1]
+
+
+def random_windows(rng, fasta, chroms, lengths, peak_starts, size, count):
+    """
+    Codes of count random genomic windows, without the windows that overlap a peak.
+    """
+    picks = rng.choice(len(chroms), size=count, p=lengths / lengths.sum())
+    codes = []
+    for index, chrom in enumerate(chroms):
+        starts = rng.integers(0, int(lengths[index]), size=int((picks == index).sum()))
+        overlapping = peak_starts[chrom]
+        if len(overlapping):
+            nearest = np.searchsorted(overlapping, starts)
+            left = np.abs(starts - overlapping[np.maximum(nearest - 1, 0)]) < size
+            right = np.abs(overlapping[np.minimum(nearest, len(overlapping) - 1)] - starts) < size
+            starts = starts[~(left | right)]
+        codes.extend(encode(fasta.fetch(chrom, int(start), int(start) + size)) for start in starts)
+    return np.array(codes, dtype=np.uint8).reshape(-1, size)
+
+
+def background_sequences(fasta, windows, target_bins, size, n_background, seed):
+    """
+    Codes of random genomic windows outside the peaks with the GC content distribution of the peaks,
+    and the weight of every window: the wanted over the achieved count of its GC bin where the bin
+    could not be filled, 1 otherwise.
+    """
+    rng = np.random.default_rng(seed)
+    chroms = [chrom for chrom in fasta.references if fasta.get_reference_length(chrom) > size]
+    lengths = np.array([fasta.get_reference_length(chrom) - size for chrom in chroms], dtype=np.float64)
+    peak_starts = dict((chrom, np.sort([w[0] for w in windows.get(chrom, [])])) for chrom in chroms)
+
+    wanted = np.round(np.bincount(target_bins, minlength=GC_BINS) / float(max(len(target_bins), 1)) * n_background).astype(np.int64)
+    kept = [[] for _ in range(GC_BINS)]
+    achieved = np.zeros(GC_BINS, dtype=np.int64)
+    seen = np.zeros(GC_BINS, dtype=np.int64)
+
+    # Draw rounds of candidates sized from the GC bin frequencies seen so far until every bin is filled
+    for _ in range(MAX_DRAW_ROUNDS):
+        missing = np.maximum(wanted - achieved, 0)
+        if not missing.any():
+            break
+        rate = (seen + 1.0) / (seen.sum() + GC_BINS)
+        count = int(min(np.ceil((missing / rate).sum()), MAX_ROUND_CANDIDATES))
+        candidates = random_windows(rng, fasta, chroms, lengths, peak_starts, size, count)
+        bins, called = gc_bins(candidates)
+        seen += np.bincount(bins[called], minlength=GC_BINS)
+        for gc_bin in np.flatnonzero(missing):
+            pool = rng.permutation(np.flatnonzero((bins == gc_bin) & called))[: missing[gc_bin]]
+            kept[gc_bin].append(candidates[pool])
+            achieved[gc_bin] += len(pool)
+
+    for gc_bin in np.flatnonzero(wanted):
+        print(
+            "GC bin {}-{}%: {} of {} background sequences".format(
+                100 * gc_bin // GC_BINS, 100 * (gc_bin + 1) // GC_BINS, achieved[gc_bin], wanted[gc_bin]
+            )
+        )
+
+    # Weight the windows of short bins up to their share, then scale the weights to a mean of 1
+    weights = np.where((achieved > 0) & (achieved < wanted), wanted / np.maximum(achieved, 1).astype(np.float64), 1.0)
+    codes = [block for gc_bin in range(GC_BINS) for block in kept[gc_bin]]
+    background = np.concatenate(codes) if codes else np.zeros((0, size), dtype=np.uint8)
+    background_weights = np.repeat(weights, achieved)
+    if len(background_weights):
+        background_weights *= len(background_weights) / background_weights.sum()
+    return background, background_weights
+
+
+def init_worker(target, background, background_weights):
+    SEQUENCES["target"] = target
+    SEQUENCES["background"] = background
+    SEQUENCES["background_weights"] = background_weights
+
+
+def best_scores(codes, scores, reverse):
+    """
+    Best score of a motif over both strands of every sequence.
+    """
+    width = len(scores)
+    offsets = codes.shape[1] - width + 1
+    if offsets < 1:
+        return np.full(len(codes), -np.inf)
+    best = np.full(len(codes), -np.inf)
+    for first in range(0, len(codes), BATCH_SIZE):
+        batch = codes[first : first + BATCH_SIZE]
+        forward = np.zeros((len(batch), offsets))
+        backward = np.zeros((len(batch), offsets))
+        for k in range(width):
+            window = batch[:, k : k + offsets]
+            forward += scores[k][window]
+            backward += reverse[k][window]
+        best[first : first + BATCH_SIZE] = np.maximum(forward.max(axis=1), backward.max(axis=1))
+    return best
+
+
+def count_hits(task):
+    """
+    Worker: the number of peak sequences and the weighted number of background sequences with each
+    motif of a chunk of the library.
+    """
+    hits = []
+    for threshold, matrix in task:
+        scores = log_odds(matrix)
+        # Reverse complement: positions reversed, A<->T and C<->G swapped, N kept last
+        reverse = np.hstack([scores[::-1, 3::-1], scores[::-1, 4:]])
+        hits.append(
+            (
+                int((best_scores(SEQUENCES["target"], scores, reverse) >= threshold).sum()),
+                float(SEQUENCES["background_weights"][best_scores(SEQUENCES["background"], scores, reverse) >= threshold].sum()),
+            )
+        )
+    return hits
+
+
+def binomial_log_sf(hits, total, probability, log_factorials):
+    """
+    Natural log of the probability of at least hits successes out of total.
+    """
+    if hits == 0:
+        return 0.0
+    k = np.arange(hits, total + 1)
+    log_pmf = (
+        log_factorials[total]
+        - log_factorials[k]
+        - log_factorials[total - k]
+        + k * math.log(probability)
+        + (total - k) * math.log1p(-probability)
+    )
+    top = log_pmf.max()
+    return float(min(0.0, top + math.log(np.exp(log_pmf - top).sum())))
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    motifs = read_motifs(args.motifs)
+    if not motifs:
+        print("ERROR: No motifs found in {}".format(args.motifs))
+        sys.exit(1)
+
+    fasta = pysam.FastaFile(args.fasta)
+    target, windows = target_sequences(fasta, read_peaks(args.peaks), args.size)
+    target_bins, _ = gc_bins(target)
+    n_background = max(args.background_size, 2 * len(target))
+    background, background_weights = background_sequences(fasta, windows, target_bins, args.size, n_background, args.seed)
+    print("Scoring {} motifs in {} peak and {} background sequences".format(len(motifs), len(target), len(background)))
+
+    chunks = [motifs[i :: max(1, args.threads)] for i in range(max(1, args.threads))]
+    with Pool(max(1, args.threads), initializer=init_worker, initargs=(target, background, background_weights)) as pool:
+        results = pool.map(count_hits, [[(motif[2], motif[3]) for motif in chunk] for chunk in chunks])
+    hits = {}
+    for chunk, chunk_hits in zip(chunks, results):
+        for motif, motif_hits in zip(chunk, chunk_hits):
+            hits[motif[0], motif[1]] = motif_hits
+
+    n_target = len(target)
+    n_bg = len(background)
+    log_factorials = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, n_target + 1)))])
+    rows = []
+    for name, consensus, _, _ in motifs:
+        target_hits, bg_hits = hits[name, consensus]
+        probability = min(max(bg_hits, 0.5) / float(max(n_bg, 1)), 1.0 - 1e-12)
+        rows.append(
+            (binomial_log_sf(target_hits, n_target, probability, log_factorials), name, consensus, target_hits, bg_hits)
+        )
+    rows.sort(key=lambda row: row[0])
+
+    # Benjamini-Hochberg q-values over the sorted p-values
+    p_values = np.exp(np.array([row[0] for row in rows]))
+    q_values = np.minimum.accumulate((p_values * len(rows) / np.arange(1, len(rows) + 1))[::-1])[::-1]
+
+    os.makedirs(args.outdir, exist_ok=True)
+    with open(os.path.join(args.outdir, "knownResults.txt"), "w") as fout:
+        fout.write(
+            "Motif Name\tConsensus\tP-value\tLog P-value\tq-value (Benjamini)\t"
+            "# of Target Sequences with Motif(of {})\t% of Target Sequences with Motif\t"
+            "# of Background Sequences with Motif(of {})\t% of Background Sequences with Motif\n".format(n_target, n_bg)
+        )
+        for (log_p, name, consensus, target_hits, bg_hits), q_value in zip(rows, np.minimum(q_values, 1.0)):
+            fout.write(
+                "{}\t{}\t1e{}\t{:.3e}\t{:.4f}\t{:.1f}\t{:.2f}%\t{:.1f}\t{:.2f}%\n".format(
+                    name,
+                    consensus,
+                    int(log_p / math.log(10)),
+                    log_p,
+                    q_value,
+                    target_hits,
+                    100.0 * target_hits / max(n_target, 1),
+                    bg_hits,
+                    100.0 * bg_hits / max(n_bg, 1),
+                )
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
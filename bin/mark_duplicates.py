@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+"""
+Mark or remove duplicate reads of a coordinate-sorted BAM file in one streaming pass.
+
+Replaces Picard MarkDuplicates for the duplicate marking and removal steps. Reads are keyed as
+Picard does: read pairs on the library, chromosome, unclipped 5' position and strand of both mates,
+and reads without a mapped mate on their own 5' end. Within a set of duplicates the pair or read
+with the highest sum of base qualities of at least 15 is kept, the first one in file order on ties,
+and reads without a mapped mate are duplicates of any pair sharing their 5' end.
+
+Reads are written in input order, so the output stays coordinate-sorted. Only the reads behind the
+oldest unresolved duplicate set are held, and a set is resolved once the input has moved one read
+length past its last 5' end, as no later read can join it. A read waits for its mate only until the
+input has passed the mate position, after which it is kept as an unpaired read, so reads whose mate
+was filtered out upstream do not hold back the output. The metrics file has the layout of the
+Picard DuplicationMetrics report, including the estimated library size and optical duplicates
+found with the default Picard read name parsing and pixel distance.
+"""
+
+import sys
+import math
+import heapq
+import argparse
+from collections import deque
+
+import pysam
+
+## Minimum base quality counted in the duplicate score, as Picard SUM_OF_BASE_QUALITIES
+MIN_SCORE_QUALITY = 15
+
+## Maximum score of one read, as Picard
+MAX_READ_SCORE = 32767 // 2
+
+## Duplicate sets larger than this are not checked for optical duplicates, as Picard
+MAX_OPTICAL_SET_SIZE = 300000
+
+## Default maximum read length, including clipping, that sizes the window of a duplicate set
+MAX_READ_LENGTH = 500
+
+DUPLICATE_FLAG = 0x400
+
+
+def parse_args(args=None):
+    Description = "Mark or remove duplicate reads of a coordinate-sorted BAM file in one pass."
+    Epilog = "Example usage: python mark_duplicates.py --bam sample.bam --output sample.markdup.bam --metrics sample.MarkDuplicates.metrics.txt"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--bam", required=True, help="Coordinate-sorted BAM file.")
+    parser.add_argument("--output", required=True, help="Output BAM file, indexed after writing.")
+    parser.add_argument("--metrics", required=True, help="Output Picard-compatible duplication metrics.")
+    parser.add_argument("--remove_duplicates", action="store_true", help="Remove duplicates instead of marking them.")
+    parser.add_argument(
+        "--optical_pixel_distance", type=int, default=100, help="Maximum pixel distance of optical duplicates."
+    )
+    parser.add_argument(
+        "--max_read_length",
+        type=int,
+        default=MAX_READ_LENGTH,
+        help="Maximum read length including clipping, raised if a longer read is seen.",
+    )
+    parser.add_argument("--threads", type=int, default=1, help="Number of BGZF compression threads.")
+    return parser.parse_args(args)
+
+
+class Library(object):
+    """
+    Duplication metrics of one library.
+    """
+
+    def __init__(self):
+        self.unpaired_reads_examined = 0
+        self.read_pairs_examined = 0
+        self.secondary_or_supplementary_rds = 0
+        self.unmapped_reads = 0
+        self.unpaired_read_duplicates = 0
+        self.read_pair_duplicates = 0
+        self.read_pair_optical_duplicates = 0
+        self.set_sizes = {}
+        self.optical_set_sizes = {}
+
+
+class DuplicateSet(object):
+    """
+    Pairs or unpaired reads sharing a duplicate key, resolved once the input is past bound.
+    """
+
+    def __init__(self, library, bound):
+        self.library = library
+        self.bound = bound
+        self.entries = []
+        self.has_pair = False
+
+
+def mate_position(read):
+    """
+    Position of the mate of a read, None if the mate is not placed.
+    """
+    if read.next_reference_id < 0:
+        return None
+    return (read.next_reference_id, read.next_reference_start)
+
+
+def five_prime(read):
+    """
+    Unclipped 5' position and strand of a read.
+    """
+    cigar = read.cigartuples or []
+    if read.is_reverse:
+        cigar = cigar[::-1]
+    clip = 0
+    for op, length in cigar:
+        if op not in (4, 5):
+            break
+        clip += length
+    if read.is_reverse:
+        return read.reference_end + clip, 1
+    return read.reference_start - clip, 0
+
+
+def read_score(read):
+    qualities = read.query_qualities
+    if qualities is None:
+        return 0
+    return min(sum(q for q in qualities if q >= MIN_SCORE_QUALITY), MAX_READ_SCORE)
+
+
+def optical_location(name):
+    """
+    Tile, x and y of an Illumina read name, as the default Picard read name parsing.
+    """
+    fields = name.split(":")
+    if len(fields) not in (5, 7):
+        return None
+    try:
+        return fields[-3], int(fields[-2]), int(fields[-1])
+    except ValueError:
+        return None
+
+
+def count_optical(entries, distance):
+    """
+    Number of entries of a duplicate set within the pixel distance of an earlier entry of the
+    same read group and tile.
+    """
+    if len(entries) > MAX_OPTICAL_SET_SIZE:
+        return 0
+    locations = []
+    for entry in entries:
+        location = optical_location(entry["name"])
+        if location is not None:
+            locations.append((entry["read_group"], location[0], location[1], location[2]))
+    locations.sort()
+    optical = 0
+    for i, (group, tile, x, y) in enumerate(locations):
+        j = i - 1
+        while j >= 0 and locations[j][0] == group and locations[j][1] == tile and x - locations[j][2] <= distance:
+            if abs(y - locations[j][3]) <= distance:
+                optical += 1
+                break
+            j -= 1
+    return optical
+
+
+def estimate_library_size(read_pairs, unique_read_pairs):
+    """
+    Lander-Waterman estimate of the number of unique molecules, as Picard.
+    """
+
+    def f(x, c, n):
+        return c / x - 1 + math.exp(-n / x)
+
+    if read_pairs <= 0 or read_pairs - unique_read_pairs <= 0:
+        return None
+    m, M = 1.0, 100.0
+    if unique_read_pairs >= read_pairs or f(m * unique_read_pairs, unique_read_pairs, read_pairs) < 0:
+        return None
+    while f(M * unique_read_pairs, unique_read_pairs, read_pairs) > 0:
+        M *= 10.0
+    for _ in range(40):
+        r = (m + M) / 2.0
+        u = f(r * unique_read_pairs, unique_read_pairs, read_pairs)
+        if u == 0:
+            break
+        elif u > 0:
+            m = r
+        else:
+            M = r
+    return int(unique_read_pairs * (m + M) / 2.0)
+
+
+def write_metrics(path, libraries, args):
+    with open(path, "w") as fout:
+        fout.write("## htsjdk.samtools.metrics.StringHeader\n")
+        fout.write(
+            "# MarkDuplicates --INPUT {} --OUTPUT {} --METRICS_FILE {} --REMOVE_DUPLICATES {} --ASSUME_SORT_ORDER coordinate\n".format(
+                args.bam, args.output, args.metrics, "true" if args.remove_duplicates else "false"
+            )
+        )
+        fout.write("## htsjdk.samtools.metrics.StringHeader\n")
+        fout.write("# Written by mark_duplicates.py in the picard.sam.markduplicates.MarkDuplicates format\n\n")
+        fout.write("## METRICS CLASS\tpicard.sam.DuplicationMetrics\n")
+        fout.write(
+            "LIBRARY\tUNPAIRED_READS_EXAMINED\tREAD_PAIRS_EXAMINED\tSECONDARY_OR_SUPPLEMENTARY_RDS\tUNMAPPED_READS\t"
+            "UNPAIRED_READ_DUPLICATES\tREAD_PAIR_DUPLICATES\tREAD_PAIR_OPTICAL_DUPLICATES\tPERCENT_DUPLICATION\t"
+            "ESTIMATED_LIBRARY_SIZE\n"
+        )
+        histogram = None
+        for name, lib in libraries.items():
+            examined = lib.unpaired_reads_examined + lib.read_pairs_examined * 2
+            duplicates = lib.unpaired_read_duplicates + lib.read_pair_duplicates * 2
+            percent = duplicates / float(examined) if examined else 0.0
+            library_size = estimate_library_size(
+                lib.read_pairs_examined - lib.read_pair_optical_duplicates,
+                lib.read_pairs_examined - lib.read_pair_duplicates,
+            )
+            fout.write(
+                "\t".join(
+                    str(value)
+                    for value in [
+                        name,
+                        lib.unpaired_reads_examined,
+                        lib.read_pairs_examined,
+                        lib.secondary_or_supplementary_rds,
+                        lib.unmapped_reads,
+                        lib.unpaired_read_duplicates,
+                        lib.read_pair_duplicates,
+                        lib.read_pair_optical_duplicates,
+                        "{:.6f}".format(percent),
+                        "" if library_size is None else library_size,
+                    ]
+                )
+                + "\n"
+            )
+            if histogram is None:
+                histogram = (lib, library_size)
+
+        # Return on investment of further sequencing and duplicate set sizes of the first library
+        fout.write("\n## HISTOGRAM\tjava.lang.Double\n")
+        fout.write("BIN\tCoverageMult\tall_sets\toptical_sets\tnon_optical_sets\n")
+        if histogram is not None:
+            lib, library_size = histogram
+            pairs = lib.read_pairs_examined - lib.read_pair_optical_duplicates
+            unique_pairs = lib.read_pairs_examined - lib.read_pair_duplicates
+            for x in range(1, 101):
+                roi = 0.0
+                if library_size and unique_pairs:
+                    roi = library_size * (1 - math.exp(-(x * pairs) / float(library_size))) / unique_pairs
+                all_sets = lib.set_sizes.get(x, 0)
+                optical_sets = lib.optical_set_sizes.get(x, 0)
+                fout.write(
+                    "{:.1f}\t{:.6f}\t{}\t{}\t{}\n".format(x, roi, all_sets, optical_sets, all_sets - optical_sets)
+                )
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    bam = pysam.AlignmentFile(args.bam, "rb", threads=args.threads)
+    header = bam.header.to_dict()
+    read_group_library = {rg["ID"]: rg.get("LB", "Unknown Library") for rg in header.get("RG", [])}
+    libraries = {}
+
+    # Output queue of [read, is_duplicate], where is_duplicate is None until resolved
+    queue = deque()
+    pending = {}
+    pending_mates = []
+    pair_sets = {}
+    fragment_sets = {}
+    bounds = []
+    counter = 0
+    max_read_length = args.max_read_length
+
+    out = pysam.AlignmentFile(args.output, "wb", template=bam, threads=args.threads)
+
+    def library_of(read):
+        read_group = read.get_tag("RG") if read.has_tag("RG") else None
+        name = read_group_library.get(read_group, "Unknown Library")
+        if name not in libraries:
+            libraries[name] = Library()
+        return name, read_group
+
+    def duplicate_set(sets, key, library, last_end):
+        nonlocal counter
+        dup_set = sets.get(key)
+        if dup_set is None:
+            dup_set = DuplicateSet(library, (last_end[0], last_end[1] + max_read_length))
+            sets[key] = dup_set
+            counter += 1
+            heapq.heappush(bounds, (dup_set.bound, counter, id(sets), key))
+        return dup_set
+
+    def resolve(sets, key):
+        dup_set = sets.pop(key)
+        lib = libraries[dup_set.library]
+        entries = dup_set.entries
+        if sets is pair_sets:
+            best = max(range(len(entries)), key=lambda i: (entries[i]["score"], -i))
+            for i, entry in enumerate(entries):
+                for item in entry["items"]:
+                    item[1] = i != best
+            if len(entries) > 1:
+                lib.read_pair_duplicates += len(entries) - 1
+                optical = count_optical(entries, args.optical_pixel_distance)
+                lib.read_pair_optical_duplicates += optical
+                lib.set_sizes[len(entries)] = lib.set_sizes.get(len(entries), 0) + 1
+                if optical:
+                    lib.optical_set_sizes[len(entries)] = lib.optical_set_sizes.get(len(entries), 0) + 1
+        else:
+            best = -1 if dup_set.has_pair else max(range(len(entries)), key=lambda i: (entries[i]["score"], -i))
+            for i, entry in enumerate(entries):
+                for item in entry["items"]:
+                    item[1] = i != best
+            lib.unpaired_read_duplicates += len(entries) - (0 if best == -1 else 1)
+
+    def add_unpaired(item, end, score, library, read_group):
+        libraries[library].unpaired_reads_examined += 1
+        fragment_set = duplicate_set(fragment_sets, (library,) + end, library, end)
+        fragment_set.entries.append({"items": [item], "score": score, "name": item[0].query_name, "read_group": read_group})
+
+    def evict_until(position):
+        # Reads whose mate position has been passed without the mate are kept as unpaired reads
+        while pending_mates and (position is None or pending_mates[0][0] < position):
+            _, name = heapq.heappop(pending_mates)
+            mate = pending.pop(name, None)
+            if mate is not None:
+                item, end, score, library, read_group = mate
+                add_unpaired(item, end, score, library, read_group)
+
+    def resolve_until(position):
+        evict_until(position)
+        while bounds and (position is None or bounds[0][0] < position):
+            bound, order, sets_id, key = heapq.heappop(bounds)
+            sets = pair_sets if sets_id == id(pair_sets) else fragment_sets
+            if key not in sets:
+                continue
+            if sets[key].bound > bound:
+                # The window was extended for a read waiting on its mate
+                heapq.heappush(bounds, (sets[key].bound, order, sets_id, key))
+                continue
+            resolve(sets, key)
+
+    def flush():
+        while queue and queue[0][1] is not None:
+            read, is_duplicate = queue.popleft()
+            if is_duplicate:
+                read.flag |= DUPLICATE_FLAG
+                if args.remove_duplicates:
+                    continue
+            else:
+                read.flag &= ~DUPLICATE_FLAG
+            out.write(read)
+
+    for read in bam.fetch(until_eof=True):
+        item = [read, None]
+        queue.append(item)
+        library, read_group = library_of(read)
+        lib = libraries[library]
+
+        if read.is_unmapped:
+            lib.unmapped_reads += 1
+            item[1] = False
+            resolve_until(None if read.reference_id < 0 else (read.reference_id, read.reference_start))
+            flush()
+            continue
+        if read.is_secondary or read.is_supplementary:
+            lib.secondary_or_supplementary_rds += 1
+            item[1] = False
+            continue
+
+        position = (read.reference_id, read.reference_start)
+        resolve_until(position)
+        max_read_length = max(max_read_length, read.infer_read_length() or 0)
+        end = (read.reference_id,) + five_prime(read)
+
+        score = read_score(read)
+        mate = pending.pop(read.query_name, None) if read.is_paired and not read.mate_is_unmapped else None
+        mate_pos = mate_position(read)
+        if mate is not None:
+            mate_item, mate_end, mate_score, _, _ = mate
+            ends = tuple(sorted([mate_end, end]))
+            lib.read_pairs_examined += 1
+            pair_set = duplicate_set(pair_sets, (library,) + ends, library, max(ends))
+            pair_set.entries.append(
+                {
+                    "items": [mate_item, item],
+                    "score": mate_score + score,
+                    "name": read.query_name,
+                    "read_group": read_group,
+                }
+            )
+            # Both mapped ends of a pair make the unpaired reads at the same 5' end duplicates
+            for pair_end in (mate_end, end):
+                duplicate_set(fragment_sets, (library,) + pair_end, library, pair_end).has_pair = True
+        elif read.is_paired and not read.mate_is_unmapped and mate_pos is not None and mate_pos >= position:
+            # The mate is still ahead: wait for it until the input passes its position, keeping the
+            # fragment set of this end open until then
+            fragment_set = duplicate_set(fragment_sets, (library,) + end, library, end)
+            fragment_set.bound = max(fragment_set.bound, mate_pos)
+            pending[read.query_name] = (item, end, score, library, read_group)
+            heapq.heappush(pending_mates, (mate_pos, read.query_name))
+        else:
+            # Unpaired reads, and paired reads whose mate was passed without being seen
+            add_unpaired(item, end, score, library, read_group)
+        flush()
+
+    resolve_until(None)
+    flush()
+
+    out.close()
+    bam.close()
+    pysam.index(args.output)
+
+    write_metrics(args.metrics, libraries, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+Score the rank consistency of the peaks of two replicates with the irreproducible discovery rate (IDR)
+of Li et al. 2011, as the idr tool of the ENCODE pipelines.
+
+The peaks of both replicates are matched by sorted interval overlap: overlapping peaks of either
+replicate are merged into one region that takes the best score of each replicate, and the regions
+with a peak in both replicates are ranked per replicate. The ranks are fitted with the two component
+copula mixture, a reproducible bivariate normal and an irreproducible independent standard normal,
+by alternating the inversion of the mixture marginal on a grid with vectorized EM steps. Every
+region gets its local IDR, the posterior of the irreproducible component, and its global IDR, the
+mean local IDR of the regions ranked at or above it.
+"""
+
+import sys
+import math
+import argparse
+
+import numpy as np
+
+## Starting parameters of the reproducible component: mean, standard deviation, correlation and proportion
+START_MU = 0.1
+START_SIGMA = 1.0
+START_RHO = 0.2
+START_MIX = 0.5
+
+## Number of points of the grid the mixture marginal is inverted on
+GRID_POINTS = 2000
+
+## Smallest density kept in the log likelihood
+MIN_DENSITY = 1e-300
+
+
+def parse_args(args=None):
+    Description = "Fit the IDR copula mixture to the matched peaks of two replicates."
+    Epilog = "Example usage: python peak_idr.py --peaks_a r1.bed --peaks_b r2.bed --score_column 5 --prefix h3k27me3_R1_vs_R2"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--peaks_a", required=True, help="Peak BED file of the first replicate.")
+    parser.add_argument("--peaks_b", required=True, help="Peak BED file of the second replicate.")
+    parser.add_argument("--prefix", required=True, help="Prefix of the output files.")
+    parser.add_argument("--score_column", type=int, default=5, help="1-based column of the peak score used for ranking.")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Global IDR threshold of the reproducible peak set.")
+    parser.add_argument("--max_iter", type=int, default=100, help="Maximum number of fit iterations.")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="Log likelihood change that stops the fit.")
+    return parser.parse_args(args)
+
+
+def read_peaks(path, score_column):
+    chroms = []
+    starts = []
+    ends = []
+    scores = []
+    with open(path) as fin:
+        for line in fin:
+            if line.startswith(("#", "track", "browser")) or not line.strip():
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < score_column:
+                print("ERROR: Peak file {} has no column {}: {}".format(path, score_column, line.strip()))
+                sys.exit(1)
+            chroms.append(cols[0])
+            starts.append(int(cols[1]))
+            ends.append(int(cols[2]))
+            scores.append(float(cols[score_column - 1]))
+    return np.array(chroms, dtype=object), np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64), np.array(scores)
+
+
+def match_peaks(peaks_a, peaks_b):
+    """
+    Regions of overlapping peaks of both replicates, with the best score of each replicate in the
+    region (NaN without a peak).
+    """
+    chroms = np.concatenate([peaks_a[0], peaks_b[0]])
+    starts = np.concatenate([peaks_a[1], peaks_b[1]])
+    ends = np.concatenate([peaks_a[2], peaks_b[2]])
+    scores = np.concatenate([peaks_a[3], peaks_b[3]])
+    replicate = np.concatenate([np.zeros(len(peaks_a[1]), dtype=np.int64), np.ones(len(peaks_b[1]), dtype=np.int64)])
+
+    # Sort by chromosome and start, then open a new region wherever a peak starts after the furthest
+    # end seen so far on its chromosome
+    chrom_names, chrom_ids = np.unique(chroms.astype(str), return_inverse=True)
+    order = np.lexsort((starts, chrom_ids))
+    chrom_ids, starts, ends, scores, replicate = chrom_ids[order], starts[order], ends[order], scores[order], replicate[order]
+    offset = (ends.max() + 1) if len(ends) else 0
+    reach = np.maximum.accumulate(chrom_ids * offset + ends) - chrom_ids * offset
+    new_region = np.ones(len(starts), dtype=bool)
+    new_region[1:] = (chrom_ids[1:] != chrom_ids[:-1]) | (starts[1:] >= reach[:-1])
+    region = np.cumsum(new_region) - 1
+
+    n_regions = int(region[-1]) + 1 if len(region) else 0
+    region_start = np.full(n_regions, np.iinfo(np.int64).max)
+    region_end = np.zeros(n_regions, dtype=np.int64)
+    np.minimum.at(region_start, region, starts)
+    np.maximum.at(region_end, region, ends)
+    region_scores = np.full((n_regions, 2), -np.inf)
+    np.maximum.at(region_scores, (region, replicate), scores)
+    region_scores[np.isinf(region_scores)] = np.nan
+    return chrom_names[chrom_ids[new_region]], region_start, region_end, region_scores
+
+
+def average_ranks(values):
+    """
+    Ranks from 1 of the values, ties sharing their average rank.
+    """
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    upper = np.cumsum(counts)
+    return (upper - (counts - 1) / 2.0)[inverse]
+
+
+def normal_cdf(x):
+    return 0.5 * (1.0 + np.array([math.erf(value / math.sqrt(2.0)) for value in x]))
+
+
+def normal_pdf(x, mu=0.0, sigma=1.0):
+    return np.exp(-0.5 * ((x - mu) / sigma) ** 2) / (sigma * math.sqrt(2.0 * math.pi))
+
+
+def pseudo_values(u, mu, sigma, mix):
+    """
+    Quantiles of the uniform ranks in the marginal of the mixture, p N(mu, sigma) + (1 - p) N(0, 1).
+    """
+    grid = np.linspace(min(-4.0, mu - 4.0 * sigma), max(4.0, mu + 4.0 * sigma), GRID_POINTS)
+    marginal = mix * normal_cdf((grid - mu) / sigma) + (1.0 - mix) * normal_cdf(grid)
+    return np.interp(u, marginal, grid)
+
+
+def component_densities(z1, z2, mu, sigma, rho):
+    """
+    Densities of the reproducible and the irreproducible component at every pair of pseudo values.
+    """
+    d1 = (z1 - mu) / sigma
+    d2 = (z2 - mu) / sigma
+    reproducible = np.exp(-(d1 * d1 - 2.0 * rho * d1 * d2 + d2 * d2) / (2.0 * (1.0 - rho * rho))) / (
+        2.0 * math.pi * sigma * sigma * math.sqrt(1.0 - rho * rho)
+    )
+    return reproducible, normal_pdf(z1) * normal_pdf(z2)
+
+
+def fit_idr(ranks_a, ranks_b, max_iter, tolerance):
+    """
+    Fitted (mu, sigma, rho, mix) and local IDR of every pair of ranks.
+    """
+    u_a = ranks_a / (len(ranks_a) + 1.0)
+    u_b = ranks_b / (len(ranks_b) + 1.0)
+    mu, sigma, rho, mix = START_MU, START_SIGMA, START_RHO, START_MIX
+    previous = -np.inf
+    for _ in range(max_iter):
+        z1 = pseudo_values(u_a, mu, sigma, mix)
+        z2 = pseudo_values(u_b, mu, sigma, mix)
+
+        # E step: posterior of the reproducible component
+        reproducible, irreproducible = component_densities(z1, z2, mu, sigma, rho)
+        joint = np.maximum(mix * reproducible + (1.0 - mix) * irreproducible, MIN_DENSITY)
+        weight = mix * reproducible / joint
+
+        # M step: weighted moments of the pseudo values
+        total = max(weight.sum(), MIN_DENSITY)
+        mix = min(max(total / len(weight), 1e-6), 1.0 - 1e-6)
+        mu = float((weight * (z1 + z2)).sum() / (2.0 * total))
+        spread = (weight * ((z1 - mu) ** 2 + (z2 - mu) ** 2)).sum()
+        sigma = max(math.sqrt(spread / (2.0 * total)), 1e-3)
+        rho = min(max(2.0 * (weight * (z1 - mu) * (z2 - mu)).sum() / max(spread, MIN_DENSITY), -0.99), 0.99)
+
+        # Copula log likelihood: joint density over the product of the marginal densities
+        marginal_1 = mix * normal_pdf(z1, mu, sigma) + (1.0 - mix) * normal_pdf(z1)
+        marginal_2 = mix * normal_pdf(z2, mu, sigma) + (1.0 - mix) * normal_pdf(z2)
+        likelihood = (
+            np.log(joint).sum() - np.log(np.maximum(marginal_1, MIN_DENSITY)).sum() - np.log(np.maximum(marginal_2, MIN_DENSITY)).sum()
+        )
+        if abs(likelihood - previous) < tolerance:
+            break
+        previous = likelihood
+
+    reproducible, irreproducible = component_densities(z1, z2, mu, sigma, rho)
+    joint = np.maximum(mix * reproducible + (1.0 - mix) * irreproducible, MIN_DENSITY)
+    return (mu, sigma, rho, mix), (1.0 - mix) * irreproducible / joint
+
+
+def global_idr(local_idr):
+    """
+    Mean local IDR of all regions with a local IDR at most that of each region.
+    """
+    order = np.argsort(local_idr, kind="mergesort")
+    cumulative = np.cumsum(local_idr[order]) / np.arange(1, len(order) + 1)
+    result = np.empty(len(local_idr))
+    result[order] = cumulative
+    return result
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    chroms, starts, ends, scores = match_peaks(read_peaks(args.peaks_a, args.score_column), read_peaks(args.peaks_b, args.score_column))
+    shared = ~np.isnan(scores).any(axis=1)
+    chroms, starts, ends, scores = chroms[shared], starts[shared], ends[shared], scores[shared]
+    print("{} regions with a peak in both replicates".format(len(starts)))
+
+    if len(starts) < 20:
+        print("WARNING: Too few matched peaks to fit the IDR model, all are reported as irreproducible.")
+        params = (np.nan, np.nan, np.nan, np.nan)
+        local = np.ones(len(starts))
+    else:
+        params, local = fit_idr(average_ranks(scores[:, 0]), average_ranks(scores[:, 1]), args.max_iter, args.tolerance)
+    overall = global_idr(local)
+    order = np.argsort(overall, kind="mergesort")
+
+    with open("{}.idr.tsv".format(args.prefix), "w") as fout:
+        fout.write("chrom\tstart\tend\tscore_a\tscore_b\tlocal_idr\tidr\n")
+        for i in order:
+            fout.write(
+                "{}\t{}\t{}\t{:g}\t{:g}\t{:.6g}\t{:.6g}\n".format(chroms[i], starts[i], ends[i], scores[i, 0], scores[i, 1], local[i], overall[i])
+            )
+
+    # The reproducible peaks in coordinate order, scored as the idr tool: min(int(-125 log2(IDR)), 1000)
+    passed = np.flatnonzero(overall <= args.threshold)
+    passed = passed[np.lexsort((starts[passed], chroms[passed].astype(str)))]
+    with open("{}.idr_thresholded.bed".format(args.prefix), "w") as fout:
+        for number, i in enumerate(passed, start=1):
+            score = min(int(-125.0 * math.log2(max(overall[i], 1e-300))), 1000)
+            fout.write("{}\t{}\t{}\t{}_peak_{}\t{}\t.\n".format(chroms[i], starts[i], ends[i], args.prefix, number, score))
+
+    with open("{}.idr_summary.tsv".format(args.prefix), "w") as fout:
+        fout.write("pair\tmatched_peaks\treproducible_peaks\tidr_threshold\tmu\tsigma\trho\tmix\n")
+        fout.write("{}\t{}\t{}\t{:g}\t{:.4f}\t{:.4f}\t{:.4f}\t{:.4f}\n".format(args.prefix, len(starts), len(passed), args.threshold, *params))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
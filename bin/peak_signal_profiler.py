@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+"""
+Profile the signal of all samples of a run over a set of annotation or peak regions.
+
+Every sample of the samplesheet is matched to its {group}_R{replicate}.bigWig and the bigWigs are
+checked in parallel before profiling: each file has to exist, open as a bigWig and share chromosomes
+with the genome index. The checks are written to psp_preflight_files.log.
+
+The regions are then profiled chromosome by chromosome in parallel workers. Every region is scaled
+to --bins bins and flanked by --flank base pairs on each side in --flank_bins bins, regions on the
+minus strand are reversed, and the value of a bin is the mean signal over its bases, zero where the
+bigWig has no data. The output directory holds the mean signal of every region in every sample, the
+mean profile of every sample over all regions, a per-sample summary and a plot of the profiles.
+"""
+
+import os
+import sys
+import gzip
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import pyBigWig
+
+
+def parse_args(args=None):
+    Description = "Profile the bigWig signal of all samples over annotation or peak regions."
+    Epilog = "Example usage: python peak_signal_profiler.py --samplesheet samplesheet.csv --bigwigs *.bigWig --regions genes.bed --fai genome.fa.fai"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--samplesheet", required=True, help="Pipeline samplesheet with group and replicate columns.")
+    parser.add_argument("--bigwigs", required=True, nargs="+", help="bigWig files named {group}_R{replicate}.bigWig.")
+    parser.add_argument("--regions", required=True, help="BED file of regions, optionally gzipped.")
+    parser.add_argument("--fai", required=True, help="Genome fasta index.")
+    parser.add_argument("--bins", type=int, default=100, help="Number of bins of the scaled region body.")
+    parser.add_argument("--flank", type=int, default=1000, help="Flank in base pairs on each side of a region.")
+    parser.add_argument("--flank_bins", type=int, default=20, help="Number of bins of each flank.")
+    parser.add_argument("--outdir", default="psp_out", help="Output directory.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes.")
+    return parser.parse_args(args)
+
+
+def read_samplesheet(path):
+    """
+    Unique (sample, group) pairs of the samplesheet in input order.
+    """
+    samples = []
+    with open(path) as fin:
+        header = [col.strip().strip('"') for col in fin.readline().strip().split(",")]
+        if "group" not in header or "replicate" not in header:
+            print("ERROR: Samplesheet {} has no group and replicate columns".format(path))
+            sys.exit(1)
+        group_idx = header.index("group")
+        rep_idx = header.index("replicate")
+        for line in fin:
+            cols = [col.strip().strip('"') for col in line.strip().split(",")]
+            if len(cols) <= max(group_idx, rep_idx) or not cols[group_idx]:
+                continue
+            sample = ("{}_R{}".format(cols[group_idx], cols[rep_idx]), cols[group_idx])
+            if sample not in samples:
+                samples.append(sample)
+    return samples
+
+
+def check_bigwig(task):
+    """
+    Worker: the bigWig of a sample and the problem found with it, if any.
+    """
+    sample_id, paths, chroms = task
+    path = paths.get(sample_id + ".bigWig")
+    if path is None:
+        return sample_id, None, "MISSING: {}.bigWig".format(sample_id)
+    try:
+        bigwig = pyBigWig.open(path)
+    except RuntimeError:
+        return sample_id, path, "UNREADABLE: {}".format(path)
+    if bigwig is None or not bigwig.isBigWig():
+        return sample_id, path, "NOT A BIGWIG: {}".format(path)
+    shared = set(bigwig.chroms()) & set(chroms)
+    bigwig.close()
+    if not shared:
+        return sample_id, path, "NO SHARED CHROMOSOMES: {}".format(path)
+    return sample_id, path, None
+
+
+def read_fai(path):
+    with open(path) as fin:
+        return dict((cols[0], int(cols[1])) for cols in (line.split("\t") for line in fin) if len(cols) > 1)
+
+
+def read_regions(path, chrom_sizes):
+    """
+    Regions of the BED file per chromosome as (start, end, name, strand) lists, in file order.
+    """
+    regions = {}
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as fin:
+        for line in fin:
+            if line.startswith(("#", "track", "browser")) or not line.strip():
+                continue
+            cols = line.rstrip("\n").split("\t")
+            chrom, start, end = cols[0], int(cols[1]), int(cols[2])
+            if chrom not in chrom_sizes or end <= start:
+                continue
+            name = cols[3] if len(cols) > 3 else "{}:{}-{}".format(chrom, start, end)
+            strand = cols[5] if len(cols) > 5 else "."
+            regions.setdefault(chrom, []).append((start, end, name, strand))
+    return regions
+
+
+def signal_integral(bigwig, chrom, positions):
+    """
+    Integral of the signal of a chromosome from its start to each of the positions.
+    """
+    intervals = bigwig.intervals(chrom) if chrom in bigwig.chroms() else None
+    if not intervals:
+        return np.zeros(positions.shape)
+    starts, ends, values = (np.array(column) for column in zip(*intervals))
+    starts = starts.astype(np.int64)
+    ends = ends.astype(np.int64)
+    signal_cum = np.concatenate([[0.0], np.cumsum(values * (ends - starts))])
+    idx = np.searchsorted(ends, positions, side="right")
+    inside = idx < len(starts)
+    clamped = np.minimum(idx, len(starts) - 1)
+    partial = np.where(inside, np.maximum(positions - starts[clamped], 0), 0)
+    return signal_cum[idx] + np.where(inside, values[clamped] * partial, 0.0)
+
+
+def bin_edges(regions, chrom_size, bins, flank, flank_bins):
+    """
+    Bin edges of every region, one row per region, clipped to the chromosome.
+    """
+    starts = np.array([region[0] for region in regions], dtype=np.float64)[:, None]
+    ends = np.array([region[1] for region in regions], dtype=np.float64)[:, None]
+    body = starts + (ends - starts) * np.linspace(0, 1, bins + 1)
+    parts = [body]
+    if flank > 0 and flank_bins > 0:
+        steps = np.linspace(0, flank, flank_bins + 1)
+        parts = [starts - flank + steps[:-1], body, ends + steps[1:]]
+    return np.clip(np.rint(np.hstack(parts)).astype(np.int64), 0, chrom_size)
+
+
+def profile_chrom(task):
+    """
+    Worker: the mean signal of every region and the summed profile of one chromosome in every sample.
+    """
+    chrom, chrom_size, regions, bigwigs, bins, flank, flank_bins = task
+    edges = bin_edges(regions, chrom_size, bins, flank, flank_bins)
+    widths = np.diff(edges, axis=1)
+    minus = np.array([region[3] == "-" for region in regions])
+    starts = np.array([region[0] for region in regions], dtype=np.int64)
+    ends = np.array([region[1] for region in regions], dtype=np.int64)
+    body_first = flank_bins if flank > 0 and flank_bins > 0 else 0
+
+    means = []
+    profiles = []
+    for path in bigwigs:
+        bigwig = pyBigWig.open(path)
+        integral = signal_integral(bigwig, chrom, edges)
+        bigwig.close()
+        binned = np.divide(np.diff(integral, axis=1), widths, out=np.zeros(widths.shape), where=widths > 0)
+        binned[minus] = binned[minus, ::-1]
+        body = integral[:, body_first + bins] - integral[:, body_first]
+        means.append(body / (ends - starts))
+        profiles.append(binned.sum(axis=0))
+    return chrom, means, profiles
+
+
+def plot_profiles(profile, labels, sample_ids, groups, bins, flank, flank_bins, path):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    colours = plt.get_cmap("tab10")
+    group_names = sorted(set(groups))
+    for values, sample_id, group in zip(profile, sample_ids, groups):
+        ax.plot(values, label=sample_id, color=colours(group_names.index(group) % 10))
+    body_first = flank_bins if flank > 0 and flank_bins > 0 else 0
+    ticks = [body_first, body_first + bins]
+    ax.set_xticks(([0] if body_first else []) + ticks + ([len(labels) - 1] if body_first else []))
+    ax.set_xticklabels(
+        (["-{}".format(flank)] if body_first else []) + ["start", "end"] + (["+{}".format(flank)] if body_first else [])
+    )
+    for tick in ticks:
+        ax.axvline(tick, color="grey", linestyle=":", linewidth=0.8)
+    ax.set_ylabel("mean signal")
+    ax.legend(loc="upper right", fontsize="small")
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    samples = read_samplesheet(args.samplesheet)
+    chrom_sizes = read_fai(args.fai)
+    paths = dict((os.path.basename(path), path) for path in args.bigwigs)
+
+    # Preflight: every sample needs a readable bigWig on the genome
+    with Pool(max(1, args.threads)) as pool:
+        checks = pool.map(check_bigwig, [(sample_id, paths, chrom_sizes) for sample_id, _ in samples])
+    with open("psp_preflight_files.log", "w") as fout:
+        fout.write("[PSP PRECHECK] Verifying bigWig files for all samples...\n")
+        for sample_id, path, problem in checks:
+            fout.write("{}\t{}\n".format(sample_id, problem or "OK: {}".format(path)))
+    problems = [problem for _, _, problem in checks if problem]
+    if problems:
+        print("ERROR: {} of {} bigWig files failed the checks. See psp_preflight_files.log for details.".format(len(problems), len(checks)))
+        sys.exit(1)
+
+    sample_ids = [sample_id for sample_id, _ in samples]
+    groups = [group for _, group in samples]
+    bigwigs = [path for _, path, _ in checks]
+
+    regions = read_regions(args.regions, chrom_sizes)
+    chroms = [chrom for chrom in chrom_sizes if chrom in regions]
+    if not chroms:
+        print("ERROR: No regions of {} are on the chromosomes of {}".format(args.regions, args.fai))
+        sys.exit(1)
+
+    with Pool(max(1, args.threads)) as pool:
+        results = pool.map(
+            profile_chrom,
+            [
+                (chrom, chrom_sizes[chrom], regions[chrom], bigwigs, args.bins, args.flank, args.flank_bins)
+                for chrom in chroms
+            ],
+        )
+
+    n_regions = sum(len(regions[chrom]) for chrom in chroms)
+    means = np.hstack([np.vstack(chrom_means) for _, chrom_means, _ in results])
+    profile = np.sum([np.vstack(chrom_profiles) for _, _, chrom_profiles in results], axis=0) / n_regions
+
+    os.makedirs(args.outdir, exist_ok=True)
+    with open(os.path.join(args.outdir, "multisample_table.tsv"), "w") as fout:
+        fout.write("\t".join(["chrom", "start", "end", "name", "strand"] + sample_ids) + "\n")
+        column = 0
+        for chrom in chroms:
+            for start, end, name, strand in regions[chrom]:
+                values = ["{:.6g}".format(value) for value in means[:, column]]
+                fout.write("\t".join([chrom, str(start), str(end), name, strand] + values) + "\n")
+                column += 1
+
+    body_first = args.flank_bins if args.flank > 0 and args.flank_bins > 0 else 0
+    labels = (
+        ["upstream_{}".format(i + 1) for i in range(body_first)]
+        + ["body_{}".format(i + 1) for i in range(args.bins)]
+        + ["downstream_{}".format(i + 1) for i in range(body_first)]
+    )
+    with open(os.path.join(args.outdir, "multisample_profile.tsv"), "w") as fout:
+        fout.write("\t".join(["bin"] + sample_ids) + "\n")
+        for i, label in enumerate(labels):
+            fout.write("\t".join([label] + ["{:.6g}".format(value) for value in profile[:, i]]) + "\n")
+
+    with open(os.path.join(args.outdir, "multisample_summary.tsv"), "w") as fout:
+        fout.write("sample\tgroup\tregions\tmean_signal\tmedian_signal\tfraction_with_signal\n")
+        for i, (sample_id, group) in enumerate(samples):
+            fout.write(
+                "{}\t{}\t{}\t{:.6g}\t{:.6g}\t{:.6g}\n".format(
+                    sample_id,
+                    group,
+                    n_regions,
+                    means[i].mean(),
+                    np.median(means[i]),
+                    float((means[i] > 0).mean()),
+                )
+            )
+
+    plot_profiles(
+        profile,
+        labels,
+        sample_ids,
+        groups,
+        args.bins,
+        args.flank,
+        args.flank_bins,
+        os.path.join(args.outdir, "sample_multisample_plot.png"),
+    )
+    print("Profiled {} regions on {} chromosomes in {} samples".format(n_regions, len(chroms), len(sample_ids)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
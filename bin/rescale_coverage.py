@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Derive a depth-matched visualisation bigWig from the full coverage bedGraph of a sample.
+
+Replaces downsampling the BAM file and rebuilding the coverage for visualisation. The coverage is
+read once and brought to the target mean coverage over the genome in one of two ways:
+
+    scale   multiply every value by target coverage / mean coverage, the expected coverage of a
+            downsampled BAM file.
+    thin    binomially thin the integer depth of every interval to the same fraction, which also
+            reproduces the sampling noise of a downsampled BAM file. The depth unit is the smallest
+            non-zero value of the bedGraph, so normalised coverage is thinned in read units.
+
+Tracks already below the target coverage are left unchanged. The bigWig is written with its zoom
+levels in the same pass.
+"""
+
+import sys
+import argparse
+
+import numpy as np
+import pyBigWig
+
+
+def parse_args(args=None):
+    Description = "Derive a depth-matched visualisation bigWig from a coverage bedGraph."
+    Epilog = "Example usage: python rescale_coverage.py --bedgraph sample.bedGraph --chrom_sizes genome.sizes --coverage 10 --output sample.bigWig"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--bedgraph", required=True, help="Sorted coverage bedGraph file.")
+    parser.add_argument("--chrom_sizes", required=True, help="Tab-separated chromosome sizes file.")
+    parser.add_argument("--coverage", required=True, type=float, help="Target mean coverage.")
+    parser.add_argument("--method", default="scale", choices=["scale", "thin"], help="Rescaling method.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the binomial thinning.")
+    parser.add_argument("--zoom_levels", type=int, default=10, help="Maximum number of bigWig zoom levels.")
+    parser.add_argument("--output", required=True, help="Output bigWig file.")
+    return parser.parse_args(args)
+
+
+def read_chrom_sizes(path):
+    sizes = {}
+    with open(path, "r") as fin:
+        for line in fin:
+            cols = line.split()
+            if len(cols) >= 2:
+                sizes[cols[0]] = int(cols[1])
+    return sizes
+
+
+def read_bedgraph(path, sizes):
+    """
+    Read a bedGraph file into [(chrom, starts, ends, values)] in file order, dropping
+    chromosomes missing from the sizes.
+    """
+    columns = {}
+    order = []
+    with open(path, "r") as fin:
+        for line in fin:
+            if not line.strip() or line.startswith(("#", "track", "browser")):
+                continue
+            chrom, start, end, value = line.split()[:4]
+            if chrom not in sizes:
+                continue
+            if chrom not in columns:
+                columns[chrom] = ([], [], [])
+                order.append(chrom)
+            cols = columns[chrom]
+            cols[0].append(int(start))
+            cols[1].append(int(end))
+            cols[2].append(float(value))
+
+    return [
+        (
+            chrom,
+            np.array(columns[chrom][0], dtype=np.int64),
+            np.array(columns[chrom][1], dtype=np.int64),
+            np.array(columns[chrom][2], dtype=np.float64),
+        )
+        for chrom in order
+    ]
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    sizes = read_chrom_sizes(args.chrom_sizes)
+    tracks = read_bedgraph(args.bedgraph, sizes)
+
+    genome_size = sum(sizes.values())
+    total = sum(float((values * (ends - starts)).sum()) for _, starts, ends, values in tracks)
+    mean_coverage = total / genome_size if genome_size else 0.0
+    fraction = min(args.coverage / mean_coverage, 1.0) if mean_coverage > 0 else 1.0
+    print("Mean coverage: {:.4g}, fraction: {:.6f}".format(mean_coverage, fraction))
+
+    unit = 0.0
+    if args.method == "thin":
+        positive = [values[values > 0].min() for _, _, _, values in tracks if (values > 0).any()]
+        unit = min(positive) if positive else 0.0
+    rng = np.random.default_rng(args.seed)
+
+    bigwig = pyBigWig.open(args.output, "w")
+    bigwig.addHeader([(chrom, sizes[chrom]) for chrom, _, _, _ in tracks], maxZooms=args.zoom_levels)
+    for chrom, starts, ends, values in tracks:
+        if fraction < 1.0:
+            if args.method == "thin" and unit > 0:
+                depth = np.rint(values / unit).astype(np.int64)
+                values = rng.binomial(np.maximum(depth, 0), fraction) * unit
+            else:
+                values = values * fraction
+        keep = values != 0
+        if not keep.any():
+            continue
+        bigwig.addEntries(
+            [chrom] * int(keep.sum()), starts[keep].tolist(), ends=ends[keep].tolist(), values=values[keep].tolist()
+        )
+    bigwig.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+"""
+Call enriched regions from bedGraph coverage following the SEACR 1.3 algorithm.
+
+Takes the same positional arguments as SEACR_1.3.sh and writes the same <prefix>.stringent.bed or
+<prefix>.relaxed.bed files. The bedGraph is read once into per-chromosome NumPy arrays and the
+chromosomes are processed by separate workers:
+
+    1. Contiguous runs of non-zero intervals are joined into signal blocks, keeping the total
+       signal (AUC), the maximum signal and the region of maximum signal of each block.
+    2. A numeric threshold keeps the top fraction of blocks by AUC. With a control bedGraph the
+       threshold is the AUC that maximises the fraction of target blocks among all blocks above it
+       (stringent) or the knee of that curve below its peak (relaxed). With "norm" the control
+       AUCs are first scaled by the ratio of the modes of the target and control AUC densities.
+    3. Blocks closer than a tenth of the mean block length are merged, and merged regions that
+       overlap a control block above the same threshold are removed.
+
+Output columns: chrom, start, end, total signal, maximum signal, region of maximum signal.
+"""
+
+import sys
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+## Number of grid points used to estimate the AUC densities for normalisation, as R density()
+DENSITY_POINTS = 512
+
+
+def parse_args(args=None):
+    Description = "Call enriched regions from bedGraph coverage following the SEACR 1.3 algorithm."
+    Epilog = "Example usage: python seacr_callpeak.py target.bedGraph control.bedGraph non stringent sample.seacr.peaks"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("bedgraph", help="Target bedGraph file.")
+    parser.add_argument("control", help="Control bedGraph file or a numeric threshold between 0 and 1.")
+    parser.add_argument("norm", choices=["norm", "non"], help="Normalise the control to the target signal.")
+    parser.add_argument("mode", choices=["stringent", "relaxed"], help="Threshold mode.")
+    parser.add_argument("prefix", help="Output prefix.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of chromosomes processed in parallel.")
+    return parser.parse_args(args)
+
+
+def format_number(value):
+    """
+    Format a number as awk prints it, integers in full and other values with %.6g.
+    """
+    if value == int(value) and abs(value) < 1e16:
+        return str(int(value))
+    return "{:.6g}".format(value)
+
+
+def read_bedgraph(path):
+    """
+    Read a bedGraph file into [(chrom, starts, ends, values)] in file order.
+    """
+    columns = {}
+    order = []
+    with open(path, "r") as fin:
+        for line in fin:
+            if not line.strip() or line.startswith(("#", "track", "browser")):
+                continue
+            chrom, start, end, value = line.split()[:4]
+            if chrom not in columns:
+                columns[chrom] = ([], [], [])
+                order.append(chrom)
+            cols = columns[chrom]
+            cols[0].append(int(start))
+            cols[1].append(int(end))
+            cols[2].append(float(value))
+
+    return [
+        (
+            chrom,
+            np.array(columns[chrom][0], dtype=np.int64),
+            np.array(columns[chrom][1], dtype=np.int64),
+            np.array(columns[chrom][2], dtype=np.float64),
+        )
+        for chrom in order
+    ]
+
+
+def group_maxima(values, group_starts, max_starts, max_ends):
+    """
+    Reduce consecutive groups of rows starting at group_starts. Returns the maximum value of each
+    group and its region: the start of the first row reaching the maximum and the end of the last
+    row equal to it.
+    """
+    group_max = np.maximum.reduceat(values, group_starts)
+    group_id = np.repeat(np.arange(len(group_starts)), np.diff(np.append(group_starts, len(values))))
+    is_max = np.flatnonzero(values == group_max[group_id])
+    max_group = group_id[is_max]
+    first = np.ones(len(is_max), dtype=bool)
+    first[1:] = max_group[1:] != max_group[:-1]
+    last = np.ones(len(is_max), dtype=bool)
+    last[:-1] = max_group[1:] != max_group[:-1]
+    return group_max, max_starts[is_max[first]], max_ends[is_max[last]]
+
+
+def signal_blocks(task):
+    """
+    Worker: join the contiguous non-zero intervals of one chromosome into signal blocks.
+    """
+    chrom, starts, ends, values = task
+    keep = values > 0
+    starts, ends, values = starts[keep], ends[keep], values[keep]
+    if len(starts) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return chrom, {
+            "start": empty,
+            "end": empty,
+            "auc": empty.astype(np.float64),
+            "max": empty.astype(np.float64),
+            "max_start": empty,
+            "max_end": empty,
+        }
+
+    new_block = np.ones(len(starts), dtype=bool)
+    new_block[1:] = starts[1:] != ends[:-1]
+    block_starts = np.flatnonzero(new_block)
+    block_ends = np.append(block_starts[1:], len(starts)) - 1
+
+    block_max, max_start, max_end = group_maxima(values, block_starts, starts, ends)
+    return (
+        chrom,
+        {
+            "start": starts[block_starts],
+            "end": ends[block_ends],
+            "auc": np.add.reduceat(values * (ends - starts), block_starts),
+            "max": block_max,
+            "max_start": max_start,
+            "max_end": max_end,
+        },
+    )
+
+
+def auc_mode(auc):
+    """
+    Mode of the Gaussian kernel density of the AUC values, with R's default bandwidth (bw.nrd0)
+    evaluated on a binned grid.
+    """
+    if len(auc) < 2:
+        return float(auc[0]) if len(auc) else 1.0
+    iqr = np.subtract(*np.percentile(auc, [75, 25]))
+    spread = min(np.std(auc, ddof=1), iqr / 1.34) or np.std(auc, ddof=1) or abs(auc[0]) or 1.0
+    bandwidth = 0.9 * spread * len(auc) ** -0.2
+
+    grid = np.linspace(auc.min() - 3 * bandwidth, auc.max() + 3 * bandwidth, DENSITY_POINTS * 8)
+    counts, _ = np.histogram(auc, bins=len(grid), range=(grid[0], grid[-1]))
+    step = grid[1] - grid[0]
+    offsets = np.arange(-int(4 * bandwidth / step) - 1, int(4 * bandwidth / step) + 2) * step
+    density = np.convolve(counts, np.exp(-0.5 * (offsets / bandwidth) ** 2), mode="same")
+    return float(grid[np.argmax(density)])
+
+
+def empirical_thresholds(exp_auc, ctrl_auc):
+    """
+    Thresholds from the fraction of target blocks among all blocks with a higher AUC. Returns the
+    stringent threshold at the peak of this curve, the relaxed threshold at its knee below the
+    peak, and the empirical false discovery rate of each.
+    """
+    exp_sorted = np.sort(exp_auc)
+    ctrl_sorted = np.sort(ctrl_auc)
+    candidates = np.unique(np.concatenate((exp_sorted, ctrl_sorted)))
+    exp_above = len(exp_sorted) - np.searchsorted(exp_sorted, candidates, side="right")
+    ctrl_above = len(ctrl_sorted) - np.searchsorted(ctrl_sorted, candidates, side="right")
+
+    valid = exp_above > 0
+    candidates, exp_above, ctrl_above = candidates[valid], exp_above[valid], ctrl_above[valid]
+    if len(candidates) == 0:
+        return np.inf, np.inf, 0.0, 0.0
+    fraction = exp_above / (exp_above + ctrl_above)
+
+    peak = int(np.argmax(fraction))
+    knee = peak
+    if peak > 1:
+        # Point of the curve below the peak furthest from the line joining its two ends
+        x = (candidates[: peak + 1] - candidates[0]) / (candidates[peak] - candidates[0])
+        y = fraction[: peak + 1]
+        y = (y - y[0]) / (y[-1] - y[0]) if y[-1] != y[0] else np.zeros(len(y))
+        knee = int(np.argmax(y - x))
+
+    def fdr(index):
+        return float(ctrl_above[index] / exp_above[index])
+
+    return float(candidates[peak]), float(candidates[knee]), fdr(peak), fdr(knee)
+
+
+def merge_blocks(blocks, distance):
+    """
+    Merge blocks of one chromosome that start less than distance after the previous block ends.
+    """
+    if len(blocks["start"]) == 0:
+        return blocks
+    new_group = np.ones(len(blocks["start"]), dtype=bool)
+    new_group[1:] = blocks["start"][1:] >= blocks["end"][:-1] + distance
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], len(new_group)) - 1
+
+    group_max, max_start, max_end = group_maxima(
+        blocks["max"], group_starts, blocks["max_start"], blocks["max_end"]
+    )
+    return {
+        "start": blocks["start"][group_starts],
+        "end": blocks["end"][group_ends],
+        "auc": np.add.reduceat(blocks["auc"], group_starts),
+        "max": group_max,
+        "max_start": max_start,
+        "max_end": max_end,
+    }
+
+
+def overlaps_any(starts, ends, other_starts, other_ends):
+    """
+    Whether each interval overlaps any of the sorted, non-overlapping other intervals.
+    """
+    if len(other_starts) == 0:
+        return np.zeros(len(starts), dtype=bool)
+    index = np.searchsorted(other_starts, ends, side="left")
+    previous_end = np.where(index > 0, other_ends[np.maximum(index - 1, 0)], -1)
+    return previous_end > starts
+
+
+def subset(blocks, keep):
+    return {key: values[keep] for key, values in blocks.items()}
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    try:
+        numeric = float(args.control)
+    except ValueError:
+        numeric = None
+
+    bedgraphs = [("exp", args.bedgraph)] if numeric is not None else [("exp", args.bedgraph), ("ctrl", args.control)]
+    blocks = {}
+    with Pool(max(1, args.threads)) as pool:
+        for name, path in bedgraphs:
+            blocks[name] = list(pool.imap(signal_blocks, read_bedgraph(path)))
+
+    exp_auc = np.concatenate([chrom_blocks["auc"] for _, chrom_blocks in blocks["exp"]] or [np.zeros(0)])
+
+    if numeric is not None:
+        print("Calling enriched regions without control file")
+        threshold = float(np.quantile(exp_auc, 1 - numeric)) if len(exp_auc) else np.inf
+        control_threshold = None
+    else:
+        print("Calling enriched regions with control file")
+        ctrl_auc = np.concatenate([chrom_blocks["auc"] for _, chrom_blocks in blocks["ctrl"]] or [np.zeros(0)])
+        if args.norm == "norm" and len(exp_auc) and len(ctrl_auc):
+            constant = auc_mode(exp_auc) / auc_mode(ctrl_auc)
+            print("Normalisation constant = {}".format(format_number(constant)))
+            ctrl_auc = ctrl_auc * constant
+            for _, chrom_blocks in blocks["ctrl"]:
+                chrom_blocks["auc"] = chrom_blocks["auc"] * constant
+        stringent, relaxed, stringent_fdr, relaxed_fdr = empirical_thresholds(exp_auc, ctrl_auc)
+        threshold = relaxed if args.mode == "relaxed" else stringent
+        print(
+            "Empirical false discovery rate = {}".format(
+                format_number(relaxed_fdr if args.mode == "relaxed" else stringent_fdr)
+            )
+        )
+        # Control blocks are filtered with the threshold of the selected mode, as SEACR_1.3.sh
+        control_threshold = threshold
+
+    thresholded = [(chrom, subset(chrom_blocks, chrom_blocks["auc"] > threshold)) for chrom, chrom_blocks in blocks["exp"]]
+    n_blocks = sum(len(chrom_blocks["start"]) for _, chrom_blocks in thresholded)
+    total_length = sum(int((chrom_blocks["end"] - chrom_blocks["start"]).sum()) for _, chrom_blocks in thresholded)
+    distance = total_length / (n_blocks * 10) if n_blocks else 0
+
+    control = {}
+    if control_threshold is not None:
+        for chrom, chrom_blocks in blocks["ctrl"]:
+            enriched = chrom_blocks["auc"] > control_threshold
+            control[chrom] = (chrom_blocks["start"][enriched], chrom_blocks["end"][enriched])
+
+    with open("{}.{}.bed".format(args.prefix, args.mode), "w") as fout:
+        for chrom, chrom_blocks in thresholded:
+            merged = merge_blocks(chrom_blocks, distance)
+            if chrom in control:
+                merged = subset(merged, ~overlaps_any(merged["start"], merged["end"], *control[chrom]))
+            fout.writelines(
+                "{}\t{}\t{}\t{}\t{}\t{}:{}-{}\n".format(
+                    chrom, start, end, format_number(auc), format_number(max_value), chrom, max_start, max_end
+                )
+                for start, end, auc, max_value, max_start, max_end in zip(
+                    merged["start"].tolist(),
+                    merged["end"].tolist(),
+                    merged["auc"].tolist(),
+                    merged["max"].tolist(),
+                    merged["max_start"].tolist(),
+                    merged["max_end"].tolist(),
+                )
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Split the alignments of a combined target and spike-in index into a target and a spike-in BAM
+file in one streaming pass.
+
+Each read pair is assigned to the genome of its alignment by the contig name prefix of the spike-in
+genome, and the prefix is removed in the spike-in BAM file. Unaligned pairs are written to the target
+BAM file, as in a target-only alignment. Pairs whose mates align to different genomes are written
+to neither file and are counted separately.
+
+Bowtie2 alignment summaries are written for both genomes in the bowtie2 log format, counting the
+pairs aligned concordantly to that genome out of all pairs, with pairs that have an equally scoring
+alternative alignment (XS equal to AS) counted as aligned more than once. The genome split report
+lists these multi-mapping pairs per genome, as their alternative alignment may be in the other
+genome.
+"""
+
+import sys
+import argparse
+
+import pysam
+
+
+def parse_args(args=None):
+    Description = "Split a combined target and spike-in alignment into one BAM file per genome."
+    Epilog = "Example usage: python split_genomes.py --bam sample.combined.bam --prefix sample"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--bam", required=True, help="Name-grouped BAM file of the combined alignment.")
+    parser.add_argument("--prefix", required=True, help="Output prefix.")
+    parser.add_argument("--spikein_prefix", default="spikein_", help="Prefix of the spike-in contig names.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of BGZF compression threads.")
+    return parser.parse_args(args)
+
+
+def split_header(header, spikein_prefix):
+    """
+    Headers of the two genomes and the maps of the combined contig ids to their ids.
+    """
+    header = header.to_dict()
+    target_sq, spikein_sq = [], []
+    target_ids, spikein_ids = {}, {}
+    for tid, sq in enumerate(header.get("SQ", [])):
+        if sq["SN"].startswith(spikein_prefix):
+            spikein_ids[tid] = len(spikein_sq)
+            spikein_sq.append(dict(sq, SN=sq["SN"][len(spikein_prefix) :]))
+        else:
+            target_ids[tid] = len(target_sq)
+            target_sq.append(sq)
+    target_header = dict(header, SQ=target_sq)
+    spikein_header = dict(header, SQ=spikein_sq)
+    return target_header, spikein_header, target_ids, spikein_ids
+
+
+def is_multi(read):
+    return read.has_tag("XS") and read.has_tag("AS") and read.get_tag("XS") >= read.get_tag("AS")
+
+
+def iter_templates(bam):
+    """
+    Yield the primary records of each read name, as written by the aligner.
+    """
+    name = None
+    records = []
+    for read in bam.fetch(until_eof=True):
+        if read.is_secondary or read.is_supplementary:
+            continue
+        if read.query_name != name and records:
+            yield records
+            records = []
+        name = read.query_name
+        records.append(read)
+    if records:
+        yield records
+
+
+def remap(read, ids):
+    if read.reference_id >= 0:
+        read.reference_id = ids[read.reference_id]
+    if read.next_reference_id >= 0:
+        read.next_reference_id = ids.get(read.next_reference_id, -1)
+    return read
+
+
+def write_bowtie2_log(path, total, single_end, once, multi):
+    unaligned = total - once - multi
+
+    def pct(value):
+        return "{:.2f}%".format(100.0 * value / total if total else 0.0)
+
+    with open(path, "w") as fout:
+        fout.write("{} reads; of these:\n".format(total))
+        if single_end:
+            fout.write("  {} ({}) were unpaired; of these:\n".format(total, pct(total)))
+            fout.write("    {} ({}) aligned 0 times\n".format(unaligned, pct(unaligned)))
+            fout.write("    {} ({}) aligned exactly 1 time\n".format(once, pct(once)))
+            fout.write("    {} ({}) aligned >1 times\n".format(multi, pct(multi)))
+        else:
+            fout.write("  {} ({}) were paired; of these:\n".format(total, pct(total)))
+            fout.write("    {} ({}) aligned concordantly 0 times\n".format(unaligned, pct(unaligned)))
+            fout.write("    {} ({}) aligned concordantly exactly 1 time\n".format(once, pct(once)))
+            fout.write("    {} ({}) aligned concordantly >1 times\n".format(multi, pct(multi)))
+        fout.write("{} overall alignment rate\n".format(pct(once + multi)))
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    bam = pysam.AlignmentFile(args.bam, "rb", threads=args.threads, check_sq=False)
+    target_header, spikein_header, target_ids, spikein_ids = split_header(bam.header, args.spikein_prefix)
+    target_out = pysam.AlignmentFile("{}.target.bam".format(args.prefix), "wb", header=target_header, threads=args.threads)
+    spikein_out = pysam.AlignmentFile("{}.spikein.bam".format(args.prefix), "wb", header=spikein_header, threads=args.threads)
+
+    counts = {
+        "total": 0,
+        "unaligned": 0,
+        "cross_genome": 0,
+        "target_once": 0,
+        "target_multi": 0,
+        "spikein_once": 0,
+        "spikein_multi": 0,
+    }
+    single_end = True
+    for records in iter_templates(bam):
+        counts["total"] += 1
+        single_end = single_end and not records[0].is_paired
+        aligned = [read for read in records if not read.is_unmapped]
+        if not aligned:
+            counts["unaligned"] += 1
+            for read in records:
+                target_out.write(remap(read, target_ids))
+            continue
+
+        genomes = {"spikein" if read.reference_id in spikein_ids else "target" for read in aligned}
+        if len(genomes) > 1:
+            counts["cross_genome"] += 1
+            continue
+
+        genome = genomes.pop()
+        multi = any(is_multi(read) for read in aligned)
+        counts["{}_{}".format(genome, "multi" if multi else "once")] += 1
+        out, ids = (spikein_out, spikein_ids) if genome == "spikein" else (target_out, target_ids)
+        for read in records:
+            out.write(remap(read, ids))
+
+    target_out.close()
+    spikein_out.close()
+    bam.close()
+
+    write_bowtie2_log(
+        "{}.bowtie2.log".format(args.prefix), counts["total"], single_end, counts["target_once"], counts["target_multi"]
+    )
+    write_bowtie2_log(
+        "{}.spikein.bowtie2.log".format(args.prefix),
+        counts["total"],
+        single_end,
+        counts["spikein_once"],
+        counts["spikein_multi"],
+    )
+    with open("{}.genome_split.tsv".format(args.prefix), "w") as fout:
+        fout.write("sample\t" + "\t".join(counts) + "\n")
+        fout.write(args.prefix + "\t" + "\t".join(str(value) for value in counts.values()) + "\n")
+    print(", ".join("{}: {}".format(key, value) for key, value in counts.items()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@
 //
 
 import nextflow.Nextflow
+import nextflow.extension.FilesEx
 import groovy.text.SimpleTemplateEngine
 
 class WorkflowCutandrun {
@@ -48,6 +49,10 @@ class WorkflowCutandrun {
         if (!params.fasta && !params.mito_name && params.remove_mitochondrial_reads) {
             rmMitoWarn(log)
         }
+
+        if (params.quick_look) {
+            quickLookWarn(params, log)
+        }
     }
 
     //
@@ -222,4 +227,31 @@ class WorkflowCutandrun {
             "  in the .bam files is unknown. \n" +
             "==================================================================================="
     }
+
+    //
+    // Write a marker at the top of the output directory so quick look results are never mistaken for a full run
+    //
+    public static void quickLookMarker(workflow, params) {
+        def filename = "QUICK_LOOK_PREVIEW.txt"
+        def temp_pf  = new File(workflow.launchDir.toString(), ".${filename}")
+        temp_pf.text = "This directory holds the results of a --quick_look run of ${workflow.manifest.name} ${workflow.manifest.version}\n" +
+            "started ${workflow.start}. Every library was cut to its first ${params.quick_look_reads} reads and\n" +
+            "processed with reduced resources. The results are a preview for spotting failed\n" +
+            "libraries and must not be used as final results.\n"
+
+        FilesEx.mkdirs(Nextflow.file(params.outdir.toString()))
+        FilesEx.copyTo(temp_pf.toPath(), "${params.outdir}/${filename}")
+        temp_pf.delete()
+    }
+
+    //
+    // Print a warning that a quick look run only processes a subsample of the reads
+    //
+    private static void quickLookWarn(params, log) {
+        log.warn "=============================================================================\n" +
+            "  quick_look is switched on: every library is cut to its first ${params.quick_look_reads} reads\n" +
+            "  and run with reduced resources. All results are a preview for spotting failed\n" +
+            "  libraries and must not be used as final results.\n" +
+            "==================================================================================="
+    }
 }
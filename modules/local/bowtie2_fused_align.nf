@@ -0,0 +1,93 @@
+process BOWTIE2_FUSED_ALIGN {
+    tag "$meta.id"
+    label "process_high"
+
+    conda "bioconda::bowtie2=2.4.4 bioconda::samtools=1.16.1 conda-forge::pigz=2.6"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/mulled-v2-ac74a7f02cebcfcc07d8e8d1d750af9c83b4d45a:a0ffedb52808e102887f6ce600d092675bf3528a-0' :
+        'biocontainers/mulled-v2-ac74a7f02cebcfcc07d8e8d1d750af9c83b4d45a:a0ffedb52808e102887f6ce600d092675bf3528a-0' }"
+
+    input:
+    tuple val(meta) , path(reads)
+    tuple val(meta2), path(index)
+    path  regions
+    val   save_unaligned
+
+    output:
+    tuple val(meta), path("*.sorted.bam")        , emit: bam
+    tuple val(meta), path("*.sorted.bam.bai")    , emit: bai
+    tuple val(meta), path("${prefix}.stats")     , emit: stats
+    tuple val(meta), path("${prefix}.flagstat")  , emit: flagstat
+    tuple val(meta), path("${prefix}.idxstats")  , emit: idxstats
+    tuple val(meta), path("*.unfiltered.flagstat"), emit: unfiltered_flagstat
+    tuple val(meta), path("*.bowtie2.log")       , emit: log
+    tuple val(meta), path("*fastq.gz")           , emit: fastq, optional:true
+    path  "versions.yml"                         , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ""
+    def args2  = task.ext.args2 ?: ""
+    def args3  = task.ext.args3 ?: ""
+    prefix     = task.ext.prefix ?: "${meta.id}"
+    def log_prefix = task.ext.log_prefix ?: "${meta.id}"
+
+    def unaligned = ""
+    def reads_args = ""
+    if (meta.single_end) {
+        unaligned = save_unaligned ? "--un-gz ${log_prefix}.unmapped.fastq.gz" : ""
+        reads_args = "-U ${reads}"
+    } else {
+        unaligned = save_unaligned ? "--un-conc-gz ${log_prefix}.unmapped.fastq.gz" : ""
+        reads_args = "-1 ${reads[0]} -2 ${reads[1]}"
+    }
+    def regions_args = regions ? "-L ${regions}" : ""
+
+    // Half of the task memory is given to the sort, so the sorted runs of most samples stay in memory
+    def sort_memory = task.memory ? Math.max((task.memory.toMega() / 2 / task.cpus) as int, 256) : 768
+    """
+    INDEX=`find -L ./ -name "*.rev.1.bt2" | sed "s/\\.rev.1.bt2\$//"`
+    [ -z "\$INDEX" ] && INDEX=`find -L ./ -name "*.rev.1.bt2l" | sed "s/\\.rev.1.bt2l\$//"`
+    [ -z "\$INDEX" ] && echo "Bowtie2 index files not found" 1>&2 && exit 1
+
+    # The unfiltered alignments are only counted, from a copy of the stream
+    mkfifo unfiltered.sam
+    samtools flagstat unfiltered.sam > ${log_prefix}.unfiltered.flagstat &
+    FLAGSTAT_PID=\$!
+
+    bowtie2 \\
+        -x \$INDEX \\
+        $reads_args \\
+        --threads $task.cpus \\
+        $unaligned \\
+        $args \\
+        2> ${log_prefix}.bowtie2.log \\
+        | tee unfiltered.sam \\
+        | samtools view -u $args2 $regions_args --threads $task.cpus - \\
+        | samtools sort $args3 -@ $task.cpus -m ${sort_memory}M -T ${prefix}.tmp --write-index -o ${prefix}.sorted.bam##idx##${prefix}.sorted.bam.bai -
+
+    wait \$FLAGSTAT_PID
+    rm unfiltered.sam
+
+    samtools stats --threads $task.cpus ${prefix}.sorted.bam > ${prefix}.stats
+    samtools flagstat --threads $task.cpus ${prefix}.sorted.bam > ${prefix}.flagstat
+    samtools idxstats ${prefix}.sorted.bam > ${prefix}.idxstats
+
+    if [ -f ${log_prefix}.unmapped.fastq.1.gz ]; then
+        mv ${log_prefix}.unmapped.fastq.1.gz ${log_prefix}.unmapped_1.fastq.gz
+    fi
+
+    if [ -f ${log_prefix}.unmapped.fastq.2.gz ]; then
+        mv ${log_prefix}.unmapped.fastq.2.gz ${log_prefix}.unmapped_2.fastq.gz
+    fi
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        bowtie2: \$(echo \$(bowtie2 --version 2>&1) | sed 's/^.*bowtie2-align-s version //; s/ .*\$//')
+        samtools: \$(echo \$(samtools --version 2>&1) | sed 's/^.*samtools //; s/Using.*\$//')
+        pigz: \$( pigz --version 2>&1 | sed 's/pigz //g' )
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,74 @@
+process FASTQC {
+    tag "$meta.id"
+    label 'process_medium'
+
+    conda "bioconda::fastqc=0.12.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/fastqc:0.12.1--hdfd78af_0' :
+        'biocontainers/fastqc:0.12.1--hdfd78af_0' }"
+
+    input:
+    tuple val(meta), path(reads, stageAs: "input*/*")
+
+    output:
+    tuple val(meta), path("*.html"), emit: html
+    tuple val(meta), path("*.zip") , emit: zip
+    path  "versions.yml"           , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    def read_list = reads instanceof Path ? [ reads ] : reads
+    def n_ends = meta.single_end ? 1 : 2
+    if (read_list.size() > n_ends) {
+        // Technical replicates are streamed into one report per read end, named as the reports of merged files
+        def stream_names = n_ends == 1 ? [ prefix ] : [ "${prefix}_1", "${prefix}_2" ]
+        def streams = (0..<n_ends).collect { end ->
+            def files = (end..<read_list.size()).step(n_ends).collect { read_list[it] }
+            "gunzip -c ${files.join(' ')} | fastqc $args --threads $task.cpus stdin:${stream_names[end]}"
+        }.join('\n')
+        """
+        $streams
+
+        cat <<-END_VERSIONS > versions.yml
+        "${task.process}":
+            fastqc: \$( fastqc --version | sed -e "s/FastQC v//g" )
+        END_VERSIONS
+        """
+    } else {
+        // Make list of old name and new name pairs to use for renaming in the bash while loop
+        def old_new_pairs = reads instanceof Path || reads.size() == 1 ? [[ reads, "${prefix}.${reads.extension}" ]] : reads.withIndex().collect { entry, index -> [ entry, "${prefix}_${index + 1}.${entry.extension}" ] }
+        def rename_to = old_new_pairs*.join(' ').join(' ')
+        def renamed_files = old_new_pairs.collect{ old_name, new_name -> new_name }.join(' ')
+        """
+        printf "%s %s\\n" $rename_to | while read old_name new_name; do
+            [ -f "\${new_name}" ] || ln -s \$old_name \$new_name
+        done
+
+        fastqc \\
+            $args \\
+            --threads $task.cpus \\
+            $renamed_files
+
+        cat <<-END_VERSIONS > versions.yml
+        "${task.process}":
+            fastqc: \$( fastqc --version | sed -e "s/FastQC v//g" )
+        END_VERSIONS
+        """
+    }
+
+    stub:
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    touch ${prefix}.html
+    touch ${prefix}.zip
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        fastqc: \$( fastqc --version | sed -e "s/FastQC v//g" )
+    END_VERSIONS
+    """
+}
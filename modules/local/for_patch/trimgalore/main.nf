@@ -8,7 +8,7 @@ process TRIMGALORE {
         'biocontainers/trim-galore:0.6.6--0' }"
 
     input:
-    tuple val(meta), path(reads)
+    tuple val(meta), path(reads, stageAs: "input*/*")
 
     output:
     tuple val(meta), path("*trimmed.fastq.gz")  , emit: reads
@@ -47,9 +47,20 @@ process TRIMGALORE {
 
     def args = task.ext.args ?: ''
 
+    // Technical replicates are concatenated into a temporary input of the task instead of a published merged copy.
+    // Trim Galore opens each input to check its first record and detect the adapter before trimming, so the
+    // input has to be a regular file rather than a pipe; the gzip members are concatenated without recompression.
+    def read_list = reads instanceof Path ? [ reads ] : reads
+    def n_ends = meta.single_end ? 1 : 2
+    def stream = read_list.size() > n_ends
+    def read_files = (0..<n_ends).collect { end -> (end..<read_list.size()).step(n_ends).collect { read_list[it] }.join(' ') }
+    def stage_reads = { name, end ->
+        stream ? "cat ${read_files[end]} > ${name}" : "[ ! -f  ${name} ] && ln -s ${read_files[end]} ${name}"
+    }
+
     if (meta.single_end) {
         """
-        [ ! -f  ${prefix}.fastq.gz ] && ln -s $reads ${prefix}.fastq.gz
+        ${stage_reads("${prefix}.fastq.gz", 0)}
         trim_galore \\
             $args \\
             --cores $cores \\
@@ -58,6 +69,9 @@ process TRIMGALORE {
             $tpc_r1 \\
             ${prefix}.fastq.gz
 
+        rm ${prefix}.fastq.gz
+        mv ${prefix}_trimmed.fq.gz ${prefix}.fastq.gz
+
         cat <<-END_VERSIONS > versions.yml
         "${task.process}":
             trim_galore: \$(echo \$(trim_galore --version 2>&1) | sed 's/^.*version //; s/Last.*\$//')
@@ -66,8 +80,8 @@ process TRIMGALORE {
         """
     } else {
         """
-        [ ! -f  ${meta.id}_1.fastq.gz ] && ln -s ${reads[0]} ${meta.id}_1.fastq.gz
-        [ ! -f  ${meta.id}_2.fastq.gz ] && ln -s ${reads[1]} ${meta.id}_2.fastq.gz
+        ${stage_reads("${meta.id}_1.fastq.gz", 0)}
+        ${stage_reads("${meta.id}_2.fastq.gz", 1)}
         trim_galore \\
             $args \\
             --cores $cores \\
@@ -80,6 +94,8 @@ process TRIMGALORE {
             ${meta.id}_1.fastq.gz \\
             ${meta.id}_2.fastq.gz
 
+        rm ${meta.id}_1.fastq.gz ${meta.id}_2.fastq.gz
+
         cat <<-END_VERSIONS > versions.yml
         "${task.process}":
             trim_galore: \$(echo \$(trim_galore --version 2>&1) | sed 's/^.*version //; s/Last.*\$//')
@@ -16,6 +16,8 @@ process HOMER_FINDMOTIFSGENOME {
     tuple val(meta), path(bed)
     path fasta
     val size
+    path preparsed_root
+    val preparsed_key
 
     output:
     tuple val(meta), path("${prefix}/"), emit: motifs
@@ -29,12 +31,17 @@ process HOMER_FINDMOTIFSGENOME {
     script:
     def args = task.ext.args ?: ''
     prefix = task.ext.prefix ?: "${meta.id}"
+    // The shared preparsed background is named after the genome, so the genome is linked under the name it was built with
+    def genome    = preparsed_key ? 'homer_genome.fa' : fasta
+    def preparsed = preparsed_key ? "-preparsedDir ${preparsed_root}/${preparsed_key}" : ''
     """
+    ${preparsed_key ? "[ -e homer_genome.fa ] || ln -s $fasta homer_genome.fa" : ''}
     findMotifsGenome.pl \\
         $bed \\
-        $fasta \\
+        $genome \\
         ${prefix}/ \\
         -size $size \\
+        $preparsed \\
         $args
 
     cat <<-END_VERSIONS > versions.yml
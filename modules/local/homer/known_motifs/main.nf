@@ -0,0 +1,33 @@
+process HOMER_KNOWN_MOTIFS {
+    tag "$motif_set"
+    label 'process_single'
+
+    conda "bioconda::homer=4.11"
+    container "${ workflow.containerEngine == 'singularity' && !params.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/homer:4.11--pl526hc9558a2_3' :
+        'biocontainers/homer:4.11--pl526hc9558a2_3' }"
+
+    input:
+    val motif_set
+
+    output:
+    path  "known.motifs", emit: motifs
+    path  "versions.yml", emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    // The library findMotifsGenome.pl scores as known motifs is shipped in the data directory of the Homer install
+    """
+    HOMER_ROOT=\$(dirname \$(dirname \$(readlink -f \$(which findMotifsGenome.pl))))
+    LIBRARY=\$(find -L \$HOMER_ROOT -path "*/knownTFs/${motif_set}/known.motifs" | head -n 1)
+    [ -z "\$LIBRARY" ] && echo "Homer known motif library '${motif_set}' not found under \$HOMER_ROOT" 1>&2 && exit 1
+    cp \$LIBRARY known.motifs
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        homer: \$(echo \$(homer2 -h 2>&1) | grep -o 'v[0-9.]*' | sed 's/v//')
+    END_VERSIONS
+    """
+}
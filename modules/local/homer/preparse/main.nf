@@ -0,0 +1,75 @@
+process HOMER_PREPARSE {
+    tag "size_${size}"
+    label 'process_medium'
+
+    conda "bioconda::homer=4.11"
+    container "${ workflow.containerEngine == 'singularity' && !params.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/homer:4.11--pl526hc9558a2_3' :
+        'biocontainers/homer:4.11--pl526hc9558a2_3' }"
+
+    input:
+    path fasta
+    val  size
+    path cache_dir
+
+    output:
+    env   PREPARSED_KEY                , emit: key
+    path  "preparsed"   , optional:true, emit: dir
+    path  "versions.yml"               , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    // The background is keyed on the genome checksum and the region size, and built under a temporary
+    // name that is renamed into place in one step, so concurrent runs sharing the cache never read a
+    // partial directory and the first complete build is kept
+    def root = cache_dir ?: 'preparsed'
+    """
+    PREPARSED_KEY=\$(md5sum $fasta | cut -c1-32)_${size}
+    mkdir -p $root
+
+    if [ ! -d $root/\$PREPARSED_KEY ]; then
+        BUILD_DIR=$root/\$PREPARSED_KEY.tmp.\$\$
+        mkdir -p \$BUILD_DIR
+        [ -e homer_genome.fa ] || ln -s $fasta homer_genome.fa
+
+        # One region is enough for findMotifsGenome.pl to write the preparsed background files
+        CHROM=\$(head -n 1 $fasta | cut -c 2- | cut -d ' ' -f 1 | cut -f 1)
+        printf "preparse\\t%s\\t1\\t%s\\t+\\n" "\$CHROM" "${size}" > preparse.txt
+        findMotifsGenome.pl \\
+            preparse.txt \\
+            homer_genome.fa \\
+            preparse_out/ \\
+            -size $size \\
+            -preparsedDir \$BUILD_DIR \\
+            -nomotif \\
+            -noknown \\
+            -p $task.cpus \\
+            $args
+
+        if [ -z "\$(ls -A \$BUILD_DIR)" ]; then
+            echo "ERROR: No HOMER preparsed files were written for size ${size}" 1>&2
+            exit 1
+        fi
+        perl -e 'rename(\$ARGV[0], \$ARGV[1]) or exit 1' \$BUILD_DIR $root/\$PREPARSED_KEY || rm -rf \$BUILD_DIR
+    fi
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        homer: \$(echo \$(homer2 -h 2>&1) | grep -o 'v[0-9.]*' | sed 's/v//')
+    END_VERSIONS
+    """
+
+    stub:
+    """
+    PREPARSED_KEY=stub_${size}
+    mkdir -p preparsed/\$PREPARSED_KEY
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        homer: \$(echo \$(homer2 -h 2>&1) | grep -o 'v[0-9.]*' | sed 's/v//')
+    END_VERSIONS
+    """
+}
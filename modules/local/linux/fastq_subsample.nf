@@ -0,0 +1,49 @@
+process FASTQ_SUBSAMPLE {
+    tag "$meta.id"
+    label 'process_single'
+
+    conda "conda-forge::sed=4.7"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/ubuntu:20.04' :
+        'nf-core/ubuntu:20.04' }"
+
+    input:
+    tuple val(meta), path(reads, stageAs: "input*/*")
+    val   n_reads
+
+    output:
+    tuple val(meta), path("*.subsampled.fastq.gz"), emit: reads
+    path  "versions.yml"                          , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def prefix   = task.ext.prefix ?: "${meta.id}"
+    def readList = reads instanceof List ? reads.collect{ it.toString() } : [reads.toString()]
+    def lines    = (n_reads as long) * 4
+
+    // The first reads of each read end are taken from the technical replicates in order, which keeps mates
+    // in step. The decompression stops as soon as enough reads are written, so its broken pipe is expected.
+    def ends = [:]
+    if (meta.single_end) {
+        ends[''] = readList
+    } else {
+        def read1 = []
+        def read2 = []
+        readList.eachWithIndex{ v, ix -> ( ix & 1 ? read2 : read1 ) << v }
+        ends['_1'] = read1
+        ends['_2'] = read2
+    }
+    def commands = ends.collect { end, files ->
+        "{ gzip -cd ${files.join(' ')} || [ \$? -eq 141 ]; } | head -n $lines | gzip -1 > ${prefix}${end}.subsampled.fastq.gz"
+    }.join('\n    ')
+    """
+    $commands
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        gzip: \$(echo \$(gzip --version 2>&1) | sed 's/^gzip //; s/ .*\$//')
+    END_VERSIONS
+    """
+}
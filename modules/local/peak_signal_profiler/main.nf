@@ -4,19 +4,22 @@
 
 process PEAKSIGNALPROFILER_RUN {
     tag "${samplesheet.baseName}"
-    label 'process_single'
+    label 'process_medium'
 
     // Publish PeakSignalProfiler outputs into the canonical results reporting folder
     // (makes `psp_out/` visible under results/<outdir>/04_reporting/peaksignalprofiler)
-    publishDir "${params.outdir}/04_reporting/peaksignalprofiler", mode: 'copy'
+    publishDir "${params.outdir}/04_reporting/peaksignalprofiler", mode: "${params.publish_dir_mode}"
 
-    // Use the Singularity image supplied by the user (placeholder by default)
-    container "${params.psp_sif ?: '/path/to/peaksignalprofiler.sif'}"
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
 
     input:
-    file samplesheet
+    path samplesheet
     path annotation
     path genome
+    path bigwigs
 
     output:
     path "psp_out"                , emit: psp_out
@@ -26,18 +29,29 @@ process PEAKSIGNALPROFILER_RUN {
     when:
     task.ext.when == null || task.ext.when
 
-    // Ensure the SIF is set via params when running. The SIF contains the
-    // PSP repository under /app so a `psp_dir` parameter is not required.
-    def sif     = params.psp_sif ?: '/path/to/peaksignalprofiler.sif'
-
     script:
+    def args = task.ext.args ?: ''
     """
-    bash bin/psp_preflight.sh "${samplesheet.getName()}" "${params.outdir}" "${annotation}" "${genome}" "${task.cpus}" "${params.psp_sif}" "${params.psp_dir:-}"  
+    peak_signal_profiler.py \\
+        $args \\
+        --samplesheet $samplesheet \\
+        --bigwigs $bigwigs \\
+        --regions $annotation \\
+        --fai $genome \\
+        --outdir psp_out \\
+        --threads $task.cpus
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pybigwig: \$(python -c 'import pyBigWig; print(pyBigWig.__version__)')
+    END_VERSIONS
     """
-    
+
     stub:
     """
     mkdir -p psp_out && touch psp_out/sample_multisample_plot.png psp_out/multisample_table.tsv
+    touch psp_preflight_files.log
     echo "stub" > versions.yml
     """
 }
@@ -0,0 +1,37 @@
+process AGGREGATE_BIGWIGS {
+    tag "$meta.id"
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(targets), path(controls), val(pairs)
+
+    output:
+    tuple val(meta), path("*.{log2ratio,subtract}.bigWig"), emit: bigwig
+    tuple val(meta), path("*.mean.bigWig")                , emit: mean
+    path  "versions.yml"                                  , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    aggregate_bigwigs.py \\
+        $args \\
+        --pairs ${pairs.join(' ')} \\
+        --group $prefix \\
+        --threads $task.cpus
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pybigwig: \$(python -c 'import pyBigWig; print(pyBigWig.__version__)')
+    END_VERSIONS
+    """
+}
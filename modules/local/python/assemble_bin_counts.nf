@@ -0,0 +1,32 @@
+process ASSEMBLE_BIN_COUNTS {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(counts)
+
+    output:
+    tuple val(meta), path("*.npz"), emit: matrix
+    path  "versions.yml"          , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    assemble_bin_counts.py \\
+        --counts $counts \\
+        --output all_bam.bamSummary.npz
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        numpy: \$(python -c 'import numpy; print(numpy.__version__)')
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,41 @@
+process BAM_BIN_COUNTS {
+    tag "$meta.id"
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bam), path(bai)
+
+    output:
+    tuple val(meta), path("*.bincounts.npz"), emit: counts
+    tuple val(meta), path("*.pdf")          , emit: pdf
+    tuple val(meta), path("*.raw.txt")      , emit: matrix
+    tuple val(meta), path("*.qcmetrics.txt"), emit: metrics
+    path  "versions.yml"                    , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    bam_bin_counts.py \\
+        $args \\
+        --bam $bam \\
+        --label $meta.id \\
+        --prefix $prefix \\
+        --plot \\
+        --threads $task.cpus
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pysam: \$(python -c 'import pysam; print(pysam.__version__)')
+    END_VERSIONS
+    """
+}
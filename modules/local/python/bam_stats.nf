@@ -0,0 +1,40 @@
+process BAM_STATS_NATIVE {
+    tag "$meta.id"
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bam), path(bai)
+
+    output:
+    tuple val(meta), path("*.stats")        , emit: stats
+    tuple val(meta), path("*.flagstat")     , emit: flagstat
+    tuple val(meta), path("*.idxstats")     , emit: idxstats
+    tuple val(meta), path("*.frags.len.txt"), emit: frag_len
+    path  "versions.yml"                    , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    bam_stats.py \\
+        $args \\
+        --bam $bam \\
+        --prefix $prefix \\
+        --sample_id ${meta.id} \\
+        --threads $task.cpus
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pysam: \$(python -c 'import pysam; print(pysam.__version__)')
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,41 @@
+process BAM_TO_COVERAGE {
+    tag "$meta.id"
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bam), path(bai), val(scale)
+    path  sizes
+
+    output:
+    tuple val(meta), path("*.bedGraph"), emit: bedgraph
+    tuple val(meta), path("*.bigWig")  , emit: bigwig
+    path  "versions.yml"               , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    bam_to_coverage.py \\
+        --bam $bam \\
+        --chrom_sizes $sizes \\
+        --prefix $prefix \\
+        --scale $scale \\
+        --threads $task.cpus \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        numpy: \$(python -c 'import numpy; print(numpy.__version__)')
+        pysam: \$(python -c 'import pysam; print(pysam.__version__)')
+    END_VERSIONS
+    """
+}
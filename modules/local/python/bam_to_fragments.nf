@@ -0,0 +1,38 @@
+process BAM_TO_FRAGMENTS {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bam)
+
+    output:
+    tuple val(meta), path("*.{bed,bed.gz}"), emit: bed
+    tuple val(meta), path("*.tbi")         , optional: true, emit: tbi
+    tuple val(meta), path("*.frag")        , optional: true, emit: store
+    path  "versions.yml"                   , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    bam_to_fragments.py \\
+        --bam $bam \\
+        --output ${prefix}.bed \\
+        --threads $task.cpus \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pysam: \$(python -c 'import pysam; print(pysam.__version__)')
+    END_VERSIONS
+    """
+}
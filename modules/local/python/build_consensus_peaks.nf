@@ -0,0 +1,34 @@
+process BUILD_CONSENSUS_PEAKS {
+    tag "$meta.id"
+    label 'process_single'
+
+    conda "conda-forge::python=3.8.3"
+    container "quay.io/biocontainers/python:3.8.3"
+
+    input:
+    tuple val(meta), path(peaks)
+
+    output:
+    tuple val(meta), path("*.peak_counts.bed"), emit: merged_bed
+    tuple val(meta), path("*.peaks.awk.bed")  , emit: filtered_bed
+    path "versions.yml"                       , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}.consensus"
+    """
+    build_consensus_peaks.py \\
+        --peaks $peaks \\
+        --merged ${prefix}.peak_counts.bed \\
+        --filtered ${prefix}.peaks.awk.bed \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,54 @@
+process CALCULATE_FRIP {
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(sample_ids), path(fragments, stageAs: 'fragments*/*'), path(flagstats, stageAs: 'flagstat*/*')
+    tuple val(peak_rows), path(peaks, stageAs: 'peaks*/*')
+    path  frip_score_header
+    path  frip_sets_header
+    val   min_frip_overlap
+
+    output:
+    path "primary/*_mqc.tsv"    , optional: true, emit: frip_mqc
+    path "*.frip_scores_mqc.tsv", emit: sets_mqc
+    path "*.frip_scores.tsv"    , emit: tsv
+    path "versions.yml"         , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args          = task.ext.args ?: ''
+    def prefix        = task.ext.prefix ?: "peak_sets"
+    def fragment_list = fragments instanceof List ? fragments : [ fragments ]
+    def flagstat_list = flagstats instanceof List ? flagstats : [ flagstats ]
+    def peak_list     = peaks instanceof List ? peaks : [ peaks ]
+    def samples       = [ sample_ids, fragment_list, flagstat_list ].transpose().collect { it.join('\\t') }.join('\\n')
+    def peak_sets     = [ peak_rows, peak_list ].transpose().collect { row, bed -> (row + [ bed ]).join('\\t') }.join('\\n')
+    """
+    printf '%b\\n' '${samples}' > samples.tsv
+    printf '%b\\n' '${peak_sets}' > peak_sets.tsv
+
+    calc_frip.py \\
+        --samples samples.tsv \\
+        --peaks peak_sets.tsv \\
+        --header $frip_score_header \\
+        --sets_header $frip_sets_header \\
+        --min_overlap $min_frip_overlap \\
+        --output ${prefix}.frip_scores \\
+        --primary_dir primary \\
+        --threads $task.cpus \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        numpy: \$(python -c 'import numpy; print(numpy.__version__)')
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,39 @@
+process COLLECT_METRICS {
+    label 'process_single'
+
+    conda "conda-forge::python=3.8.3"
+    container "quay.io/biocontainers/python:3.8.3"
+
+    input:
+    tuple val(rows), path(reports, stageAs: 'reports*/*')
+
+    output:
+    path "*.csv"                            , emit: csv
+    path "*.json"                           , emit: json
+    path "per_sample/*_meta_bt2_target.csv" , optional: true, emit: bt2_target
+    path "per_sample/*_meta_bt2_spikein.csv", optional: true, emit: bt2_spikein
+    path "versions.yml"                     , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args     = task.ext.args ?: ''
+    def prefix   = task.ext.prefix ?: "cohort_metrics"
+    def staged   = reports instanceof List ? reports : [ reports ]
+    def manifest = [ rows, staged ].transpose().collect { row, report -> (row + [ report ]).join('\\t') }.join('\\n')
+    """
+    printf '%b\\n' '${manifest}' > manifest.tsv
+
+    collect_metrics.py \\
+        --manifest manifest.tsv \\
+        --output $prefix \\
+        --per_sample_dir per_sample \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,34 @@
+process COMBINE_GENOMES {
+    tag "$meta.id"
+    label 'process_single'
+
+    conda "conda-forge::python=3.8.3"
+    container "quay.io/biocontainers/python:3.8.3"
+
+    input:
+    tuple val(meta), path(fasta)
+    tuple val(meta2), path(spikein_fasta)
+
+    output:
+    tuple val(meta), path("*.fa"), emit: fasta
+    path "versions.yml"          , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    combine_genomes.py \\
+        --target $fasta \\
+        --spikein $spikein_fasta \\
+        --output ${prefix}.fa \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,40 @@
+process COMPUTE_MATRIX {
+    tag "$meta.id"
+    label 'process_high'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bigwig)
+    path  bed
+
+    output:
+    tuple val(meta), path("*.mat.gz") , emit: matrix
+    tuple val(meta), path("*.mat.tab"), emit: table
+    path  "versions.yml"              , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    compute_matrix.py \\
+        $args \\
+        --regionsFileName $bed \\
+        --scoreFileName $bigwig \\
+        --outFileName ${prefix}.computeMatrix.mat.gz \\
+        --outFileNameMatrix ${prefix}.computeMatrix.vals.mat.tab \\
+        --numberOfProcessors $task.cpus
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pybigwig: \$(python -c 'import pyBigWig; print(pyBigWig.__version__)')
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,44 @@
+process CONSENSUS_COUNT_MATRIX {
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(sample_ids), path(fragments, stageAs: 'fragments*/*')
+    path  peaks, stageAs: 'peaks*/*'
+
+    output:
+    path "*.counts.tsv"         , optional: true, emit: counts
+    path "*.counts.mtx"         , optional: true, emit: mtx
+    path "*.library_sizes.tsv"  , emit: library_sizes
+    path "*.{peaks,samples}.tsv", optional: true, emit: mtx_index
+    path "versions.yml"         , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args          = task.ext.args ?: ''
+    def prefix        = task.ext.prefix ?: "consensus_peaks"
+    def fragment_list = fragments instanceof List ? fragments : [ fragments ]
+    def samples       = [ sample_ids, fragment_list ].transpose().collect { it.join('\\t') }.join('\\n')
+    """
+    printf '%b\\n' '${samples}' > samples.tsv
+
+    consensus_count_matrix.py \\
+        --samples samples.tsv \\
+        --peaks $peaks \\
+        --output $prefix \\
+        --threads $task.cpus \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        numpy: \$(python -c 'import numpy; print(numpy.__version__)')
+    END_VERSIONS
+    """
+}
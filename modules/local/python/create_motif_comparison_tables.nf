@@ -19,7 +19,7 @@ process CREATE_MOTIF_COMPARISON_TABLES {
 
     output:
     path("Known_Motifs_Comparison_Table.tsv") , emit: known_table
-    path("DeNovo_Motifs_Comparison_Table.tsv"), emit: denovo_table
+    path("DeNovo_Motifs_Comparison_Table.tsv"), emit: denovo_table, optional: true
     path("versions.yml")                      , emit: versions
 
     when:
@@ -47,7 +47,8 @@ process CREATE_MOTIF_COMPARISON_TABLES {
     
     # Move output files to work directory root where Nextflow expects them
     mv homer_motifs/Known_Motifs_Comparison_Table.tsv .
-    mv homer_motifs/DeNovo_Motifs_Comparison_Table.tsv .
+    # No de novo table is written for known motif scans
+    [ ! -f homer_motifs/DeNovo_Motifs_Comparison_Table.tsv ] || mv homer_motifs/DeNovo_Motifs_Comparison_Table.tsv .
     
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -0,0 +1,44 @@
+process DOWNSAMPLE_BAM_NATIVE {
+    tag "$meta.id"
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bam), path(bai), path(flagstat)
+    path chrom_sizes
+    val target_coverage
+    val seed
+
+    output:
+    tuple val(meta), path("${meta.id}.downsampled.bam"), path("${meta.id}.downsampled.bam.bai"), emit: bam
+    tuple val(meta), path("${meta.id}.downsampled_*.bam"), path("${meta.id}.downsampled_*.bam.bai"), optional: true, emit: extra
+    path "versions.yml", emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    """
+    downsample_bam.py \\
+        --bam $bam \\
+        --bai $bai \\
+        --flagstat $flagstat \\
+        --chrom_sizes $chrom_sizes \\
+        --coverage $target_coverage \\
+        --seed $seed \\
+        --prefix ${meta.id} \\
+        --threads $task.cpus \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pysam: \$(python -c 'import pysam; print(pysam.__version__)')
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,53 @@
+process KNOWN_MOTIF_SCAN {
+    tag "$meta.id"
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bed)
+    path fasta
+    path fai
+    val  size
+    path motifs
+
+    output:
+    tuple val(meta), path("${prefix}/")                 , emit: motifs
+    tuple val(meta), path("${prefix}/knownResults.txt") , emit: known_results
+    path  "versions.yml"                                , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    prefix   = task.ext.prefix ?: "${meta.id}"
+    """
+    known_motif_scan.py \\
+        $args \\
+        --peaks $bed \\
+        --fasta $fasta \\
+        --motifs $motifs \\
+        --size $size \\
+        --outdir ${prefix} \\
+        --threads $task.cpus
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        numpy: \$(python -c 'import numpy; print(numpy.__version__)')
+        pysam: \$(python -c 'import pysam; print(pysam.__version__)')
+    END_VERSIONS
+    """
+
+    stub:
+    prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    mkdir -p ${prefix}/
+    touch ${prefix}/knownResults.txt
+    echo "stub" > versions.yml
+    """
+}
@@ -0,0 +1,40 @@
+process PEAK_IDR {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(peaks_a, stageAs: 'a/*'), path(peaks_b, stageAs: 'b/*')
+    val score_column
+
+    output:
+    tuple val(meta), path("*.idr.tsv")             , emit: tsv
+    tuple val(meta), path("*.idr_thresholded.bed") , emit: bed
+    tuple val(meta), path("*.idr_summary.tsv")     , emit: summary
+    path  "versions.yml"                           , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    peak_idr.py \\
+        $args \\
+        --peaks_a $peaks_a \\
+        --peaks_b $peaks_b \\
+        --score_column $score_column \\
+        --prefix $prefix
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        numpy: \$(python -c 'import numpy; print(numpy.__version__)')
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,41 @@
+process RESCALE_COVERAGE {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bedgraph)
+    path sizes
+    val target_coverage
+    val seed
+
+    output:
+    tuple val(meta), path("*.bigWig"), emit: bigwig
+    path "versions.yml"              , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args   = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    rescale_coverage.py \\
+        --bedgraph $bedgraph \\
+        --chrom_sizes $sizes \\
+        --coverage $target_coverage \\
+        --seed $seed \\
+        --output ${prefix}.bigWig \\
+        $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pybigwig: \$(python -c 'import pyBigWig; print(pyBigWig.__version__)')
+    END_VERSIONS
+    """
+}
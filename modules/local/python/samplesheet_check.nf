@@ -7,6 +7,8 @@ process SAMPLESHEET_CHECK {
 
     input:
     path samplesheet
+    val  fastq_paths
+    path fastqs, stageAs: 'fastq?/*'
 
     output:
     path '*.csv'        , emit: csv
@@ -16,8 +18,20 @@ process SAMPLESHEET_CHECK {
     task.ext.when == null || task.ext.when
 
     script:
+    def args      = task.ext.args ?: ''
+    def staged    = fastqs instanceof List ? fastqs : [ fastqs ]
+    def fastq_map = [ fastq_paths, staged ].transpose().collect { src, local -> "${src}\\t${local}" }.join('\\n')
+    def map_arg   = fastq_paths ? '--fastq_map fastq_map.tsv' : ''
     """
-    check_samplesheet.py $samplesheet samplesheet.valid.csv $params.use_control
+    printf '%b\\n' '${fastq_map}' > fastq_map.tsv
+
+    check_samplesheet.py \\
+        $samplesheet \\
+        samplesheet.valid.csv \\
+        $params.use_control \\
+        $map_arg \\
+        --threads $task.cpus \\
+        $args
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
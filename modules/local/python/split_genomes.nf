@@ -0,0 +1,40 @@
+process SPLIT_GENOMES {
+    tag "$meta.id"
+    label 'process_medium'
+
+    conda "bioconda::deeptools=3.5.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/deeptools:3.5.1--py_0':
+        'biocontainers/deeptools:3.5.1--py_0' }"
+
+    input:
+    tuple val(meta), path(bam)
+
+    output:
+    tuple val(meta), path("*.target.bam")         , emit: bam
+    tuple val(meta), path("*.spikein.bam")        , emit: spikein_bam
+    tuple val(meta), path("${prefix}.bowtie2.log"), emit: log
+    tuple val(meta), path("*.spikein.bowtie2.log"), emit: spikein_log
+    tuple val(meta), path("*.genome_split.tsv")   , emit: report
+    path  "versions.yml"                          , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    prefix   = task.ext.prefix ?: "${meta.id}"
+    """
+    split_genomes.py \\
+        $args \\
+        --bam $bam \\
+        --prefix $prefix \\
+        --threads $task.cpus
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version | grep -E -o \"([0-9]{1,}\\.)+[0-9]{1,}\")
+        pysam: \$(python -c 'import pysam; print(pysam.__version__)')
+    END_VERSIONS
+    """
+}
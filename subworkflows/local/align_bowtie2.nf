@@ -4,67 +4,138 @@
 
 include { BOWTIE2_ALIGN as BOWTIE2_TARGET_ALIGN                      } from '../../modules/nf-core/bowtie2/align/main'
 include { BOWTIE2_ALIGN as BOWTIE2_SPIKEIN_ALIGN                     } from '../../modules/nf-core/bowtie2/align/main'
-include { BAM_SORT_STATS_SAMTOOLS                                    } from '../nf-core/bam_sort_stats_samtools/main'
-include { BAM_SORT_STATS_SAMTOOLS as BAM_SORT_STATS_SAMTOOLS_SPIKEIN } from '../nf-core/bam_sort_stats_samtools/main'
+include { BOWTIE2_ALIGN as BOWTIE2_COMBINED_ALIGN                    } from '../../modules/nf-core/bowtie2/align/main'
+include { BOWTIE2_FUSED_ALIGN                                        } from '../../modules/local/bowtie2_fused_align'
+include { SPLIT_GENOMES                                              } from '../../modules/local/python/split_genomes'
+include { BAM_SORT_STATS as BAM_SORT_STATS_SAMTOOLS                  } from './bam_sort_stats'
+include { BAM_SORT_STATS as BAM_SORT_STATS_SAMTOOLS_SPIKEIN          } from './bam_sort_stats'
 
 workflow ALIGN_BOWTIE2 {
     take:
-    reads         // channel: [ val(meta), [ reads ] ]
-    index         // channel: [ val(meta), [ index ] ]
-    spikein_index // channel: [ val(meta), [ index ] ]
-    fasta         // channel: [ val(meta), fasta ]
-    spikein_fasta // channel: [ val(meta), fasta ]
+    reads          // channel: [ val(meta), [ reads ] ]
+    index          // channel: [ val(meta), [ index ] ]
+    spikein_index  // channel: [ val(meta), [ index ] ]
+    fasta          // channel: [ val(meta), fasta ]
+    spikein_fasta  // channel: [ val(meta), fasta ]
+    combined_index // channel: [ val(meta), [ index ] ]
+    combined_mode  // boolean: align once to the combined genome and split the alignments by genome
+    regions        // channel: [ regions ]
+    fused_mode     // boolean: filter and sort the target alignments in the alignment task
+    stats_native   // boolean: write the stats reports from one scan of each bam
 
     main:
     ch_versions = Channel.empty()
 
-    /*
-     * Map reads with BOWTIE2 to target genome
-     */
-    ch_index = index.map { [[id:it.baseName], it] }
-    BOWTIE2_TARGET_ALIGN (
-        reads,
-        ch_index.collect{ it[1] },
-        params.save_unaligned,
-        false
-    )
-    ch_versions = ch_versions.mix(BOWTIE2_TARGET_ALIGN.out.versions)
+    if (combined_mode) {
+        /*
+         * Map reads with BOWTIE2 once to the combined target and spike-in genome
+         */
+        ch_combined_index = combined_index.map { [[id:it.baseName], it] }
+        BOWTIE2_COMBINED_ALIGN (
+            reads,
+            ch_combined_index.collect{ it[1] },
+            params.save_unaligned,
+            false
+        )
+        ch_versions = ch_versions.mix(BOWTIE2_COMBINED_ALIGN.out.versions)
 
-    /*
-     * Map reads with BOWTIE2 to spike-in genome
-     */
-    ch_spikein_index = spikein_index.map { [[id:it.baseName], it] }
-    BOWTIE2_SPIKEIN_ALIGN (
-        reads,
-        ch_spikein_index.collect{ it[1] },
-        params.save_unaligned,
-        false
-    )
-    ch_versions = ch_versions.mix(BOWTIE2_SPIKEIN_ALIGN.out.versions)
+        /*
+         * Split the alignments by genome and write a bowtie2 summary for each
+         */
+        SPLIT_GENOMES (
+            BOWTIE2_COMBINED_ALIGN.out.aligned
+        )
+        ch_versions = ch_versions.mix(SPLIT_GENOMES.out.versions)
+
+        ch_target_bam  = SPLIT_GENOMES.out.bam
+        ch_spikein_bam = SPLIT_GENOMES.out.spikein_bam
+        ch_target_log  = SPLIT_GENOMES.out.log
+        ch_spikein_log = SPLIT_GENOMES.out.spikein_log
+    } else {
+        /*
+         * Map reads with BOWTIE2 to target genome
+         */
+        ch_index = index.map { [[id:it.baseName], it] }
+        if (fused_mode) {
+            BOWTIE2_FUSED_ALIGN (
+                reads,
+                ch_index.collect{ it[1] },
+                regions,
+                params.save_unaligned
+            )
+            ch_versions = ch_versions.mix(BOWTIE2_FUSED_ALIGN.out.versions)
+        } else {
+            BOWTIE2_TARGET_ALIGN (
+                reads,
+                ch_index.collect{ it[1] },
+                params.save_unaligned,
+                false
+            )
+            ch_versions = ch_versions.mix(BOWTIE2_TARGET_ALIGN.out.versions)
+        }
+
+        /*
+         * Map reads with BOWTIE2 to spike-in genome
+         */
+        ch_spikein_index = spikein_index.map { [[id:it.baseName], it] }
+        BOWTIE2_SPIKEIN_ALIGN (
+            reads,
+            ch_spikein_index.collect{ it[1] },
+            params.save_unaligned,
+            false
+        )
+        ch_versions = ch_versions.mix(BOWTIE2_SPIKEIN_ALIGN.out.versions)
+
+        ch_target_bam  = fused_mode ? BOWTIE2_FUSED_ALIGN.out.bam : BOWTIE2_TARGET_ALIGN.out.aligned
+        ch_spikein_bam = BOWTIE2_SPIKEIN_ALIGN.out.aligned
+        ch_target_log  = fused_mode ? BOWTIE2_FUSED_ALIGN.out.log : BOWTIE2_TARGET_ALIGN.out.log
+        ch_spikein_log = BOWTIE2_SPIKEIN_ALIGN.out.log
+    }
 
     /*
      * Sort, index BAM file and run samtools stats, flagstat and idxstats
      */
-    BAM_SORT_STATS_SAMTOOLS ( BOWTIE2_TARGET_ALIGN.out.aligned, fasta )
-    ch_versions = ch_versions.mix(BAM_SORT_STATS_SAMTOOLS.out.versions)
+    if (fused_mode) {
+        // The fused alignment task already wrote the filtered, sorted and indexed BAM and its stats
+        ch_bam                 = BOWTIE2_FUSED_ALIGN.out.bam
+        ch_bai                 = BOWTIE2_FUSED_ALIGN.out.bai
+        ch_stats               = BOWTIE2_FUSED_ALIGN.out.stats
+        ch_flagstat            = BOWTIE2_FUSED_ALIGN.out.flagstat
+        ch_idxstats            = BOWTIE2_FUSED_ALIGN.out.idxstats
+        ch_unfiltered_flagstat = BOWTIE2_FUSED_ALIGN.out.unfiltered_flagstat
+        ch_frag_len            = Channel.empty()
+    } else {
+        BAM_SORT_STATS_SAMTOOLS ( ch_target_bam, fasta, stats_native )
+        ch_versions = ch_versions.mix(BAM_SORT_STATS_SAMTOOLS.out.versions)
+
+        ch_bam                 = BAM_SORT_STATS_SAMTOOLS.out.bam
+        ch_bai                 = BAM_SORT_STATS_SAMTOOLS.out.bai
+        ch_stats               = BAM_SORT_STATS_SAMTOOLS.out.stats
+        ch_flagstat            = BAM_SORT_STATS_SAMTOOLS.out.flagstat
+        ch_idxstats            = BAM_SORT_STATS_SAMTOOLS.out.idxstats
+        ch_unfiltered_flagstat = BAM_SORT_STATS_SAMTOOLS.out.flagstat
+        ch_frag_len            = BAM_SORT_STATS_SAMTOOLS.out.frag_len
+    }
 
-    BAM_SORT_STATS_SAMTOOLS_SPIKEIN ( BOWTIE2_SPIKEIN_ALIGN.out.aligned, spikein_fasta )
+    BAM_SORT_STATS_SAMTOOLS_SPIKEIN ( ch_spikein_bam, spikein_fasta, stats_native )
     ch_versions = ch_versions.mix(BAM_SORT_STATS_SAMTOOLS_SPIKEIN.out.versions)
 
     emit:
     versions             = ch_versions                                  // channel: [ versions.yml ]
 
-    orig_bam             = BOWTIE2_TARGET_ALIGN.out.aligned             // channel: [ val(meta), bam ]
-    orig_spikein_bam     = BOWTIE2_SPIKEIN_ALIGN.out.aligned            // channel: [ val(meta), bam ]
+    orig_bam             = ch_target_bam                                // channel: [ val(meta), bam ]
+    orig_spikein_bam     = ch_spikein_bam                               // channel: [ val(meta), bam ]
 
-    bowtie2_log          = BOWTIE2_TARGET_ALIGN.out.log                 // channel: [ val(meta), log_final ]
-    bowtie2_spikein_log  = BOWTIE2_SPIKEIN_ALIGN.out.log                // channel: [ val(meta), log_final ]
+    bowtie2_log          = ch_target_log                                // channel: [ val(meta), log_final ]
+    bowtie2_spikein_log  = ch_spikein_log                               // channel: [ val(meta), log_final ]
 
-    bam                  = BAM_SORT_STATS_SAMTOOLS.out.bam              // channel: [ val(meta), [ bam ] ]
-    bai                  = BAM_SORT_STATS_SAMTOOLS.out.bai              // channel: [ val(meta), [ bai ] ]
-    stats                = BAM_SORT_STATS_SAMTOOLS.out.stats            // channel: [ val(meta), [ stats ] ]
-    flagstat             = BAM_SORT_STATS_SAMTOOLS.out.flagstat         // channel: [ val(meta), [ flagstat ] ]
-    idxstats             = BAM_SORT_STATS_SAMTOOLS.out.idxstats         // channel: [ val(meta), [ idxstats ] ]
+    bam                  = ch_bam                                       // channel: [ val(meta), [ bam ] ]
+    bai                  = ch_bai                                       // channel: [ val(meta), [ bai ] ]
+    stats                = ch_stats                                     // channel: [ val(meta), [ stats ] ]
+    flagstat             = ch_flagstat                                  // channel: [ val(meta), [ flagstat ] ]
+    idxstats             = ch_idxstats                                  // channel: [ val(meta), [ idxstats ] ]
+    unfiltered_flagstat  = ch_unfiltered_flagstat                       // channel: [ val(meta), [ flagstat ] ]
+    frag_len             = ch_frag_len                                  // channel: [ val(meta), [ frags.len.txt ] ]
 
     spikein_bam          = BAM_SORT_STATS_SAMTOOLS_SPIKEIN.out.bam      // channel: [ val(meta), [ bam ] ]
     spikein_bai          = BAM_SORT_STATS_SAMTOOLS_SPIKEIN.out.bai      // channel: [ val(meta), [ bai ] ]
@@ -0,0 +1,40 @@
+/*
+ * Run samtools stats, flagstat and idxstats, or write all three reports and the fragment lengths in one scan
+ */
+
+include { BAM_STATS_NATIVE   } from '../../modules/local/python/bam_stats'
+include { BAM_STATS_SAMTOOLS } from '../nf-core/bam_stats_samtools/main'
+
+workflow BAM_STATS {
+    take:
+    ch_bam_bai  // channel: [ val(meta), path(bam), path(bai) ]
+    ch_fasta    // channel: [ val(meta), path(fasta) ]
+    native_mode // boolean: write the reports from one scan of each bam
+
+    main:
+    ch_versions = Channel.empty()
+    ch_frag_len = Channel.empty()
+
+    if (native_mode) {
+        BAM_STATS_NATIVE ( ch_bam_bai )
+        ch_stats    = BAM_STATS_NATIVE.out.stats
+        ch_flagstat = BAM_STATS_NATIVE.out.flagstat
+        ch_idxstats = BAM_STATS_NATIVE.out.idxstats
+        ch_frag_len = BAM_STATS_NATIVE.out.frag_len
+        ch_versions = ch_versions.mix(BAM_STATS_NATIVE.out.versions)
+    } else {
+        BAM_STATS_SAMTOOLS ( ch_bam_bai, ch_fasta )
+        ch_stats    = BAM_STATS_SAMTOOLS.out.stats
+        ch_flagstat = BAM_STATS_SAMTOOLS.out.flagstat
+        ch_idxstats = BAM_STATS_SAMTOOLS.out.idxstats
+        ch_versions = ch_versions.mix(BAM_STATS_SAMTOOLS.out.versions)
+    }
+
+    emit:
+    stats    = ch_stats    // channel: [ val(meta), path(stats) ]
+    flagstat = ch_flagstat // channel: [ val(meta), path(flagstat) ]
+    idxstats = ch_idxstats // channel: [ val(meta), path(idxstats) ]
+    frag_len = ch_frag_len // channel: [ val(meta), path(frags.len.txt) ]
+
+    versions = ch_versions // channel: [ path(versions.yml) ]
+}
@@ -5,28 +5,40 @@
 include { SORT                 } from '../../modules/local/linux/sort'
 include { BEDTOOLS_MERGE       } from '../../modules/nf-core/bedtools/merge/main'
 include { AWK                  } from '../../modules/local/linux/awk'
+include { BUILD_CONSENSUS_PEAKS } from '../../modules/local/python/build_consensus_peaks'
 
 workflow CONSENSUS_PEAKS {
     take:
-    bed //  channel: [ val(meta), [ bed ], count]
+    bed         //  channel: [ val(meta), [ bed ], count]
+    native_mode // boolean: merge and filter the sorted peak files in one streaming task
 
     main:
     ch_versions = Channel.empty()
 
-    // Sort bed files
-    SORT ( bed )
-    ch_versions = ch_versions.mix(SORT.out.versions)
+    if (native_mode) {
+        // Merge the peak files and filter on minimum replicate consensus in one pass
+        BUILD_CONSENSUS_PEAKS ( bed )
+        ch_merged_bed   = BUILD_CONSENSUS_PEAKS.out.merged_bed
+        ch_filtered_bed = BUILD_CONSENSUS_PEAKS.out.filtered_bed
+        ch_versions     = ch_versions.mix(BUILD_CONSENSUS_PEAKS.out.versions)
+    } else {
+        // Sort bed files
+        SORT ( bed )
+        ch_versions = ch_versions.mix(SORT.out.versions)
 
-    // Merge peaks
-    BEDTOOLS_MERGE ( SORT.out.file )
-    ch_versions = ch_versions.mix(BEDTOOLS_MERGE.out.versions)
+        // Merge peaks
+        BEDTOOLS_MERGE ( SORT.out.file )
+        ch_versions = ch_versions.mix(BEDTOOLS_MERGE.out.versions)
 
-    // Filter peaks on minimum replicate consensus
-    AWK ( BEDTOOLS_MERGE.out.bed )
-    ch_versions = ch_versions.mix(AWK.out.versions)
+        // Filter peaks on minimum replicate consensus
+        AWK ( BEDTOOLS_MERGE.out.bed )
+        ch_merged_bed   = BEDTOOLS_MERGE.out.bed
+        ch_filtered_bed = AWK.out.file
+        ch_versions     = ch_versions.mix(AWK.out.versions)
+    }
 
     emit:
-    merged_bed   = BEDTOOLS_MERGE.out.bed  // channel: [ val(meta), [ bed ] ]
-    filtered_bed = AWK.out.file            // channel: [ val(meta), [ bed ] ]
+    merged_bed   = ch_merged_bed   // channel: [ val(meta), [ bed ] ]
+    filtered_bed = ch_filtered_bed // channel: [ val(meta), [ bed ] ]
     versions     = ch_versions             // channel: [ versions.yml       ]
 }
@@ -2,11 +2,11 @@
  * First use custom .py script to find unique linear amplification alignments, samtools filter unique alignments, index BAM file and run samtools stats, flagstat and idxstats
  */
 
-include { BEDTOOLS_BAMTOBED       } from "../../modules/nf-core/bedtools/bamtobed/main"
-include { FIND_UNIQUE_READS       } from '../../modules/local/python/find_unique_reads'
-include { BAM_SORT_STATS_SAMTOOLS } from '../nf-core/bam_sort_stats_samtools/main'
-include { SAMTOOLS_SORT           } from "../../modules/nf-core/samtools/sort/main.nf"
-include { SAMTOOLS_VIEW           } from "../../modules/nf-core/samtools/view/main.nf"
+include { BEDTOOLS_BAMTOBED                         } from "../../modules/nf-core/bedtools/bamtobed/main"
+include { FIND_UNIQUE_READS                         } from '../../modules/local/python/find_unique_reads'
+include { BAM_SORT_STATS as BAM_SORT_STATS_SAMTOOLS } from './bam_sort_stats'
+include { SAMTOOLS_SORT                             } from "../../modules/nf-core/samtools/sort/main.nf"
+include { SAMTOOLS_VIEW                             } from "../../modules/nf-core/samtools/view/main.nf"
 
 workflow DEDUPLICATE_LINEAR {
     take:
@@ -16,6 +16,7 @@ workflow DEDUPLICATE_LINEAR {
     fai            // channel: [ val(meta), fai ]
     process_target // boolean
     mqc_header     // path
+    stats_native   // boolean: write the stats reports from one scan of each bam
 
     main:
     /*
@@ -142,7 +143,8 @@ workflow DEDUPLICATE_LINEAR {
     */
     BAM_SORT_STATS_SAMTOOLS (
         ch_bam,
-        fasta
+        fasta,
+        stats_native
     )
     ch_versions = ch_versions.mix( BAM_SORT_STATS_SAMTOOLS.out.versions )
 
@@ -152,6 +154,7 @@ workflow DEDUPLICATE_LINEAR {
     stats              = BAM_SORT_STATS_SAMTOOLS.out.stats         // channel: [ val(meta), [ stats ] ]
     flagstat           = BAM_SORT_STATS_SAMTOOLS.out.flagstat      // channel: [ val(meta), [ flagstat ] ]
     idxstats           = BAM_SORT_STATS_SAMTOOLS.out.idxstats      // channel: [ val(meta), [ idxstats ] ]
+    frag_len           = BAM_SORT_STATS_SAMTOOLS.out.frag_len      // channel: [ val(meta), [ frags.len.txt ] ]
     metrics            = ch_metrics                                // channel: [ metrics.txt  ]
     linear_metrics_mqc = FIND_UNIQUE_READS.out.linear_metrics_mqc  // channel: [ mqc.tsv ]
     versions           = ch_versions                               // channel: [ versions.yml ]
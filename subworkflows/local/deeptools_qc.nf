@@ -6,12 +6,15 @@ include { DEEPTOOLS_MULTIBAMSUMMARY } from '../../modules/nf-core/deeptools/mult
 include { DEEPTOOLS_PLOTCORRELATION } from '../../modules/nf-core/deeptools/plotcorrelation/main'
 include { DEEPTOOLS_PLOTPCA         } from '../../modules/nf-core/deeptools/plotpca/main'
 include { DEEPTOOLS_PLOTFINGERPRINT } from '../../modules/nf-core/deeptools/plotfingerprint/main'
+include { BAM_BIN_COUNTS            } from '../../modules/local/python/bam_bin_counts'
+include { ASSEMBLE_BIN_COUNTS       } from '../../modules/local/python/assemble_bin_counts'
 
 workflow DEEPTOOLS_QC {
     take:
     bam         // channel: [ val(meta), [ bam ] ]
     bai         // channel: [ val(meta), [ bai ] ]
     corr_method // val
+    native_mode // boolean: count each bam once and build all qc matrices from the bin counts
 
     main:
     ch_versions = Channel.empty()
@@ -25,72 +28,105 @@ workflow DEEPTOOLS_QC {
     // EXAMPLE CHANNEL STRUCT: [[META], BAM, BAI]
     // ch_bam_bai | view
 
-    /*
-    * CHANNEL: Get list of sample ids
-    */
-    ch_bam_bai.map { row -> [row[0].id] }
-    .collect()
-    .map { row -> [row] }
-    .set { ch_ids }
-    //ch_ids | view
+    if (native_mode) {
+        /*
+        * MODULE: Count each bam into genome bins once and write its fingerprint
+        */
+        BAM_BIN_COUNTS (
+            ch_bam_bai
+        )
+        ch_versions    = ch_versions.mix(BAM_BIN_COUNTS.out.versions)
+        ch_fingerprint = BAM_BIN_COUNTS.out.matrix
 
-    /*
-    * CHANNEL: Combine bam and bai files into one list
-    * if we only have one file then cancel correlation and PCA
-    */
-    ch_bam_bai.map { row -> [row[1]] }
-    .collect()
-    .map { row -> [row] }
-    .combine( ch_bam_bai.map { row -> [row[2]] }.collect().map { row -> [row] } )
-    .combine( ch_ids )
-    .map { row -> [[id: 'all_target_bams'], row[0], row[1], row[2], row[1].size()] }
-    .filter { row -> row[4] > 1 }
-    .map { row -> [row[0], row[1], row[2], row[3]] }
-    .set { ch_bam_bai_all }
-    //ch_bam_bai_all | view
+        /*
+        * CHANNEL: Collect the bin counts of all samples
+        * if we only have one file then cancel correlation and PCA
+        */
+        BAM_BIN_COUNTS.out.counts
+        .toSortedList { a, b -> a[0].id <=> b[0].id }
+        .map { rows -> [[id: 'all_target_bams'], rows.collect { it[1] }] }
+        .filter { row -> row[1].size() > 1 }
+        .set { ch_counts_all }
+        //ch_counts_all | view
 
-    /*
-    * MODULE: Summarise bams into bins
-    */
-    DEEPTOOLS_MULTIBAMSUMMARY (
-        ch_bam_bai_all
-    )
-    ch_versions = ch_versions.mix(DEEPTOOLS_MULTIBAMSUMMARY.out.versions)
-    //DEEPTOOLS_MULTIBAMSUMMARY.out.matrix | view
+        /*
+        * MODULE: Stack the bin counts into the multiBamSummary matrix
+        */
+        ASSEMBLE_BIN_COUNTS (
+            ch_counts_all
+        )
+        ch_versions   = ch_versions.mix(ASSEMBLE_BIN_COUNTS.out.versions)
+        ch_bam_matrix = ASSEMBLE_BIN_COUNTS.out.matrix
+    } else {
+        /*
+        * CHANNEL: Get list of sample ids
+        */
+        ch_bam_bai.map { row -> [row[0].id] }
+        .collect()
+        .map { row -> [row] }
+        .set { ch_ids }
+        //ch_ids | view
+
+        /*
+        * CHANNEL: Combine bam and bai files into one list
+        * if we only have one file then cancel correlation and PCA
+        */
+        ch_bam_bai.map { row -> [row[1]] }
+        .collect()
+        .map { row -> [row] }
+        .combine( ch_bam_bai.map { row -> [row[2]] }.collect().map { row -> [row] } )
+        .combine( ch_ids )
+        .map { row -> [[id: 'all_target_bams'], row[0], row[1], row[2], row[1].size()] }
+        .filter { row -> row[4] > 1 }
+        .map { row -> [row[0], row[1], row[2], row[3]] }
+        .set { ch_bam_bai_all }
+        //ch_bam_bai_all | view
+
+        /*
+        * MODULE: Summarise bams into bins
+        */
+        DEEPTOOLS_MULTIBAMSUMMARY (
+            ch_bam_bai_all
+        )
+        ch_versions   = ch_versions.mix(DEEPTOOLS_MULTIBAMSUMMARY.out.versions)
+        ch_bam_matrix = DEEPTOOLS_MULTIBAMSUMMARY.out.matrix
+        //DEEPTOOLS_MULTIBAMSUMMARY.out.matrix | view
+
+        /*
+        * MODULE: Plot Fingerprint
+        */
+        DEEPTOOLS_PLOTFINGERPRINT (
+            ch_bam_bai
+        )
+        ch_versions    = ch_versions.mix(DEEPTOOLS_PLOTFINGERPRINT.out.versions)
+        ch_fingerprint = DEEPTOOLS_PLOTFINGERPRINT.out.matrix
+        //DEEPTOOLS_PLOTFINGERPRINT.out.matrix | view
+    }
 
     /*
     * MODULE: Plot correlation matrix
     */
     DEEPTOOLS_PLOTCORRELATION (
-        DEEPTOOLS_MULTIBAMSUMMARY.out.matrix,
+        ch_bam_matrix,
         corr_method,
         "heatmap"
     )
     ch_versions = ch_versions.mix(DEEPTOOLS_PLOTCORRELATION.out.versions)
-    //DEEPTOOLS_MULTIBAMSUMMARY.out.matrix | view
+    //DEEPTOOLS_PLOTCORRELATION.out.matrix | view
 
     /*
     * MODULE: Plot PCA's
     */
     DEEPTOOLS_PLOTPCA (
-        DEEPTOOLS_MULTIBAMSUMMARY.out.matrix
+        ch_bam_matrix
     )
     ch_versions = ch_versions.mix(DEEPTOOLS_PLOTPCA.out.versions)
     //DEEPTOOLS_PLOTPCA.out.matrix | view
 
-    /*
-    * MODULE: Plot Fingerprint
-    */
-    DEEPTOOLS_PLOTFINGERPRINT (
-        ch_bam_bai
-    )
-    ch_versions = ch_versions.mix(DEEPTOOLS_PLOTFINGERPRINT.out.versions)
-    //DEEPTOOLS_PLOTFINGERPRINT.out.matrix | view
-
     emit:
     correlation_matrix = DEEPTOOLS_PLOTCORRELATION.out.matrix
     pca_data           = DEEPTOOLS_PLOTPCA.out.tab
-    fingerprint_matrix = DEEPTOOLS_PLOTFINGERPRINT.out.matrix
+    fingerprint_matrix = ch_fingerprint
 
     versions               = ch_versions                 // channel: [ versions.yml ]
 }
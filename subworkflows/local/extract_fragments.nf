@@ -6,46 +6,79 @@ include { SAMTOOLS_SORT      } from "../../modules/nf-core/samtools/sort/main.nf
 include { BEDTOOLS_BAMTOBED  } from "../../modules/nf-core/bedtools/bamtobed/main.nf"
 include { AWK                } from '../../modules/local/linux/awk'
 include { CUT                } from '../../modules/local/linux/cut'
+include { BAM_TO_FRAGMENTS   } from '../../modules/local/python/bam_to_fragments'
+include { FRAGMENT_STORE     } from '../../modules/local/python/fragment_store'
 
 workflow EXTRACT_FRAGMENTS {
     take:
-    bam // channel: [ val(meta), [ bam ] ]
+    bam         // channel: [ val(meta), [ bam ] ]
+    native_mode // bool
+    store_mode  // bool
+
     main:
     ch_versions = Channel.empty()
+    ch_bed      = Channel.empty()
+    ch_store    = Channel.empty()
+
+    if (native_mode) {
+        /*
+        * MODULE: Pair mates from the coordinate-sorted BAM and write the filtered fragments in one pass
+        */
+        BAM_TO_FRAGMENTS (
+            bam
+        )
+        ch_bed      = BAM_TO_FRAGMENTS.out.bed
+        ch_store    = BAM_TO_FRAGMENTS.out.store
+        ch_versions = ch_versions.mix(BAM_TO_FRAGMENTS.out.versions)
+    }
+    else {
+        /*
+        * MODULE: Sort reads by name for bamtobed
+        */
+        SAMTOOLS_SORT (
+            bam
+        )
+        ch_versions = ch_versions.mix(SAMTOOLS_SORT.out.versions)
+
+        /*
+        * MODULE: Convert BAM file to paired-end bed format
+        */
+        BEDTOOLS_BAMTOBED(
+            SAMTOOLS_SORT.out.bam
+        )
+        ch_versions = ch_versions.mix(BEDTOOLS_BAMTOBED.out.versions)
+        // BEDTOOLS_BAMTOBED.out.bed | view
+
+        /*
+        * MODULE: Keep the read pairs that are on the same chromosome and fragment length less than 1000bp.
+        */
+        AWK (
+            BEDTOOLS_BAMTOBED.out.bed
+        )
+        ch_versions = ch_versions.mix(AWK.out.versions)
+
+        /*
+        * MODULE: Only extract the fragment related columns
+        */
+        CUT (
+            AWK.out.file
+        )
+        ch_bed = CUT.out.file
 
-    /*
-    * MODULE: Sort reads by name for bamtobed
-    */
-    SAMTOOLS_SORT (
-        bam
-    )
-    ch_versions = ch_versions.mix(SAMTOOLS_SORT.out.versions)
-
-    /*
-    * MODULE: Convert BAM file to paired-end bed format
-    */
-    BEDTOOLS_BAMTOBED(
-        SAMTOOLS_SORT.out.bam
-    )
-    ch_versions = ch_versions.mix(BEDTOOLS_BAMTOBED.out.versions)
-    // BEDTOOLS_BAMTOBED.out.bed | view
-
-    /*
-    * MODULE: Keep the read pairs that are on the same chromosome and fragment length less than 1000bp.
-    */
-    AWK (
-        BEDTOOLS_BAMTOBED.out.bed
-    )
-    ch_versions = ch_versions.mix(AWK.out.versions)
-
-    /*
-    * MODULE: Only extract the fragment related columns
-    */
-    CUT (
-        AWK.out.file
-    )
+        /*
+        * MODULE: Write the fragments to a columnar fragment store
+        */
+        if (store_mode) {
+            FRAGMENT_STORE (
+                ch_bed
+            )
+            ch_store    = FRAGMENT_STORE.out.store
+            ch_versions = ch_versions.mix(FRAGMENT_STORE.out.versions)
+        }
+    }
 
     emit:
-    bed      = CUT.out.file // channel: [ val(meta), [ bed ] ]
-    versions = ch_versions  // channel: [ versions.yml ]
+    bed      = ch_bed      // channel: [ val(meta), [ bed ] ]
+    store    = ch_store    // channel: [ val(meta), [ frag ] ]
+    versions = ch_versions // channel: [ versions.yml ]
 }
@@ -9,7 +9,16 @@ workflow INPUT_CHECK {
     samplesheet // file: /path/to/samplesheet.csv
 
     main:
-    SAMPLESHEET_CHECK ( samplesheet )
+    /*
+    * Stage the FastQ files for validation so remote and bind-mounted paths are readable by the check
+    */
+    def fastq_paths = params.validate_fastq != 'none' ? get_fastq_paths(samplesheet) : []
+
+    SAMPLESHEET_CHECK (
+        samplesheet,
+        fastq_paths,
+        fastq_paths.collect { file(it) }
+    )
 
     SAMPLESHEET_CHECK.out.csv
         .splitCsv ( header:true, sep:"," )
@@ -31,6 +40,12 @@ def get_samplesheet_paths(LinkedHashMap row) {
     meta.is_control    = row.is_control.toBoolean()
     meta.control_group = meta.is_control ? meta.group : row.control
 
+    // Workload sizing from FastQ validation, used to size downstream resources
+    if (row.read_estimate) {
+        meta.fastq_bytes   = row.fastq_bytes.toLong()
+        meta.read_estimate = row.read_estimate.toLong()
+    }
+
     def array = []
     if (!file(row.fastq_1).exists()) {
         exit 1, "ERROR: Please check input samplesheet -> Read 1 FastQ file does not exist!\n${row.fastq_1}"
@@ -45,3 +60,14 @@ def get_samplesheet_paths(LinkedHashMap row) {
     }
     return array
 }
+
+// Function to get the unique, existing FastQ paths listed in the samplesheet
+def get_fastq_paths(samplesheet) {
+    return samplesheet
+        .splitCsv ( header:true, sep:"," )
+        .collect { row -> [ row.fastq_1, row.fastq_2 ] }
+        .flatten()
+        .findAll { it && it.trim() && file(it.trim()).exists() }
+        .collect { it.trim() }
+        .unique()
+}
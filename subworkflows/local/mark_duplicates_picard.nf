@@ -2,8 +2,10 @@
  * Picard MarkDuplicates, sort, index BAM file and run samtools stats, flagstat and idxstats
  */
 
-include { PICARD_MARKDUPLICATES   } from '../../modules/nf-core/picard/markduplicates/main'
-include { BAM_SORT_STATS_SAMTOOLS } from '../nf-core/bam_sort_stats_samtools/main'
+include { PICARD_MARKDUPLICATES                     } from '../../modules/nf-core/picard/markduplicates/main'
+include { MARK_DUPLICATES_NATIVE                    } from '../../modules/local/python/mark_duplicates'
+include { BAM_SORT_STATS as BAM_SORT_STATS_SAMTOOLS } from './bam_sort_stats'
+include { BAM_STATS as BAM_STATS_SAMTOOLS           } from './bam_stats'
 
 workflow MARK_DUPLICATES_PICARD {
     take:
@@ -12,6 +14,8 @@ workflow MARK_DUPLICATES_PICARD {
     process_target // boolean
     fasta          // channel: [ val(meta), fasta ]
     fai            // channel: [ val(meta), fai ]
+    native_mode    // boolean: mark duplicates in one streaming pass that keeps the bam sorted
+    stats_native   // boolean: write the stats reports from one scan of each bam
 
     main:
     // Init
@@ -21,30 +25,11 @@ workflow MARK_DUPLICATES_PICARD {
     ch_stats    = Channel.empty()
     ch_flagstat = Channel.empty()
     ch_idxstats = Channel.empty()
+    ch_frag_len = Channel.empty()
     ch_versions = Channel.empty()
 
     if( process_target ) {
-        PICARD_MARKDUPLICATES (
-            bam,
-            fasta,
-            fai
-        )
-        ch_metrics  = PICARD_MARKDUPLICATES.out.metrics
-        ch_versions = ch_versions.mix( PICARD_MARKDUPLICATES.out.versions )
-
-        /*
-        * WORKFLOW: Re sort and index all the bam files + calculate stats
-        */
-        BAM_SORT_STATS_SAMTOOLS (
-            PICARD_MARKDUPLICATES.out.bam,
-            fasta
-        )
-        ch_bam      = BAM_SORT_STATS_SAMTOOLS.out.bam
-        ch_bai      = BAM_SORT_STATS_SAMTOOLS.out.bai
-        ch_stats    = BAM_SORT_STATS_SAMTOOLS.out.stats
-        ch_flagstat = BAM_SORT_STATS_SAMTOOLS.out.flagstat
-        ch_idxstats = BAM_SORT_STATS_SAMTOOLS.out.idxstats
-        ch_versions = ch_versions.mix( BAM_SORT_STATS_SAMTOOLS.out.versions )
+        ch_markdup_bam = bam
     }
     else { // Split out control files and run only on these
         bam.branch { it ->
@@ -61,8 +46,38 @@ workflow MARK_DUPLICATES_PICARD {
         }
         .set { ch_split_bai }
 
+        ch_markdup_bam = ch_split_bam.control
+    }
+
+    if( native_mode ) {
+        /*
+        * MODULE: Mark or remove duplicates, the output stays coordinate-sorted
+        */
+        MARK_DUPLICATES_NATIVE (
+            ch_markdup_bam
+        )
+        ch_metrics  = MARK_DUPLICATES_NATIVE.out.metrics
+        ch_versions = ch_versions.mix( MARK_DUPLICATES_NATIVE.out.versions )
+
+        /*
+        * WORKFLOW: Calculate stats on the indexed bam files
+        */
+        BAM_STATS_SAMTOOLS (
+            MARK_DUPLICATES_NATIVE.out.bam.join( MARK_DUPLICATES_NATIVE.out.bai, by: [0] ),
+            fasta,
+            stats_native
+        )
+        ch_bam      = MARK_DUPLICATES_NATIVE.out.bam
+        ch_bai      = MARK_DUPLICATES_NATIVE.out.bai
+        ch_stats    = BAM_STATS_SAMTOOLS.out.stats
+        ch_flagstat = BAM_STATS_SAMTOOLS.out.flagstat
+        ch_idxstats = BAM_STATS_SAMTOOLS.out.idxstats
+        ch_frag_len = BAM_STATS_SAMTOOLS.out.frag_len
+        ch_versions = ch_versions.mix( BAM_STATS_SAMTOOLS.out.versions )
+    }
+    else {
         PICARD_MARKDUPLICATES (
-            ch_split_bam.control,
+            ch_markdup_bam,
             fasta,
             fai
         )
@@ -74,22 +89,30 @@ workflow MARK_DUPLICATES_PICARD {
         */
         BAM_SORT_STATS_SAMTOOLS (
             PICARD_MARKDUPLICATES.out.bam,
-            fasta
+            fasta,
+            stats_native
         )
-        ch_bam      = BAM_SORT_STATS_SAMTOOLS.out.bam.mix(ch_split_bam.target)
-        ch_bai      = BAM_SORT_STATS_SAMTOOLS.out.bai.mix(ch_split_bai.target)
+        ch_bam      = BAM_SORT_STATS_SAMTOOLS.out.bam
+        ch_bai      = BAM_SORT_STATS_SAMTOOLS.out.bai
         ch_stats    = BAM_SORT_STATS_SAMTOOLS.out.stats
         ch_flagstat = BAM_SORT_STATS_SAMTOOLS.out.flagstat
         ch_idxstats = BAM_SORT_STATS_SAMTOOLS.out.idxstats
+        ch_frag_len = BAM_SORT_STATS_SAMTOOLS.out.frag_len
         ch_versions = ch_versions.mix( BAM_SORT_STATS_SAMTOOLS.out.versions )
     }
 
+    if( !process_target ) {
+        ch_bam = ch_bam.mix(ch_split_bam.target)
+        ch_bai = ch_bai.mix(ch_split_bai.target)
+    }
+
     emit:
     bam      = ch_bam      // channel: [ val(meta), [ bam ] ]
     bai      = ch_bai      // channel: [ val(meta), [ bai ] ]
     stats    = ch_stats    // channel: [ val(meta), [ stats ] ]
     flagstat = ch_flagstat // channel: [ val(meta), [ flagstat ] ]
     idxstats = ch_idxstats // channel: [ val(meta), [ idxstats ] ]
+    frag_len = ch_frag_len // channel: [ val(meta), [ frags.len.txt ] ]
     metrics  = ch_metrics  // channel: [ val(meta), [ metrics ] ]
     versions = ch_versions // channel: [ versions.yml ]
 }
@@ -3,12 +3,14 @@
 */
 
 include { PEAK_FRIP                            } from "../../modules/local/peak_frip"
+include { CALCULATE_FRIP                       } from "../../modules/local/python/calculate_frip"
 include { PEAK_COUNTS as PRIMARY_PEAK_COUNTS   } from "../../modules/local/peak_counts"
 include { PEAK_COUNTS as CONSENSUS_PEAK_COUNTS } from "../../modules/local/peak_counts"
 include { CUT as CUT_CALC_REPROD               } from "../../modules/local/linux/cut"
 include { BEDTOOLS_INTERSECT                   } from "../../modules/nf-core/bedtools/intersect/main.nf"
 include { CALCULATE_PEAK_REPROD                } from "../../modules/local/python/peak_reprod"
 include { PLOT_CONSENSUS_PEAKS                 } from '../../modules/local/python/plot_consensus_peaks'
+include { PEAK_IDR                             } from '../../modules/local/python/peak_idr'
 
 workflow PEAK_QC {
     take:
@@ -23,9 +25,16 @@ workflow PEAK_QC {
     peak_count_header_multiqc           // file
     peak_count_consensus_header_multiqc // file
     peak_reprod_header_multiqc          // file
+    frip_sets_header_multiqc            // file
+    native_mode                         // bool
+    run_idr                             // bool
+    idr_score_column                    // val
 
     main:
     ch_versions = Channel.empty()
+    ch_frip_mqc = Channel.empty()
+    ch_idr_tsv  = Channel.empty()
+    ch_idr_bed  = Channel.empty()
 
     /*
     * CHANNEL: Combine channel together for frip calculation
@@ -37,16 +46,57 @@ workflow PEAK_QC {
     .map { row -> [ row[1], row[2], row[4], row[6] ]}
     .set { ch_frip }
 
-    /*
-    * MODULE: Calculate frip scores for primary peaks
-    */
-    PEAK_FRIP(
-        ch_frip,
-        frip_score_header_multiqc,
-        min_frip_overlap
-    )
-    ch_versions = ch_versions.mix(PEAK_FRIP.out.versions)
-    // PEAK_FRIP.out.frip_mqc | view
+    if (native_mode) {
+        /*
+        * CHANNEL: Collect the fragments and flagstat of all samples
+        */
+        ch_frip
+        .toSortedList { a, b -> a[0].id <=> b[0].id }
+        .map { list -> [ list.collect { it[0].id }, list.collect { it[2] }, list.collect { it[3] } ] }
+        .set { ch_frip_samples }
+        //EXAMPLE CHANNEL STRUCT: [[ID...n], [FRAGMENTS...n], [FLAGSTAT...n]]
+
+        /*
+        * CHANNEL: Collect the primary peaks of each sample and the shared consensus and merged peak sets
+        */
+        Channel.empty()
+        .mix ( peaks.map { row -> [ [ 'primary', row[0].id ], row[1] ] } )
+        .mix ( consensus_peaks.map { row -> [ [ "consensus_${row[0].id}".toString(), '' ], row[1] ] } )
+        .mix ( consensus_peaks_unfiltered.map { row -> [ [ "merged_${row[0].id}".toString(), '' ], row[1] ] } )
+        .toSortedList { a, b -> a[0][0] <=> b[0][0] ?: a[0][1] <=> b[0][1] }
+        .map { list -> [ list.collect { it[0] }, list.collect { it[1] } ] }
+        .set { ch_frip_peak_sets }
+        //EXAMPLE CHANNEL STRUCT: [[[SET, OWNER]...n], [BED...n]]
+
+        /*
+        * MODULE: Calculate frip scores of all samples against all peak sets
+        */
+        CALCULATE_FRIP(
+            ch_frip_samples,
+            ch_frip_peak_sets,
+            frip_score_header_multiqc,
+            frip_sets_header_multiqc,
+            min_frip_overlap
+        )
+        ch_versions = ch_versions.mix(CALCULATE_FRIP.out.versions)
+        ch_frip_mqc = CALCULATE_FRIP.out.frip_mqc
+            .flatten()
+            .map { [ [id: it.name - '_mqc.tsv'], it ] }
+            .mix ( CALCULATE_FRIP.out.sets_mqc.map { [ [id: 'peak_sets'], it ] } )
+    }
+    else {
+        /*
+        * MODULE: Calculate frip scores for primary peaks
+        */
+        PEAK_FRIP(
+            ch_frip,
+            frip_score_header_multiqc,
+            min_frip_overlap
+        )
+        ch_versions = ch_versions.mix(PEAK_FRIP.out.versions)
+        ch_frip_mqc = PEAK_FRIP.out.frip_mqc
+        // PEAK_FRIP.out.frip_mqc | view
+    }
 
     /*
     * MODULE: Calculate peak counts for primary peaks
@@ -128,6 +178,38 @@ workflow PEAK_QC {
     //EXAMPLE CHANNEL STRUCT: [[META], TSV]
     //CALCULATE_PEAK_REPROD.out.tsv
 
+    if (run_idr) {
+        /*
+        * CHANNEL: Pair the primary peaks of every two replicates of a group
+        */
+        peaks
+        .map { row -> [ row[0].group, row[0], row[1] ] }
+        .groupTuple(by: [0])
+        .flatMap { row ->
+            def reps  = [row[1], row[2]].transpose().sort { it[0].replicate }
+            def pairs = []
+            reps.eachWithIndex { a, i ->
+                reps.drop(i + 1).each { b ->
+                    pairs.add([ [id: "${row[0]}_R${a[0].replicate}_vs_R${b[0].replicate}".toString(), group: row[0]], a[1], b[1] ])
+                }
+            }
+            pairs
+        }
+        .set { ch_idr_pairs }
+        //EXAMPLE CHANNEL STRUCT: [[META], BED (rep a), BED (rep b)]
+
+        /*
+        * MODULE: Score the rank consistency of the peaks of each replicate pair
+        */
+        PEAK_IDR (
+            ch_idr_pairs,
+            idr_score_column
+        )
+        ch_versions = ch_versions.mix(PEAK_IDR.out.versions)
+        ch_idr_tsv  = PEAK_IDR.out.tsv
+        ch_idr_bed  = PEAK_IDR.out.bed
+    }
+
     /*
     * CHANNEL: Prep for upset input
     */
@@ -149,10 +231,12 @@ workflow PEAK_QC {
     ch_versions = ch_versions.mix(PLOT_CONSENSUS_PEAKS.out.versions)
 
     emit:
-    primary_frip_mqc    = PEAK_FRIP.out.frip_mqc              // channel: [ val(meta), [ mqc ] ]
+    primary_frip_mqc    = ch_frip_mqc                         // channel: [ val(meta), [ mqc ] ]
     primary_count_mqc   = PRIMARY_PEAK_COUNTS.out.count_mqc   // channel: [ val(meta), [ mqc ] ]
     consensus_count_mqc = CONSENSUS_PEAK_COUNTS.out.count_mqc // channel: [ val(meta), [ mqc ] ]
     reprod_perc_mqc     = CALCULATE_PEAK_REPROD.out.mqc       // channel: [ val(meta), [ mqc ] ]
+    idr_tsv             = ch_idr_tsv                          // channel: [ val(meta), [ tsv ] ]
+    idr_bed             = ch_idr_bed                          // channel: [ val(meta), [ bed ] ]
 
     versions = ch_versions // channel: [ versions.yml ]
 }
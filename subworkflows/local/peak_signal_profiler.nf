@@ -6,14 +6,15 @@ include { PEAKSIGNALPROFILER_RUN } from '../../modules/local/peak_signal_profile
 
 workflow PEAK_SIGNAL_PROFILER {
     take:
-        samplesheet
-        annotation
-        genome
+        samplesheet // file: pipeline samplesheet
+        annotation  // file: annotation or peak regions bed
+        genome      // file: genome fasta index
+        bigwigs     // channel: [ bigwig... ]
 
     main:
-        PEAKSIGNALPROFILER_RUN( samplesheet, annotation, genome )
+        PEAKSIGNALPROFILER_RUN( samplesheet, annotation, genome, bigwigs )
 
     emit:
-        PEAKSIGNALPROFILER_RUN.out.psp_out
-        PEAKSIGNALPROFILER_RUN.out.versions
+        psp_out  = PEAKSIGNALPROFILER_RUN.out.psp_out  // channel: [ psp_out ]
+        versions = PEAKSIGNALPROFILER_RUN.out.versions // channel: [ versions.yml ]
 }
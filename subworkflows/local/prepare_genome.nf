@@ -12,6 +12,8 @@ include { UNTAR as UNTAR_INDEX_TARGET                          } from '../../mod
 include { UNTAR as UNTAR_INDEX_SPIKEIN                         } from '../../modules/nf-core/untar/main.nf'
 include { BOWTIE2_BUILD as BOWTIE2_BUILD_TARGET                } from '../../modules/nf-core/bowtie2/build/main'
 include { BOWTIE2_BUILD as BOWTIE2_BUILD_SPIKEIN               } from '../../modules/nf-core/bowtie2/build/main'
+include { BOWTIE2_BUILD as BOWTIE2_BUILD_COMBINED              } from '../../modules/nf-core/bowtie2/build/main'
+include { COMBINE_GENOMES                                      } from '../../modules/local/python/combine_genomes'
 include { TABIX_BGZIPTABIX                                     } from '../../modules/nf-core/tabix/bgziptabix/main'
 include { GTF2BED                                              } from '../../modules/local/gtf2bed'
 include { SAMTOOLS_FAIDX                                       } from '../../modules/nf-core/samtools/faidx/main'
@@ -133,9 +135,10 @@ workflow PREPARE_GENOME {
     /*
     * Uncompress Bowtie2 index or generate from scratch if required for both genomes
     */
-    ch_bt2_index         = Channel.empty()
-    ch_bt2_spikein_index = Channel.empty()
-    ch_bt2_versions      = Channel.empty()
+    ch_bt2_index          = Channel.empty()
+    ch_bt2_spikein_index  = Channel.empty()
+    ch_bt2_combined_index = Channel.empty()
+    ch_bt2_versions       = Channel.empty()
     if ("bowtie2" in prepare_tool_indices) {
         if (params.bowtie2) {
             if (params.bowtie2.endsWith(".tar.gz")) {
@@ -160,6 +163,19 @@ workflow PREPARE_GENOME {
             ch_bt2_spikein_index = BOWTIE2_BUILD_SPIKEIN ( ch_spikein_fasta ).index.map{ row -> [ [id:"spikein_index"], row[1] ] }
             ch_versions          = ch_versions.mix(BOWTIE2_BUILD_SPIKEIN.out.versions)
         }
+
+        /*
+        * Build one index of the target and the prefixed spike-in contigs for a single alignment pass
+        */
+        if (params.normalisation_mode == "Spikein" && params.spikein_alignment == "combined") {
+            COMBINE_GENOMES (
+                ch_fasta.map { row -> [ [id:"combined_genome"], row[1] ] },
+                ch_spikein_fasta
+            )
+            ch_versions           = ch_versions.mix(COMBINE_GENOMES.out.versions)
+            ch_bt2_combined_index = BOWTIE2_BUILD_COMBINED ( COMBINE_GENOMES.out.fasta ).index.map{ row -> [ [id:"combined_index"], row[1] ] }
+            ch_versions           = ch_versions.mix(BOWTIE2_BUILD_COMBINED.out.versions)
+        }
     }
 
     /*
@@ -218,6 +234,7 @@ workflow PREPARE_GENOME {
     allowed_regions        = ch_genome_include_regions   // path: genome.regions
     bowtie2_index          = ch_bt2_index                // path: bt2/index/
     bowtie2_spikein_index  = ch_bt2_spikein_index        // path: bt2/index/
+    bowtie2_combined_index = ch_bt2_combined_index       // path: bt2/index/
 
     versions               = ch_versions                 // channel: [ versions.yml ]
 }
@@ -14,6 +14,7 @@ include { DEEPTOOLS_BAMCOVERAGE } from "../../modules/local/for_patch/deeptools/
 include { BEDTOOLS_SORT         } from "../../modules/local/for_patch/bedtools/sort/main"
 include { UCSC_BEDCLIP          } from "../../modules/nf-core/ucsc/bedclip/main"
 include { UCSC_BEDGRAPHTOBIGWIG } from "../../modules/nf-core/ucsc/bedgraphtobigwig/main"
+include { BAM_TO_COVERAGE       } from "../../modules/local/python/bam_to_coverage"
 
 workflow PREPARE_PEAKCALLING {
         // Set visualization_mode default ONCE, outside conditional logic
@@ -28,10 +29,16 @@ workflow PREPARE_PEAKCALLING {
     target_metadata  // channel  [ csv ] - target genome metadata
     mean_target_reads // value: mean target aligned reads (for dual normalization)
     visualization_mode // value: boolean - whether this is for visualization only (no scale factors)
+    native_mode      // value: boolean - build bedgraph and bigwig with the native coverage engine
 
     main:
     ch_versions = Channel.empty()
     ch_bedgraph = Channel.empty()
+    ch_bigwig   = Channel.empty()
+    ch_scale    = Channel.empty()
+
+    // The native engine replaces the genomecov, sort, clip and bigwig chain of the scale factor modes
+    def use_native_coverage = native_mode && (norm_mode == "Spikein" || norm_mode == "None")
 
     if (norm_mode == "Spikein") {
         /*
@@ -118,7 +125,34 @@ workflow PREPARE_PEAKCALLING {
         ch_bam_scale_factor.view { row -> "SCALE_FACTOR: " + row[0].id }
     }
 
-    if (norm_mode == "Spikein" || norm_mode == "None") {
+    if ((norm_mode == "Spikein" || norm_mode == "None") && !visualization_mode) {
+        ch_scale = ch_bam_scale_factor.map { row -> [ row[0], row[2] ] }
+    }
+
+    if (use_native_coverage) {
+        /*
+        * CHANNEL: Combine bam, bai and scale factor on id
+        * For visualization (downsampled), do NOT apply scale factor
+        */
+        (visualization_mode ? ch_bam.map { row -> [ row[0], row[1], 1 ] } : ch_bam_scale_factor)
+            .map { row -> [ row[0].id, row ] }
+            .join ( ch_bai.map { row -> [ row[0].id, row[1] ] } )
+            .map { id, row, bai -> [ row[0], row[1], bai, row[2] ] }
+            .set { ch_bam_bai_coverage }
+        // EXAMPLE CHANNEL STRUCT: [[META], BAM, BAI, SCALE_FACTOR]
+
+        /*
+        * MODULE: Build scaled coverage clipped to the chromosome sizes and write bedgraph and bigwig
+        */
+        BAM_TO_COVERAGE (
+            ch_bam_bai_coverage,
+            ch_chrom_sizes
+        )
+        ch_versions = ch_versions.mix(BAM_TO_COVERAGE.out.versions)
+        ch_bedgraph = BAM_TO_COVERAGE.out.bedgraph
+        ch_bigwig   = BAM_TO_COVERAGE.out.bigwig
+    }
+    else if (norm_mode == "Spikein" || norm_mode == "None") {
         /*
         * MODULE: Convert bam files to bedgraph
         * For visualization (downsampled), do NOT apply scale factor
@@ -143,23 +177,6 @@ workflow PREPARE_PEAKCALLING {
             ch_bedgraph = BEDTOOLS_GENOMECOV.out.genomecov
             //EXAMPLE CHANNEL STRUCT: [META], BEDGRAPH]
             //BEDTOOLS_GENOMECOV.out.genomecov | view
-            /*
-            * CHANNEL: Dump scale factor values
-            */
-            if(params.dump_scale_factors) {
-                ch_scale_factor = ch_bam_scale_factor
-                .map { [it[0].id, it[0].group, it[2]] }
-                .toSortedList( { a, b -> a[0] <=> b[0] } )
-                .map { list ->
-                    new File('scale-factors.csv').withWriter('UTF-8') { writer ->
-                        list.each { item ->
-                            ch_bedgraph.view { row -> "BEDGRAPH: " + row[0].id }
-                            str = item[0] + "," + item[1] + "," + item[2]
-                            writer.write(str + "\n")
-                        }
-                    }
-                }
-            }
         }
     } else {
         /*
@@ -224,13 +241,16 @@ workflow PREPARE_PEAKCALLING {
         ch_bedgraph = DEEPTOOLS_BAMCOVERAGE.out.bedgraph
         // EXAMPLE CHANNEL STRUCT: [[META], BAM, BAI]
         ch_bedgraph.view { row -> "BEDGRAPH: " + row[0].id }
+        ch_scale = ch_bam_bai_scale_factor.map { row -> [ row[0], row[3] ] }
+    }
+    // EXAMPLE CHANNEL STRUCT: [[META], SCALE_FACTOR]
 
-        /*
-        * CHANNEL: Dump scale factor values
-        */
-        if(params.dump_scale_factors) {
-            ch_scale_factor = ch_bam_bai_scale_factor
-            .map { [it[0].id, it[0].group, it[3]] }
+    /*
+    * CHANNEL: Dump scale factor values
+    */
+    if(params.dump_scale_factors) {
+        ch_scale
+            .map { [it[0].id, it[0].group, it[1]] }
             .toSortedList( { a, b -> a[0] <=> b[0] } )
             .map { list ->
                 new File('scale-factors.csv').withWriter('UTF-8') { writer ->
@@ -240,43 +260,46 @@ workflow PREPARE_PEAKCALLING {
                     }
                 }
             }
-        }
     }
 
-    /*
-    * MODULE: Sort bedgraph
-    */
-    BEDTOOLS_SORT (
-        ch_bedgraph,
-        "bedGraph",
-        []
-    )
-    ch_versions = ch_versions.mix(BEDTOOLS_SORT.out.versions)
+    if (!use_native_coverage) {
+        /*
+        * MODULE: Sort bedgraph
+        */
+        BEDTOOLS_SORT (
+            ch_bedgraph,
+            "bedGraph",
+            []
+        )
+        ch_versions = ch_versions.mix(BEDTOOLS_SORT.out.versions)
 
-    /*
-    * MODULE: Clip off bedgraphs so none overlap beyond chromosome edge
-    */
-    UCSC_BEDCLIP (
-        BEDTOOLS_SORT.out.sorted,
-        ch_chrom_sizes
-    )
-    ch_versions = ch_versions.mix(UCSC_BEDCLIP.out.versions)
-    //EXAMPLE CHANNEL STRUCT: [META], BEDGRAPH]
-    //UCSC_BEDCLIP.out.bedgraph | view
+        /*
+        * MODULE: Clip off bedgraphs so none overlap beyond chromosome edge
+        */
+        UCSC_BEDCLIP (
+            BEDTOOLS_SORT.out.sorted,
+            ch_chrom_sizes
+        )
+        ch_versions = ch_versions.mix(UCSC_BEDCLIP.out.versions)
+        ch_bedgraph = UCSC_BEDCLIP.out.bedgraph
+        //EXAMPLE CHANNEL STRUCT: [META], BEDGRAPH]
+        //UCSC_BEDCLIP.out.bedgraph | view
 
-    /*
-    * MODULE: Convert bedgraph to bigwig
-    */
-    UCSC_BEDGRAPHTOBIGWIG (
-        UCSC_BEDCLIP.out.bedgraph,
-        ch_chrom_sizes
-    )
-    ch_versions = ch_versions.mix(UCSC_BEDGRAPHTOBIGWIG.out.versions)
-    //EXAMPLE CHANNEL STRUCT: [[META], BIGWIG]
-    //UCSC_BEDGRAPHTOBIGWIG.out.bigwig | view
+        /*
+        * MODULE: Convert bedgraph to bigwig
+        */
+        UCSC_BEDGRAPHTOBIGWIG (
+            UCSC_BEDCLIP.out.bedgraph,
+            ch_chrom_sizes
+        )
+        ch_versions = ch_versions.mix(UCSC_BEDGRAPHTOBIGWIG.out.versions)
+        ch_bigwig   = UCSC_BEDGRAPHTOBIGWIG.out.bigwig
+        //EXAMPLE CHANNEL STRUCT: [[META], BIGWIG]
+        //UCSC_BEDGRAPHTOBIGWIG.out.bigwig | view
+    }
 
     emit:
-    bedgraph = UCSC_BEDCLIP.out.bedgraph        // channel: [ val(meta), [ bedgraph ] ]
-    bigwig   = UCSC_BEDGRAPHTOBIGWIG.out.bigwig // channel: [ val(meta), [ bigwig ] ]
-    versions = ch_versions                      // channel: [ versions.yml ]
+    bedgraph = ch_bedgraph // channel: [ val(meta), [ bedgraph ] ]
+    bigwig   = ch_bigwig   // channel: [ val(meta), [ bigwig ] ]
+    versions = ch_versions // channel: [ versions.yml ]
 }
@@ -2,16 +2,17 @@
  * Run bam files through samtools view and reindex and calc stats
  */
 
-include { SAMTOOLS_VIEW      } from '../../modules/local/for_patch/samtools/view/main'
-include { SAMTOOLS_SORT      } from '../../modules/nf-core/samtools/sort/main'
-include { SAMTOOLS_INDEX     } from '../../modules/nf-core/samtools/index/main'
-include { BAM_STATS_SAMTOOLS } from '../nf-core/bam_stats_samtools/main'
+include { SAMTOOLS_VIEW                   } from '../../modules/local/for_patch/samtools/view/main'
+include { SAMTOOLS_SORT                   } from '../../modules/nf-core/samtools/sort/main'
+include { SAMTOOLS_INDEX                  } from '../../modules/nf-core/samtools/index/main'
+include { BAM_STATS as BAM_STATS_SAMTOOLS } from './bam_stats'
 
 workflow SAMTOOLS_VIEW_SORT_STATS {
     take:
-    bam     // channel: [ val(meta), [ bam ] ]
-    regions // channel: [ regions ]
-    fasta   // channel: [ val(meta), fasta ]
+    bam          // channel: [ val(meta), [ bam ] ]
+    regions      // channel: [ regions ]
+    fasta        // channel: [ val(meta), fasta ]
+    stats_native // boolean: write the stats reports from one scan of each bam
 
     main:
     ch_versions = Channel.empty()
@@ -38,7 +39,7 @@ workflow SAMTOOLS_VIEW_SORT_STATS {
     ch_bai_sample_id = SAMTOOLS_INDEX.out.bai.map { row -> [row[0].id, row] }
     ch_bam_bai = ch_bam_sample_id.join(ch_bai_sample_id, by: [0]).map {row -> [row[1][0], row[1][1], row[2][1]]}
 
-    BAM_STATS_SAMTOOLS ( ch_bam_bai, fasta )
+    BAM_STATS_SAMTOOLS ( ch_bam_bai, fasta, stats_native )
     ch_versions = ch_versions.mix(BAM_STATS_SAMTOOLS.out.versions.first())
 
     emit:
@@ -47,5 +48,6 @@ workflow SAMTOOLS_VIEW_SORT_STATS {
     stats    = BAM_STATS_SAMTOOLS.out.stats     // channel: [ val(meta), [ stats ] ]
     flagstat = BAM_STATS_SAMTOOLS.out.flagstat  // channel: [ val(meta), [ flagstat ] ]
     idxstats = BAM_STATS_SAMTOOLS.out.idxstats  // channel: [ val(meta), [ idxstats ] ]
+    frag_len = BAM_STATS_SAMTOOLS.out.frag_len  // channel: [ val(meta), [ frags.len.txt ] ]
     versions = ch_versions                      // channel: [ versions.yml ]
 }
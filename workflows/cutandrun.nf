@@ -62,6 +62,11 @@ if (anno_readme && file(anno_readme).exists()) {
     file(anno_readme).copyTo("${params.outdir}/genome/")
 }
 
+// Mark the output directory of a quick look as a preview
+if (params.quick_look) {
+    WorkflowCutandrun.quickLookMarker(workflow, params)
+}
+
 // Stage dummy file to be used as an optional input where required
 ch_dummy_file = file("$projectDir/assets/dummy_file.txt", checkIfExists: true)
 
@@ -85,6 +90,7 @@ ch_frip_score_header_multiqc            = file("$projectDir/assets/multiqc/frip_
 ch_peak_counts_header_multiqc           = file("$projectDir/assets/multiqc/peak_counts_header.txt", checkIfExists: true)
 ch_peak_counts_consensus_header_multiqc = file("$projectDir/assets/multiqc/peak_counts_consensus_header.txt", checkIfExists: true)
 ch_peak_reprod_header_multiqc           = file("$projectDir/assets/multiqc/peak_reprod_header.txt", checkIfExists: true)
+ch_frip_peak_sets_header_multiqc        = file("$projectDir/assets/multiqc/frip_peak_sets_header.txt", checkIfExists: true)
 ch_linear_duplication_header_multiqc    = file("$projectDir/assets/multiqc/linear_duplication_header.txt", checkIfExists: true)
 
 
@@ -104,6 +110,12 @@ if ((caller_list + callers).unique().size() != caller_list.size()) {
     exit 1, "Invalid variant calller option: ${params.peakcaller}. Valid options: ${caller_list.join(', ')}"
 }
 
+// Check native tool params
+def native_tool_list = ['metrics', 'fragments', 'coverage', 'frip', 'seacr', 'downsample', 'consensus', 'matrix', 'bincounts', 'bigwigcompare', 'dedup', 'stats']
+if ((native_tool_list + params.native).unique().size() != native_tool_list.size()) {
+    exit 1, "Invalid native tool option: ${params.native_tools}. Valid options: ${native_tool_list.join(', ')}"
+}
+
 /*
 ========================================================================================
     IMPORT LOCAL MODULES/SUBWORKFLOWS
@@ -127,7 +139,21 @@ include { DOWNSAMPLE_BAM             } from "../modules/local/samtools_downsampl
 include { HOMER_FINDMOTIFSGENOME as HOMER_FINDMOTIFSGENOME_MERGED     } from "../modules/local/homer/findmotifsgenome/main"
 include { HOMER_FINDMOTIFSGENOME as HOMER_FINDMOTIFSGENOME_CONSENSUS  } from "../modules/local/homer/findmotifsgenome/main"
 include { SUMMARIZE_HOMER_MOTIFS     } from "../modules/local/python/summarize_homer_motifs"
+include { HOMER_PREPARSE             } from "../modules/local/homer/preparse/main"
 include { CREATE_MOTIF_COMPARISON_TABLES } from "../modules/local/python/create_motif_comparison_tables"
+include { HOMER_KNOWN_MOTIFS         } from "../modules/local/homer/known_motifs/main"
+include { KNOWN_MOTIF_SCAN as KNOWN_MOTIF_SCAN_MERGED    } from "../modules/local/python/known_motif_scan"
+include { KNOWN_MOTIF_SCAN as KNOWN_MOTIF_SCAN_CONSENSUS } from "../modules/local/python/known_motif_scan"
+include { COLLECT_METRICS            } from "../modules/local/python/collect_metrics"
+include { CONSENSUS_COUNT_MATRIX     } from "../modules/local/python/consensus_count_matrix"
+include { SEACR_CALLPEAK_NATIVE as SEACR_CALLPEAK_NATIVE_IGG   } from "../modules/local/python/seacr_callpeak"
+include { SEACR_CALLPEAK_NATIVE as SEACR_CALLPEAK_NATIVE_NOIGG } from "../modules/local/python/seacr_callpeak"
+include { DOWNSAMPLE_BAM_NATIVE      } from "../modules/local/python/downsample_bam"
+include { RESCALE_COVERAGE           } from "../modules/local/python/rescale_coverage"
+include { COMPUTE_MATRIX as COMPUTE_MATRIX_GENE     } from "../modules/local/python/compute_matrix"
+include { COMPUTE_MATRIX as COMPUTE_MATRIX_PEAKS    } from "../modules/local/python/compute_matrix"
+include { COMPUTE_MATRIX as COMPUTE_MATRIX_GENE_ALL } from "../modules/local/python/compute_matrix"
+include { AGGREGATE_BIGWIGS          } from "../modules/local/python/aggregate_bigwigs"
 
 /*
  * SUBWORKFLOWS
@@ -161,6 +187,7 @@ include { PEAK_SIGNAL_PROFILER                             } from "../subworkflo
  * MODULES
  */
 include { CAT_FASTQ                                                    } from "../modules/nf-core/cat/fastq/main"
+include { FASTQ_SUBSAMPLE                                              } from "../modules/local/linux/fastq_subsample"
 include { PRESEQ_LCEXTRAP                                              } from "../modules/nf-core/preseq/lcextrap/main"
 include { SEACR_CALLPEAK as SEACR_CALLPEAK_IGG                         } from "../modules/nf-core/seacr/callpeak/main"
 include { SEACR_CALLPEAK as SEACR_CALLPEAK_NOIGG                       } from "../modules/nf-core/seacr/callpeak/main"
@@ -213,12 +240,22 @@ workflow CUTANDRUN {
             ch_input
         )
 
+        // Technical replicates are grouped without their sizing, which is summed back onto the merged sample
         INPUT_CHECK.out.reads
         .map {
             meta, fastq ->
                 meta.id = meta.id.split("_")[0..-2].join("_")
-                [ meta, fastq ] }
+                def sizing = meta.subMap(['fastq_bytes', 'read_estimate'])
+                [ meta.findAll { !(it.key in ['fastq_bytes', 'read_estimate']) }, fastq, sizing ] }
         .groupTuple(by: [0])
+        .map {
+            meta, fastq, sizing ->
+                def meta_new = meta.clone()
+                if (sizing.every { it.read_estimate != null }) {
+                    meta_new.fastq_bytes   = sizing.sum { it.fastq_bytes }
+                    meta_new.read_estimate = sizing.sum { it.read_estimate }
+                }
+                [ meta_new, fastq ] }
         .branch {
             meta, fastq ->
                 single  : fastq.size() == 1
@@ -233,14 +270,43 @@ workflow CUTANDRUN {
      * MODULE: Concatenate FastQ files from same sample if required
      */
     if(params.run_cat_fastq) {
-        CAT_FASTQ (
+        if (params.quick_look) {
+            /*
+            * MODULE: Cut every library to its first reads for a quick look, which also merges technical replicates
+            */
+            FASTQ_SUBSAMPLE (
+                ch_fastq.multiple.mix(ch_fastq.single),
+                params.quick_look_reads
+            )
+            ch_software_versions = ch_software_versions.mix(FASTQ_SUBSAMPLE.out.versions)
+
+            // The input sizing is scaled down to the subsample for the resource estimates
+            FASTQ_SUBSAMPLE.out.reads
+            .map {
+                meta, fastq ->
+                    def meta_new = meta.clone()
+                    if (meta.read_estimate) {
+                        def fraction = Math.min(1.0d, (params.quick_look_reads as double) / meta.read_estimate)
+                        meta_new.read_estimate = Math.min(meta.read_estimate as long, params.quick_look_reads as long)
+                        meta_new.fastq_bytes   = (meta.fastq_bytes * fraction) as long
+                    }
+                    [ meta_new, fastq ] }
+            .set { ch_cat_fastq }
+        } else if (params.stream_tech_reps && !params.skip_trimming) {
+            // The technical replicates are read as one stream by the read QC and trimming tasks
             ch_fastq.multiple
-        )
-        ch_software_versions = ch_software_versions.mix(CAT_FASTQ.out.versions)
+            .mix(ch_fastq.single)
+            .set { ch_cat_fastq }
+        } else {
+            CAT_FASTQ (
+                ch_fastq.multiple
+            )
+            ch_software_versions = ch_software_versions.mix(CAT_FASTQ.out.versions)
 
-        CAT_FASTQ.out.reads
-        .mix(ch_fastq.single)
-        .set { ch_cat_fastq }
+            CAT_FASTQ.out.reads
+            .mix(ch_fastq.single)
+            .set { ch_cat_fastq }
+        }
     }
     //EXAMPLE CHANNEL STRUCT: [[id:h3k27me3_R1, group:h3k27me3, replicate:1, single_end:false, is_control:false], [READS]]
     //ch_cat_fastq | view
@@ -263,6 +329,8 @@ workflow CUTANDRUN {
     /*
     * SUBWORKFLOW: Alignment to target and spikein genome using botwtie2
     */
+    def spikein_combined = params.normalisation_mode == "Spikein" && params.spikein_alignment == "combined"
+    def fused_alignment  = params.fused_alignment && params.run_read_filter && !spikein_combined
     ch_orig_bam                   = Channel.empty()
     ch_orig_spikein_bam           = Channel.empty()
     ch_bowtie2_log                = Channel.empty()
@@ -272,6 +340,8 @@ workflow CUTANDRUN {
     ch_samtools_stats             = Channel.empty()
     ch_samtools_flagstat          = Channel.empty()
     ch_samtools_idxstats          = Channel.empty()
+    ch_unfiltered_flagstat        = Channel.empty()
+    ch_samtools_frag_len          = Channel.empty()
     ch_samtools_spikein_bam       = Channel.empty()
     ch_samtools_spikein_bai       = Channel.empty()
     ch_samtools_spikein_stats     = Channel.empty()
@@ -284,7 +354,12 @@ workflow CUTANDRUN {
                 PREPARE_GENOME.out.bowtie2_index,
                 PREPARE_GENOME.out.bowtie2_spikein_index,
                 PREPARE_GENOME.out.fasta,
-                PREPARE_GENOME.out.spikein_fasta
+                PREPARE_GENOME.out.spikein_fasta,
+                PREPARE_GENOME.out.bowtie2_combined_index,
+                spikein_combined,
+                PREPARE_GENOME.out.allowed_regions.collect{it[1]}.ifEmpty([]),
+                fused_alignment,
+                'stats' in params.native
             )
             ch_software_versions          = ch_software_versions.mix(ALIGN_BOWTIE2.out.versions)
             ch_orig_bam                   = ALIGN_BOWTIE2.out.orig_bam
@@ -297,6 +372,8 @@ workflow CUTANDRUN {
             ch_samtools_stats             = ALIGN_BOWTIE2.out.stats
             ch_samtools_flagstat          = ALIGN_BOWTIE2.out.flagstat
             ch_samtools_idxstats          = ALIGN_BOWTIE2.out.idxstats
+            ch_unfiltered_flagstat        = ALIGN_BOWTIE2.out.unfiltered_flagstat
+            ch_samtools_frag_len          = ALIGN_BOWTIE2.out.frag_len
 
             ch_samtools_spikein_bam       = ALIGN_BOWTIE2.out.spikein_bam
             ch_samtools_spikein_bai       = ALIGN_BOWTIE2.out.spikein_bai
@@ -309,14 +386,14 @@ workflow CUTANDRUN {
     //ch_samtools_bam | view
 
     // Preserve flagstats for FRiP before optional target deduplication
-    ch_samtools_flagstat_for_frip = ch_samtools_flagstat
+    ch_samtools_flagstat_for_frip = ch_unfiltered_flagstat
 
     /*
      * SUBWORKFLOW: extract aligner metadata
      */
     ch_metadata_bt2_target  = Channel.empty()
     ch_metadata_bt2_spikein = Channel.empty()
-    if (params.aligner == "bowtie2" && params.run_alignment) {
+    if (params.aligner == "bowtie2" && params.run_alignment && !('metrics' in params.native)) {
         EXTRACT_BT2_TARGET_META (
             ch_bowtie2_log,
             ch_bt2_to_csv_awk,
@@ -343,18 +420,21 @@ workflow CUTANDRUN {
      *  - Filter out reads aligned to blacklist regions
      *  - Filter out reads below a threshold q score
      *  - Filter out mitochondrial reads (if required)
+     *  Skipped when the reads were already filtered in the fused alignment task
      */
-    if (params.run_read_filter) {
+    if (params.run_read_filter && !fused_alignment) {
         FILTER_READS (
             ch_samtools_bam,
             PREPARE_GENOME.out.allowed_regions.collect{it[1]}.ifEmpty([]),
-            PREPARE_GENOME.out.fasta
+            PREPARE_GENOME.out.fasta,
+            'stats' in params.native
         )
         ch_samtools_bam      = FILTER_READS.out.bam
         ch_samtools_bai      = FILTER_READS.out.bai
         ch_samtools_stats    = FILTER_READS.out.stats
         ch_samtools_flagstat = FILTER_READS.out.flagstat
         ch_samtools_idxstats = FILTER_READS.out.idxstats
+        ch_samtools_frag_len = FILTER_READS.out.frag_len
         ch_software_versions = ch_software_versions.mix(FILTER_READS.out.versions)
     }
     //EXAMPLE CHANNEL STRUCT: [[id:h3k27me3_R1, group:h3k27me3, replicate:1, single_end:false, is_control:false], [BAM]]
@@ -382,13 +462,16 @@ workflow CUTANDRUN {
             ch_samtools_bai,
             true,
             PREPARE_GENOME.out.fasta.collect(),
-            PREPARE_GENOME.out.fasta_index.collect()
+            PREPARE_GENOME.out.fasta_index.collect(),
+            'dedup' in params.native,
+            'stats' in params.native
         )
         ch_samtools_bam           = MARK_DUPLICATES_PICARD.out.bam
         ch_samtools_bai           = MARK_DUPLICATES_PICARD.out.bai
         ch_samtools_stats         = MARK_DUPLICATES_PICARD.out.stats
         ch_samtools_flagstat      = MARK_DUPLICATES_PICARD.out.flagstat
         ch_samtools_idxstats      = MARK_DUPLICATES_PICARD.out.idxstats
+        ch_samtools_frag_len      = MARK_DUPLICATES_PICARD.out.frag_len
         ch_markduplicates_metrics = MARK_DUPLICATES_PICARD.out.metrics
         ch_software_versions      = ch_software_versions.mix(MARK_DUPLICATES_PICARD.out.versions)
     }
@@ -404,7 +487,9 @@ workflow CUTANDRUN {
             ch_samtools_bai,
             params.dedup_target_reads,
             PREPARE_GENOME.out.fasta.collect(),
-            PREPARE_GENOME.out.fasta_index.collect()
+            PREPARE_GENOME.out.fasta_index.collect(),
+            'dedup' in params.native,
+            'stats' in params.native
         )
         ch_samtools_bam      = DEDUPLICATE_PICARD.out.bam
         ch_samtools_bai      = DEDUPLICATE_PICARD.out.bai
@@ -413,6 +498,12 @@ workflow CUTANDRUN {
         ch_samtools_idxstats = DEDUPLICATE_PICARD.out.idxstats
         ch_software_versions = ch_software_versions.mix(DEDUPLICATE_PICARD.out.versions)
 
+        // The fragment lengths of the deduplicated bams replace those of the same samples
+        ch_samtools_frag_len = ch_samtools_frag_len
+            .map { row -> [ row[0].id, row ] }
+            .join ( DEDUPLICATE_PICARD.out.frag_len.map { row -> [ row[0].id, row ] }, remainder: true )
+            .map { row -> row[2] ?: row[1] }
+
         if (params.dedup_target_reads) {
             ch_samtools_flagstat_for_frip = ch_samtools_flagstat
         }
@@ -424,7 +515,7 @@ workflow CUTANDRUN {
     * SUBWORKFLOW: extract duplication stats from picard report
     */
     ch_metadata_picard_duplicates = Channel.empty()
-    if (params.run_mark_dups) {
+    if (params.run_mark_dups && !('metrics' in params.native)) {
         EXTRACT_PICARD_DUP_META (
             ch_markduplicates_metrics,
             ch_dummy_file.collect(),
@@ -448,18 +539,56 @@ workflow CUTANDRUN {
             PREPARE_GENOME.out.fasta.collect(),
             PREPARE_GENOME.out.fasta_index.collect(),
             params.dedup_target_reads,
-            ch_linear_duplication_header_multiqc
+            ch_linear_duplication_header_multiqc,
+            'stats' in params.native
         )
         ch_samtools_bam           = DEDUPLICATE_LINEAR.out.bam
         ch_samtools_bai           = DEDUPLICATE_LINEAR.out.bai
         ch_samtools_stats         = DEDUPLICATE_LINEAR.out.stats
         ch_samtools_flagstat      = DEDUPLICATE_LINEAR.out.flagstat
         ch_samtools_idxstats      = DEDUPLICATE_LINEAR.out.idxstats
+        ch_samtools_frag_len      = DEDUPLICATE_LINEAR.out.frag_len
         ch_linear_metrics         = DEDUPLICATE_LINEAR.out.metrics
         ch_linear_duplication_mqc = DEDUPLICATE_LINEAR.out.linear_metrics_mqc
         ch_software_versions      = ch_software_versions.mix(DEDUPLICATE_LINEAR.out.versions)
     }
 
+    /*
+     * MODULE: Collect the alignment and duplication metrics of all samples into one cohort table
+     */
+    ch_cohort_metrics = Channel.empty()
+    if ('metrics' in params.native && params.run_alignment) {
+        Channel.empty()
+            .mix( ch_bowtie2_log.map            { meta, report -> [ 'bowtie2_target' , meta, report ] } )
+            .mix( ch_bowtie2_spikein_log.map    { meta, report -> [ 'bowtie2_spikein', meta, report ] } )
+            .mix( ch_samtools_flagstat.map      { meta, report -> [ 'flagstat'       , meta, report ] } )
+            .mix( ch_markduplicates_metrics.map { meta, report -> [ 'picard'         , meta, report ] } )
+            .mix( ch_linear_metrics.map         { meta, report -> [ 'linear_dedup'   , meta, report ] } )
+            .toSortedList { a, b -> a[1].id <=> b[1].id ?: a[0] <=> b[0] }
+            .map { reports -> [ reports.collect { type, meta, report -> [ type, meta.id, meta.group ] }, reports.collect { it[2] } ] }
+            .set { ch_metric_reports }
+
+        COLLECT_METRICS (
+            ch_metric_reports
+        )
+        ch_cohort_metrics    = COLLECT_METRICS.out.csv
+        ch_software_versions = ch_software_versions.mix(COLLECT_METRICS.out.versions)
+
+        // Restore the per-sample bowtie2 tables used for normalisation
+        ch_bowtie2_log
+            .map { meta, report -> [ meta.id, meta ] }
+            .join( COLLECT_METRICS.out.bt2_target.flatten().map { [ it.name - '_meta_bt2_target.csv', it ] } )
+            .map { id, meta, csv -> [ meta, csv ] }
+            .set { ch_metadata_bt2_target }
+
+        ch_bowtie2_spikein_log
+            .map { meta, report -> [ meta.id, meta ] }
+            .join( COLLECT_METRICS.out.bt2_spikein.flatten().map { [ it.name - '_meta_bt2_spikein.csv', it ] } )
+            .map { id, meta, csv -> [ meta, csv ] }
+            .set { ch_metadata_bt2_spikein }
+    }
+    //ch_cohort_metrics | view
+
     ch_bedgraph               = Channel.empty()
     ch_bigwig                 = Channel.empty()
     ch_bigwig_original        = Channel.empty()
@@ -473,6 +602,7 @@ workflow CUTANDRUN {
     ch_consensus_peaks        = Channel.empty()
     ch_consensus_peaks_unfilt = Channel.empty()
     def downsample_enabled = params.downsample_target_coverage && params.downsample_target_coverage > 0
+    def downsample_bam     = downsample_enabled && params.downsample_method == 'bam'
     if(params.run_peak_calling) {
         /*
         * CHANNEL: Calculate mean target genome read count across all samples for dual normalization
@@ -501,7 +631,7 @@ workflow CUTANDRUN {
         def ch_samtools_bam_visual = ch_samtools_bam
         def ch_samtools_bai_visual = ch_samtools_bai
 
-        if (downsample_enabled) {
+        if (downsample_bam) {
             ch_samtools_bam
                 .map { row -> [row[0].id, row ].flatten() }
                 .join ( ch_samtools_bai.map { row -> [row[0].id, row ].flatten()} )
@@ -528,15 +658,32 @@ workflow CUTANDRUN {
                 ch_bam_bai_downsample = ch_bam_bai_downsample_all
             }
 
-            DOWNSAMPLE_BAM (
-                ch_bam_bai_downsample,
-                PREPARE_GENOME.out.chrom_sizes.collect(),
-                params.downsample_target_coverage,
-                params.downsample_seed
-            )
-            ch_software_versions = ch_software_versions.mix(DOWNSAMPLE_BAM.out.versions)
-
-            def ch_bam_bai_downsampled = DOWNSAMPLE_BAM.out.bam
+            def ch_bam_bai_downsampled
+            if ('downsample' in params.native) {
+                /*
+                * MODULE: Downsample to all target coverages in one pass using the flagstat read counts
+                */
+                DOWNSAMPLE_BAM_NATIVE (
+                    ch_bam_bai_downsample
+                        .map { row -> [ row[0].id, row ] }
+                        .join ( ch_samtools_flagstat.map { row -> [ row[0].id, row[1] ] } )
+                        .map { id, row, flagstat -> row + [ flagstat ] },
+                    PREPARE_GENOME.out.chrom_sizes.collect(),
+                    params.downsample_target_coverage,
+                    params.downsample_seed
+                )
+                ch_bam_bai_downsampled = DOWNSAMPLE_BAM_NATIVE.out.bam
+                ch_software_versions   = ch_software_versions.mix(DOWNSAMPLE_BAM_NATIVE.out.versions)
+            } else {
+                DOWNSAMPLE_BAM (
+                    ch_bam_bai_downsample,
+                    PREPARE_GENOME.out.chrom_sizes.collect(),
+                    params.downsample_target_coverage,
+                    params.downsample_seed
+                )
+                ch_bam_bai_downsampled = DOWNSAMPLE_BAM.out.bam
+                ch_software_versions   = ch_software_versions.mix(DOWNSAMPLE_BAM.out.versions)
+            }
             if (downsample_scope == 'targets' || downsample_scope == 'controls') {
                 ch_bam_bai_downsampled = ch_bam_bai_downsampled.mix(ch_bam_bai_passthrough)
             }
@@ -556,14 +703,15 @@ workflow CUTANDRUN {
             ch_metadata_bt2_spikein,
             ch_metadata_bt2_target,
             ch_mean_target_reads,
-            false // visualization_mode: false for normal processing
+            false, // visualization_mode: false for normal processing
+            'coverage' in params.native
         )
         ch_bedgraph          = PREPARE_PEAKCALLING.out.bedgraph
         ch_bigwig            = PREPARE_PEAKCALLING.out.bigwig
         ch_bigwig_original   = PREPARE_PEAKCALLING.out.bigwig
         ch_software_versions = ch_software_versions.mix(PREPARE_PEAKCALLING.out.versions)
 
-        if (downsample_enabled) {
+        if (downsample_bam) {
             // Visualization branch: downsampled BAMs, no normalization or reporting
             PREPARE_PEAKCALLING_VIS(
                 ch_samtools_bam_visual,
@@ -574,12 +722,37 @@ workflow CUTANDRUN {
                 Channel.empty(), // No metadata
                 Channel.empty(), // No target metadata
                 Channel.value(1.0), // Dummy mean_target_reads
-                true // visualization_mode: true for downsampled visualization
+                true, // visualization_mode: true for downsampled visualization
+                'coverage' in params.native
             )
             ch_bigwig_visual      = PREPARE_PEAKCALLING_VIS.out.bigwig
             ch_software_versions  = ch_software_versions.mix(PREPARE_PEAKCALLING_VIS.out.versions)
             // Only use visualization outputs for IGV session and bigwig
             ch_bigwig_igv         = ch_bigwig_visual
+        } else if (downsample_enabled) {
+            /*
+            * MODULE: Derive depth-matched visualization bigWigs from the full coverage
+            */
+            def downsample_scope = params.downsample_apply ?: 'all'
+            ch_bedgraph.branch { it ->
+                rescale:     downsample_scope == 'all' || (downsample_scope == 'controls') == it[0].is_control
+                passthrough: true
+            }
+            .set { ch_bedgraph_visual_split }
+
+            RESCALE_COVERAGE (
+                ch_bedgraph_visual_split.rescale,
+                PREPARE_GENOME.out.chrom_sizes.collect(),
+                params.downsample_target_coverage,
+                params.downsample_seed
+            )
+            ch_software_versions = ch_software_versions.mix(RESCALE_COVERAGE.out.versions)
+
+            // Samples outside the downsampling scope keep their full coverage bigWig
+            ch_bigwig.join( ch_bedgraph_visual_split.passthrough.map { it -> [ it[0] ] }, by: 0 )
+            .mix( RESCALE_COVERAGE.out.bigwig )
+            .set { ch_bigwig_visual }
+            ch_bigwig_igv = ch_bigwig_visual
         }
 
         /*
@@ -614,11 +787,30 @@ workflow CUTANDRUN {
             .set { ch_bigwig_pairs }
             // EXAMPLE CHANNEL STRUCT: [[META_TARGET], BIGWIG_TARGET, BIGWIG_CONTROL]
             
-            DEEPTOOLS_BIGWIGCOMPARE (
+            if ('bigwigcompare' in params.native) {
+                // Group the pairs so all bigwigs of a group are read once, controls are staged once
                 ch_bigwig_pairs
-            )
-            ch_bigwig_subtract   = DEEPTOOLS_BIGWIGCOMPARE.out.bigwig
-            ch_software_versions = ch_software_versions.mix(DEEPTOOLS_BIGWIGCOMPARE.out.versions)
+                .map { row -> [ row[0].group, row ] }
+                .groupTuple(by: [0])
+                .map { group, rows ->
+                    [ [id: group], rows.collect { it[1] }, rows.collect { it[2] }.unique(),
+                      rows.collect { "${it[0].id}:${it[1].name}:${it[2].name}" } ]
+                }
+                .set { ch_bigwig_groups }
+                // EXAMPLE CHANNEL STRUCT: [[id: <GROUP>], [BIGWIG_TARGETS], [BIGWIG_CONTROLS], [PAIRS]]
+
+                AGGREGATE_BIGWIGS (
+                    ch_bigwig_groups
+                )
+                ch_bigwig_subtract   = AGGREGATE_BIGWIGS.out.bigwig
+                ch_software_versions = ch_software_versions.mix(AGGREGATE_BIGWIGS.out.versions)
+            } else {
+                DEEPTOOLS_BIGWIGCOMPARE (
+                    ch_bigwig_pairs
+                )
+                ch_bigwig_subtract   = DEEPTOOLS_BIGWIGCOMPARE.out.bigwig
+                ch_software_versions = ch_software_versions.mix(DEEPTOOLS_BIGWIGCOMPARE.out.versions)
+            }
         }
 
         /*
@@ -658,12 +850,21 @@ workflow CUTANDRUN {
                 .set { ch_bedgraph_paired }
                 // EXAMPLE CHANNEL STRUCT: [[META], TARGET_BEDGRAPH, CONTROL_BEDGRAPH]
 
-                SEACR_CALLPEAK_IGG (
-                    ch_bedgraph_paired,
-                    params.seacr_peak_threshold
-                )
-                ch_seacr_peaks       = SEACR_CALLPEAK_IGG.out.bed
-                ch_software_versions = ch_software_versions.mix(SEACR_CALLPEAK_IGG.out.versions)
+                if ('seacr' in params.native) {
+                    SEACR_CALLPEAK_NATIVE_IGG (
+                        ch_bedgraph_paired,
+                        params.seacr_peak_threshold
+                    )
+                    ch_seacr_peaks       = SEACR_CALLPEAK_NATIVE_IGG.out.bed
+                    ch_software_versions = ch_software_versions.mix(SEACR_CALLPEAK_NATIVE_IGG.out.versions)
+                } else {
+                    SEACR_CALLPEAK_IGG (
+                        ch_bedgraph_paired,
+                        params.seacr_peak_threshold
+                    )
+                    ch_seacr_peaks       = SEACR_CALLPEAK_IGG.out.bed
+                    ch_software_versions = ch_software_versions.mix(SEACR_CALLPEAK_IGG.out.versions)
+                }
                 // EXAMPLE CHANNEL STRUCT: [[META], BED]
                 //SEACR_CALLPEAK_IGG.out.bed | view
             }
@@ -706,12 +907,21 @@ workflow CUTANDRUN {
                 // EXAMPLE CHANNEL STRUCT: [[META], BED, FAKE_CTRL]
                 // ch_bedgraph_target_fctrl | view
 
-                SEACR_CALLPEAK_NOIGG (
-                    ch_bedgraph_target_fctrl,
-                    params.seacr_peak_threshold
-                )
-                ch_seacr_peaks       = SEACR_CALLPEAK_NOIGG.out.bed
-                ch_software_versions = ch_software_versions.mix(SEACR_CALLPEAK_NOIGG.out.versions)
+                if ('seacr' in params.native) {
+                    SEACR_CALLPEAK_NATIVE_NOIGG (
+                        ch_bedgraph_target_fctrl,
+                        params.seacr_peak_threshold
+                    )
+                    ch_seacr_peaks       = SEACR_CALLPEAK_NATIVE_NOIGG.out.bed
+                    ch_software_versions = ch_software_versions.mix(SEACR_CALLPEAK_NATIVE_NOIGG.out.versions)
+                } else {
+                    SEACR_CALLPEAK_NOIGG (
+                        ch_bedgraph_target_fctrl,
+                        params.seacr_peak_threshold
+                    )
+                    ch_seacr_peaks       = SEACR_CALLPEAK_NOIGG.out.bed
+                    ch_software_versions = ch_software_versions.mix(SEACR_CALLPEAK_NOIGG.out.versions)
+                }
                 // EXAMPLE CHANNEL STRUCT: [[META], BED]
                 //SEACR_NO_IGG.out.bed | view
             }
@@ -794,16 +1004,60 @@ workflow CUTANDRUN {
         if(params.run_homer_motifs) {
             // Create a value channel for the fasta file
             ch_fasta_for_homer_merged = PREPARE_GENOME.out.fasta.map { it[1] }.first()
-            
-            HOMER_FINDMOTIFSGENOME_MERGED (
-                MERGE_PEAKS_TABLE.out.bed.map { bed -> [ [id: 'merged_peaks'], bed ] },
-                ch_fasta_for_homer_merged,
-                params.homer_motif_size
-            )
-            ch_software_versions = ch_software_versions.mix(HOMER_FINDMOTIFSGENOME_MERGED.out.versions)
-            
+
+            if (params.motif_analysis_mode == 'known') {
+                /*
+                * MODULE: Scan the known motif library in the peaks against a GC-matched background
+                */
+                if (params.homer_known_motifs) {
+                    ch_known_motifs = Channel.value(file(params.homer_known_motifs, checkIfExists: true))
+                } else {
+                    HOMER_KNOWN_MOTIFS ( 'vertebrates' )
+                    ch_software_versions = ch_software_versions.mix(HOMER_KNOWN_MOTIFS.out.versions)
+                    ch_known_motifs      = HOMER_KNOWN_MOTIFS.out.motifs.first()
+                }
+                ch_fai_for_motifs = PREPARE_GENOME.out.fasta_index.map { it[1] }.first()
+
+                KNOWN_MOTIF_SCAN_MERGED (
+                    MERGE_PEAKS_TABLE.out.bed.map { bed -> [ [id: 'merged_peaks'], bed ] },
+                    ch_fasta_for_homer_merged,
+                    ch_fai_for_motifs,
+                    params.homer_motif_size,
+                    ch_known_motifs
+                )
+                ch_software_versions = ch_software_versions.mix(KNOWN_MOTIF_SCAN_MERGED.out.versions)
+                ch_motif_dirs_merged_meta = KNOWN_MOTIF_SCAN_MERGED.out.motifs
+            } else {
+                /*
+                * MODULE: Preparse the Homer background once for all motif runs
+                */
+                def homer_cache_dir = []
+                if (params.homer_preparsed_dir) {
+                    homer_cache_dir = file(params.homer_preparsed_dir, type: 'dir')
+                    homer_cache_dir.mkdirs()
+                }
+                HOMER_PREPARSE (
+                    ch_fasta_for_homer_merged,
+                    params.homer_motif_size,
+                    homer_cache_dir
+                )
+                ch_software_versions    = ch_software_versions.mix(HOMER_PREPARSE.out.versions)
+                ch_homer_preparsed_key  = HOMER_PREPARSE.out.key.first()
+                ch_homer_preparsed_root = params.homer_preparsed_dir ? Channel.value(homer_cache_dir) : HOMER_PREPARSE.out.dir.first()
+
+                HOMER_FINDMOTIFSGENOME_MERGED (
+                    MERGE_PEAKS_TABLE.out.bed.map { bed -> [ [id: 'merged_peaks'], bed ] },
+                    ch_fasta_for_homer_merged,
+                    params.homer_motif_size,
+                    ch_homer_preparsed_root,
+                    ch_homer_preparsed_key
+                )
+                ch_software_versions = ch_software_versions.mix(HOMER_FINDMOTIFSGENOME_MERGED.out.versions)
+                ch_motif_dirs_merged_meta = HOMER_FINDMOTIFSGENOME_MERGED.out.motifs
+            }
+
             // Collect all motif directories for summarization
-            HOMER_FINDMOTIFSGENOME_MERGED.out.motifs
+            ch_motif_dirs_merged_meta
                 .map { meta, dir -> dir }
                 .set { ch_motif_dirs_merged }
         }
@@ -862,7 +1116,8 @@ workflow CUTANDRUN {
             * SUBWORKFLOW: Construct group consensus peaks
             */
             CONSENSUS_PEAKS_ALL (
-                ch_peaks_bed_all
+                ch_peaks_bed_all,
+                'consensus' in params.native
             )
             ch_consensus_peaks        = CONSENSUS_PEAKS_ALL.out.filtered_bed
             ch_consensus_peaks_unfilt = CONSENSUS_PEAKS_ALL.out.merged_bed
@@ -886,7 +1141,8 @@ workflow CUTANDRUN {
             * where there is more than 1 replicate in a group
             */
             CONSENSUS_PEAKS (
-                ch_peaks_bed_group
+                ch_peaks_bed_group,
+                'consensus' in params.native
             )
             ch_consensus_peaks        = CONSENSUS_PEAKS.out.filtered_bed
             ch_consensus_peaks_unfilt = CONSENSUS_PEAKS.out.merged_bed
@@ -901,15 +1157,30 @@ workflow CUTANDRUN {
                 // Create a value channel for the fasta file
                 ch_fasta_for_homer = PREPARE_GENOME.out.fasta.map { it[1] }.first()
                 
-                HOMER_FINDMOTIFSGENOME_CONSENSUS (
-                    ch_consensus_peaks_unfilt,
-                    ch_fasta_for_homer,
-                    params.homer_motif_size
-                )
-                ch_software_versions = ch_software_versions.mix(HOMER_FINDMOTIFSGENOME_CONSENSUS.out.versions)
+                if (params.motif_analysis_mode == 'known') {
+                    KNOWN_MOTIF_SCAN_CONSENSUS (
+                        ch_consensus_peaks_unfilt,
+                        ch_fasta_for_homer,
+                        ch_fai_for_motifs,
+                        params.homer_motif_size,
+                        ch_known_motifs
+                    )
+                    ch_software_versions = ch_software_versions.mix(KNOWN_MOTIF_SCAN_CONSENSUS.out.versions)
+                    ch_motif_dirs_consensus_meta = KNOWN_MOTIF_SCAN_CONSENSUS.out.motifs
+                } else {
+                    HOMER_FINDMOTIFSGENOME_CONSENSUS (
+                        ch_consensus_peaks_unfilt,
+                        ch_fasta_for_homer,
+                        params.homer_motif_size,
+                        ch_homer_preparsed_root,
+                        ch_homer_preparsed_key
+                    )
+                    ch_software_versions = ch_software_versions.mix(HOMER_FINDMOTIFSGENOME_CONSENSUS.out.versions)
+                    ch_motif_dirs_consensus_meta = HOMER_FINDMOTIFSGENOME_CONSENSUS.out.motifs
+                }
                 
                 // Collect all consensus motif directories
-                HOMER_FINDMOTIFSGENOME_CONSENSUS.out.motifs
+                ch_motif_dirs_consensus_meta
                     .map { meta, dir -> dir }
                     .collect()
                     .set { ch_motif_dirs_consensus }
@@ -1003,17 +1274,27 @@ workflow CUTANDRUN {
             /*
             * MODULE: Compute DeepTools matrix used in heatmap plotting for Genes
             */
-            DEEPTOOLS_COMPUTEMATRIX_GENE (
-                ch_bigwig_no_igg,
-                PREPARE_GENOME.out.bed.collect()
-            )
-            ch_software_versions = ch_software_versions.mix(DEEPTOOLS_COMPUTEMATRIX_GENE.out.versions)
+            if ('matrix' in params.native) {
+                COMPUTE_MATRIX_GENE (
+                    ch_bigwig_no_igg,
+                    PREPARE_GENOME.out.bed.collect()
+                )
+                ch_dt_matrix_gene    = COMPUTE_MATRIX_GENE.out.matrix
+                ch_software_versions = ch_software_versions.mix(COMPUTE_MATRIX_GENE.out.versions)
+            } else {
+                DEEPTOOLS_COMPUTEMATRIX_GENE (
+                    ch_bigwig_no_igg,
+                    PREPARE_GENOME.out.bed.collect()
+                )
+                ch_dt_matrix_gene    = DEEPTOOLS_COMPUTEMATRIX_GENE.out.matrix
+                ch_software_versions = ch_software_versions.mix(DEEPTOOLS_COMPUTEMATRIX_GENE.out.versions)
+            }
 
             /*
             * MODULE: Calculate DeepTools heatmap
             */
             DEEPTOOLS_PLOTHEATMAP_GENE (
-                DEEPTOOLS_COMPUTEMATRIX_GENE.out.matrix
+                ch_dt_matrix_gene
             )
             ch_software_versions = ch_software_versions.mix(DEEPTOOLS_PLOTHEATMAP_GENE.out.versions)
 
@@ -1049,20 +1330,29 @@ workflow CUTANDRUN {
             * MODULE: Compute DeepTools matrix used in heatmap plotting for Peaks
             */
 
-            DEEPTOOLS_COMPUTEMATRIX_PEAKS (
-                ch_ordered_bigwig,
-                ch_ordered_peaks_max
-            )
-
-            ch_software_versions = ch_software_versions.mix(DEEPTOOLS_COMPUTEMATRIX_PEAKS.out.versions)
+            if ('matrix' in params.native) {
+                COMPUTE_MATRIX_PEAKS (
+                    ch_ordered_bigwig,
+                    ch_ordered_peaks_max
+                )
+                ch_dt_matrix_peaks   = COMPUTE_MATRIX_PEAKS.out.matrix
+                ch_software_versions = ch_software_versions.mix(COMPUTE_MATRIX_PEAKS.out.versions)
+            } else {
+                DEEPTOOLS_COMPUTEMATRIX_PEAKS (
+                    ch_ordered_bigwig,
+                    ch_ordered_peaks_max
+                )
+                ch_dt_matrix_peaks   = DEEPTOOLS_COMPUTEMATRIX_PEAKS.out.matrix
+                ch_software_versions = ch_software_versions.mix(DEEPTOOLS_COMPUTEMATRIX_PEAKS.out.versions)
+            }
             //EXAMPLE CHANNEL STRUCT: [[META], MATRIX]
-            //DEEPTOOLS_COMPUTEMATRIX_PEAKS.out.matrix | view
+            //ch_dt_matrix_peaks | view
 
             /*
             * MODULE: Calculate DeepTools heatmap
             */
             DEEPTOOLS_PLOTHEATMAP_PEAKS (
-                DEEPTOOLS_COMPUTEMATRIX_PEAKS.out.matrix
+                ch_dt_matrix_peaks
             )
             ch_software_versions = ch_software_versions.mix(DEEPTOOLS_PLOTHEATMAP_PEAKS.out.versions)
 
@@ -1077,16 +1367,25 @@ workflow CUTANDRUN {
                 .map { [[id:'all_genes'], it] }
                 .set { ch_all_genes_bigwig_list }
 
-                DEEPTOOLS_COMPUTEMATRIX_GENE_ALL (
-                    ch_all_genes_bigwig_list,
-                    PREPARE_GENOME.out.bed.toSortedList()
-                )
+                if ('matrix' in params.native) {
+                    COMPUTE_MATRIX_GENE_ALL (
+                        ch_all_genes_bigwig_list,
+                        PREPARE_GENOME.out.bed.toSortedList()
+                    )
+                    ch_dt_matrix_gene_all = COMPUTE_MATRIX_GENE_ALL.out.matrix
+                } else {
+                    DEEPTOOLS_COMPUTEMATRIX_GENE_ALL (
+                        ch_all_genes_bigwig_list,
+                        PREPARE_GENOME.out.bed.toSortedList()
+                    )
+                    ch_dt_matrix_gene_all = DEEPTOOLS_COMPUTEMATRIX_GENE_ALL.out.matrix
+                }
 
                 /*
                 * MODULE: Calculate DeepTools heatmap for all samples
                 */
                 DEEPTOOLS_PLOTHEATMAP_GENE_ALL (
-                    DEEPTOOLS_COMPUTEMATRIX_GENE_ALL.out.matrix
+                    ch_dt_matrix_gene_all
                 )
             }
         }
@@ -1098,7 +1397,8 @@ workflow CUTANDRUN {
             DEEPTOOLS_QC (
                 ch_samtools_bam,
                 ch_samtools_bai,
-                params.dt_qc_corr_method
+                params.dt_qc_corr_method,
+                'bincounts' in params.native
             )
             ch_dt_corrmatrix     = DEEPTOOLS_QC.out.correlation_matrix
             ch_dt_pcadata        = DEEPTOOLS_QC.out.pca_data
@@ -1125,8 +1425,14 @@ workflow CUTANDRUN {
             * SUBWORKFLOW: Extract fragments from bam files for fragment-based FRiP score
             */
             EXTRACT_FRAGMENTS (
-                ch_bam_target
+                ch_bam_target,
+                'fragments' in params.native,
+                params.fragment_store
             )
+            ch_software_versions = ch_software_versions.mix(EXTRACT_FRAGMENTS.out.versions)
+
+            // The native FRiP engine maps the fragment store instead of reparsing the BED file
+            ch_fragments = params.fragment_store && 'frip' in params.native ? EXTRACT_FRAGMENTS.out.store : EXTRACT_FRAGMENTS.out.bed
 
             /*
             * SUBWORKFLOW: Run suite of peak QC on peaks
@@ -1136,19 +1442,40 @@ workflow CUTANDRUN {
                 AWK_NAME_PEAK_BED.out.file,
                 ch_consensus_peaks,
                 ch_consensus_peaks_unfilt,
-                EXTRACT_FRAGMENTS.out.bed,
+                ch_fragments,
                 ch_flagstat_target,
                 params.min_frip_overlap,
                 ch_frip_score_header_multiqc,
                 ch_peak_counts_header_multiqc,
                 ch_peak_counts_consensus_header_multiqc,
-                ch_peak_reprod_header_multiqc
+                ch_peak_reprod_header_multiqc,
+                ch_frip_peak_sets_header_multiqc,
+                'frip' in params.native,
+                params.run_idr,
+                callers[0] == 'seacr' ? 4 : 5
             )
             ch_peakqc_frip_mqc             = PEAK_QC.out.primary_frip_mqc
             ch_peakqc_count_mqc            = PEAK_QC.out.primary_count_mqc
             ch_peakqc_count_consensus_mqc  = PEAK_QC.out.consensus_count_mqc
             ch_peakqc_reprod_perc_mqc      = PEAK_QC.out.reprod_perc_mqc
             ch_software_versions           = ch_software_versions.mix(PEAK_QC.out.versions)
+
+            /*
+            * MODULE: Count the fragments of all samples in the consensus peaks for differential binding
+            */
+            if (params.consensus_count_matrix) {
+                (params.fragment_store ? EXTRACT_FRAGMENTS.out.store : EXTRACT_FRAGMENTS.out.bed)
+                .toSortedList { a, b -> a[0].id <=> b[0].id }
+                .map { list -> [ list.collect { it[0].id }, list.collect { it[1] } ] }
+                .set { ch_count_fragments }
+                //EXAMPLE CHANNEL STRUCT: [[ID...n], [FRAGMENTS...n]]
+
+                CONSENSUS_COUNT_MATRIX (
+                    ch_count_fragments,
+                    ch_consensus_peaks.collect { it[1] }
+                )
+                ch_software_versions = ch_software_versions.mix(CONSENSUS_COUNT_MATRIX.out.versions)
+            }
         }
 
         // Run PeakSignalProfiler (optional)
@@ -1158,13 +1485,11 @@ workflow CUTANDRUN {
             // avoids calling `file(null)` and lets the pipeline use its own
             // generated `genes.bed` when no external BED is provided.
             if (params.gene_bed) {
-                PEAK_SIGNAL_PROFILER( file(params.input), file(params.gene_bed), PREPARE_GENOME.out.fasta_index.map{it[1]}.first() )
+                PEAK_SIGNAL_PROFILER( file(params.input), file(params.gene_bed), PREPARE_GENOME.out.fasta_index.map{it[1]}.first(), ch_bigwig.collect{it[1]} )
             } else {
-                PEAK_SIGNAL_PROFILER( file(params.input), PREPARE_GENOME.out.bed, PREPARE_GENOME.out.fasta_index.map{it[1]}.first() )
+                PEAK_SIGNAL_PROFILER( file(params.input), PREPARE_GENOME.out.bed, PREPARE_GENOME.out.fasta_index.map{it[1]}.first(), ch_bigwig.collect{it[1]} )
             }
-            // NOTE: intentionally do NOT mix PSP `versions` into ch_software_versions
-            // to avoid compile-time channel evaluation issues; PSP `versions.yml`
-            // will still be published alongside pipeline outputs.
+            ch_software_versions = ch_software_versions.mix(PEAK_SIGNAL_PROFILER.out.versions)
         }
 
         //ch_peakqc_reprod_perc_mqc | view
@@ -1180,11 +1505,24 @@ workflow CUTANDRUN {
         // EXAMPLE CHANNEL STRUCT: [[META], BAM, BAI]
         //ch_bam_bai | view
 
+        /*
+        * CHANNEL: Reuse the fragment lengths written with the stats of the final bam files
+        */
+        ch_bam_bai
+        .map { row -> [ row[0].id, row ] }
+        .join ( ch_samtools_frag_len.map { row -> [ row[0].id, row[1] ] }, remainder: true )
+        .filter { row -> row[1] != null }
+        .branch { row ->
+            native: row[2] != null
+            scan:   true
+        }
+        .set { ch_frag_len_source }
+
         /*
         * MODULE: Calculate fragment lengths
         */
         SAMTOOLS_CUSTOMVIEW (
-            ch_bam_bai
+            ch_frag_len_source.scan.map { row -> row[1] }
         )
         ch_software_versions = ch_software_versions.mix(SAMTOOLS_CUSTOMVIEW.out.versions)
         //SAMTOOLS_CUSTOMVIEW.out.tsv | view
@@ -1193,7 +1531,8 @@ workflow CUTANDRUN {
         * CHANNEL: Prepare data for generate reports
         */
         // Make sure files are always in order for resume
-        ch_frag_len = SAMTOOLS_CUSTOMVIEW.out.tsv
+        ch_frag_len = ch_frag_len_source.native.map { row -> [ row[1][0], row[2] ] }
+        .mix ( SAMTOOLS_CUSTOMVIEW.out.tsv )
         .toSortedList { row -> row[0].id }
         .map {
             list ->
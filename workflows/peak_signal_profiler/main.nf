@@ -7,8 +7,7 @@ workflow {
     params.samplesheet = params.samplesheet ?: null
     params.annotation  = params.annotation  ?: null
     params.genome      = params.genome      ?: null
-    params.psp_sif     = params.psp_sif     ?: '/path/to/peaksignalprofiler.sif'
-    params.psp_dir     = params.psp_dir     ?: '/path/to/peak-signal-profiler'
+    params.bigwig_dir  = params.bigwig_dir  ?: null
 
     if (!params.samplesheet) {
         log.error "--samplesheet is required"
@@ -25,5 +24,15 @@ workflow {
         System.exit(1)
     }
 
-    PEAK_SIGNAL_PROFILER( file(params.samplesheet), file(params.annotation), file(params.genome), file(params.psp_dir) )
+    if (!params.bigwig_dir) {
+        log.error "--bigwig_dir is required"
+        System.exit(1)
+    }
+
+    PEAK_SIGNAL_PROFILER(
+        file(params.samplesheet),
+        file(params.annotation),
+        file(params.genome),
+        Channel.fromPath("${params.bigwig_dir}/*.bigWig").collect()
+    )
 }